@@ -0,0 +1,187 @@
+"""
+Status change events over Redis pub/sub.
+
+Lifecycle methods (Lead.mark_*, quote analysis) publish a small JSON payload
+on `status:<kind>:<key>`. Every web process keeps a single pattern
+subscription and fans messages out to the clients waiting in that process, so
+thousands of open Server-Sent Events streams cost a handful of Redis
+subscriptions instead of a database query per poll.
+
+SSE streams are async views and need the ASGI entry point (core/asgi.py),
+served by uvicorn (in requirements), e.g.:
+  uvicorn core.asgi:application --workers 4
+The quote long-polls (wait_for_event) are sync and hold a worker thread and a
+Redis connection each, so their wait is capped well below worker timeouts.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'status'
+HEARTBEAT_SECONDS = 15
+# Streams are closed after this long; EventSource reconnects by itself
+MAX_STREAM_SECONDS = 10 * 60
+
+
+def channel_name(kind: str, key) -> str:
+    return f"{CHANNEL_PREFIX}:{kind}:{key}"
+
+
+def publish(kind: str, key, payload: dict):
+    """Publish a status event. Best effort: pollers still see the change."""
+    try:
+        from django_redis import get_redis_connection
+
+        message = json.dumps(payload, cls=DjangoJSONEncoder)
+        get_redis_connection('default').publish(channel_name(kind, key), message)
+    except Exception as e:
+        logger.warning(f"Could not publish {kind} {key} status event: {e}")
+
+
+def wait_for_event(kind: str, key, timeout: float, is_done=None):
+    """
+    Block until an event for (kind, key) arrives or timeout passes (long-poll).
+    Returns the payload or None.
+
+    is_done: optional callable checked once subscribed; when it returns True
+    the wait ends at once. Callers re-read their state there, so a change
+    published before the subscription is not missed.
+    """
+    from django_redis import get_redis_connection
+
+    channel = channel_name(kind, key)
+    pubsub = get_redis_connection('default').pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(channel)
+        if is_done is not None and is_done():
+            return None
+
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            # Subscription confirmations come back as None and are skipped
+            message = pubsub.get_message(timeout=remaining)
+            if message is not None and message['type'] == 'message':
+                return json.loads(message['data'])
+        return None
+    finally:
+        try:
+            pubsub.unsubscribe(channel)
+        finally:
+            pubsub.close()
+
+
+class StatusEventHub:
+    """One Redis pattern subscription per event loop, fanned out to local waiters."""
+
+    def __init__(self):
+        self._waiters = defaultdict(set)
+        self._listener = None
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        connection = aioredis.from_url(settings.REDIS_URL)
+        pubsub = connection.pubsub()
+        try:
+            await pubsub.psubscribe(f"{CHANNEL_PREFIX}:*")
+            async for message in pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                channel = message['channel'].decode()
+                for queue in list(self._waiters.get(channel, ())):
+                    queue.put_nowait(message['data'])
+        except Exception as e:
+            logger.error(f"Status event listener stopped: {e}")
+        finally:
+            await pubsub.aclose()
+            await connection.aclose()
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        queue = asyncio.Queue()
+        self._waiters[channel].add(queue)
+        self._ensure_listener()
+        try:
+            yield queue
+        finally:
+            self._waiters[channel].discard(queue)
+            if not self._waiters[channel]:
+                del self._waiters[channel]
+
+
+# Hubs by event loop. A hub's listener task references its loop, so weak
+# keys would never be released: hubs of closed loops are dropped instead.
+_hubs = {}
+
+
+def get_hub() -> StatusEventHub:
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        for closed in [other for other in _hubs if other.is_closed()]:
+            del _hubs[closed]
+        hub = _hubs[loop] = StatusEventHub()
+    return hub
+
+
+def _sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def _event_stream(kind, key, load_state, is_final, transform):
+    state = transform(await load_state())
+    yield _sse(state)
+    if is_final(state):
+        return
+
+    async with get_hub().subscribe(channel_name(kind, key)) as queue:
+        # Re-read after subscribing so a change in between is not missed
+        latest = transform(await load_state())
+        if latest != state:
+            yield _sse(latest)
+            if is_final(latest):
+                return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + MAX_STREAM_SECONDS
+        while loop.time() < deadline:
+            try:
+                data = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            state = transform(json.loads(data))
+            yield _sse(state)
+            if is_final(state):
+                return
+
+
+def sse_response(kind: str, key, load_state, is_final, transform=None) -> StreamingHttpResponse:
+    """
+    Stream status events for (kind, key) as text/event-stream.
+
+    load_state: async callable returning the current payload
+    is_final: called with a payload, True ends the stream
+    transform: optional per-endpoint rewrite of each payload
+    """
+    response = StreamingHttpResponse(
+        _event_stream(kind, key, load_state, is_final, transform or (lambda payload: payload)),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
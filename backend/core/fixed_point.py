@@ -0,0 +1,93 @@
+"""
+Fixed-point integer arithmetic for the roof calculator.
+
+Lengths are whole millimetres, areas square millimetres and money grosze, all
+plain ints. Ratios (waste factor, margin, VAT, the half-hip share, ...) are
+ints over a power-of-ten scale, and pitch trig comes from tables of factors
+scaled by FACTOR, precomputed per whole degree. Every division rounds half
+up in div_round, so the same inputs always give the same grosze, and totals
+are sums of the rounded line costs.
+
+Conversion to metres / PLN floats happens only when a result is serialized
+(the *_display helpers).
+"""
+import math
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+MM = 1000  # per metre
+MM2 = MM * MM  # per square metre
+GROSZE = 100  # per PLN
+PERCENT = 10000  # percentages in basis points (35% -> 3500)
+FACTOR = 10 ** 9  # trig factors
+
+
+def div_round(numerator: int, denominator: int) -> int:
+    """numerator / denominator rounded half up (denominator > 0)."""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def scaled(value, scale: int) -> int:
+    """A number (int, float, Decimal or numeric str) as an int over scale, rounded half up."""
+    try:
+        return int((Decimal(str(value)) * scale).to_integral_value(ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        return 0
+
+
+def to_mm(metres) -> int:
+    return scaled(metres or 0, MM)
+
+
+def to_grosze(pln) -> int:
+    return scaled(pln or 0, GROSZE)
+
+
+def to_basis_points(percent) -> int:
+    if type(percent) is int:
+        return percent * 100
+    return scaled(percent or 0, 100)
+
+
+def _sec(degrees) -> int:
+    cos = math.cos(math.radians(degrees))
+    return round(FACTOR / cos) if cos > 0 else 0
+
+
+def _hip(degrees) -> int:
+    tan = math.tan(math.radians(degrees))
+    return round(math.sqrt(2 + tan * tan) * FACTOR)
+
+
+# pitch (whole degrees) -> 1/cos and sqrt(2 + tan²), scaled by FACTOR.
+# A slope over a horizontal run is run * sec, a hip or valley between two
+# planes of equal pitch is run * sqrt(2 + tan²), and a plane's real area is
+# its plan area * sec.
+SEC_TABLE = {degrees: _sec(degrees) for degrees in range(0, 91)}
+HIP_TABLE = {degrees: _hip(degrees) for degrees in range(0, 91)}
+
+
+def sec_factor(pitch) -> int:
+    """1/cos of the pitch scaled by FACTOR (0 when the cosine is not positive)."""
+    factor = SEC_TABLE.get(pitch)
+    return _sec(pitch) if factor is None else factor
+
+
+def hip_factor(pitch) -> int:
+    factor = HIP_TABLE.get(pitch)
+    return _hip(pitch) if factor is None else factor
+
+
+def mm_display(mm: int, places: int = 2) -> float:
+    """Millimetres as metres rounded to places."""
+    step = 10 ** (3 - places)
+    return div_round(mm, step) / 10 ** places
+
+
+def mm2_display(mm2: int, places: int = 2) -> float:
+    """Square millimetres as square metres rounded to places."""
+    step = 10 ** (6 - places)
+    return div_round(mm2, step) / 10 ** places
+
+
+def pln_display(grosze: int) -> float:
+    return grosze / GROSZE
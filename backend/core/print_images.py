@@ -0,0 +1,64 @@
+"""
+Print-resolution derivatives of uploaded images for generated PDFs.
+
+Uploads are phone photos and scans, often 10+ megapixels, while PDFs show
+them in a box of a few centimetres. Embedding the original makes every PDF
+megabytes large and every render decode the full image. print_image_path()
+returns a JPEG downsampled to the box at PRINT_DPI instead, written next to
+the upload the first time it is needed and reused by later renders.
+"""
+import logging
+import os
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+PRINT_DPI = 200
+JPEG_QUALITY = 85
+CM_PER_INCH = 2.54
+DERIVATIVE_SUFFIX = '.print{dpi}.jpg'
+
+
+def print_size_px(width_cm, height_cm, dpi=PRINT_DPI) -> tuple:
+    """Pixels of a width_cm x height_cm box at dpi."""
+    return round(width_cm / CM_PER_INCH * dpi), round(height_cm / CM_PER_INCH * dpi)
+
+
+def _derivative(source: Path, target: Path, box: tuple):
+    with Image.open(source) as image:
+        # JPEGs decode straight at a fraction of their size
+        image.draft('RGB', box)
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+        image.thumbnail(box, Image.LANCZOS)
+
+        # Written aside and renamed, so concurrent renders never read half a file
+        partial = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+        image.save(partial, 'JPEG', quality=JPEG_QUALITY, optimize=True, dpi=(PRINT_DPI, PRINT_DPI))
+        os.replace(partial, target)
+
+
+def print_image_path(path, width_cm, height_cm, dpi=PRINT_DPI) -> str:
+    """
+    Path of a JPEG of the image at `path` fitting width_cm x height_cm at dpi,
+    created next to it on first use. The original path is returned if it
+    cannot be converted.
+    """
+    source = Path(path)
+    target = source.with_name(source.stem + DERIVATIVE_SUFFIX.format(dpi=dpi))
+    if target.exists():
+        return str(target)
+    try:
+        _derivative(source, target, print_size_px(width_cm, height_cm, dpi))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not create print image of {source.name}: {e}")
+        return str(source)
+    return str(target)
@@ -160,6 +160,39 @@ OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 CELERY_BROKER_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 
+# Quote PDFs are rendered by workers consuming this queue, which keep
+# WeasyPrint's template, stylesheet and fonts loaded between renders:
+#   celery -A core worker -Q pdf --concurrency 2
+# Without a PDF worker, set it empty to render on the default queue.
+QUOTE_PDF_QUEUE = os.environ.get('QUOTE_PDF_QUEUE', 'pdf')
+# A render not finished this many seconds after it was requested (no worker
+# took it) is reported as failed
+QUOTE_PDF_TIMEOUT = int(os.environ.get('QUOTE_PDF_TIMEOUT', '300'))
+
+# AI dispatcher (leads/dispatcher.py). When enabled, lead analysis is queued
+# for `manage.py run_ai_dispatcher` instead of the prefork Celery worker.
+AI_DISPATCHER_ENABLED = os.environ.get('AI_DISPATCHER_ENABLED', 'False').lower() == 'true'
+AI_DISPATCHER_CONCURRENCY = int(os.environ.get('AI_DISPATCHER_CONCURRENCY', '200'))
+
+# Render lead result PDFs on first download instead of when the lead
+# completes (leads/result_pdf.py)
+LEAD_PDF_LAZY = os.environ.get('LEAD_PDF_LAZY', 'True').lower() == 'true'
+
+# Admission control for new leads (leads/admission.py)
+LEAD_ADMISSION = {
+    'ENABLED': os.environ.get('LEAD_ADMISSION_ENABLED', 'True').lower() == 'true',
+    # Expected queue wait below which every submission is accepted as usual
+    'ACCEPT_WAIT_SECONDS': int(os.environ.get('LEAD_ADMISSION_ACCEPT_WAIT', '600')),
+    # Pending leads of a single company that mark it as a bulk caller
+    'BULK_TENANT_BACKLOG': int(os.environ.get('LEAD_ADMISSION_BULK_BACKLOG', '50')),
+    'MAX_RETRY_AFTER_SECONDS': 3600,
+    # Window used to measure worker throughput (finished leads per minute)
+    'THROUGHPUT_WINDOW_SECONDS': 900,
+    # Fallback when there is no recent throughput to measure
+    'WORKER_CONCURRENCY': int(os.environ.get('LEAD_WORKER_CONCURRENCY', '4')),
+    'DEFAULT_PROCESSING_SECONDS': 90,
+}
+
 # Email
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
@@ -1,8 +1,9 @@
 from django.contrib import admin
+from django.urls import reverse
 from django.utils.html import format_html
-from django.utils import timezone
 
 from .models import Lead
+from .result_pdf import PDF_STATUSES
 
 
 @admin.register(Lead)
@@ -146,11 +147,11 @@ class LeadAdmin(admin.ModelAdmin):
     uploaded_file_preview.short_description = 'Podgląd pliku'
 
     def result_pdf_link(self, obj):
-        """Display link to download PDF."""
-        if obj.result_pdf:
+        """Display link to download PDF (rendered on first download, see leads.result_pdf)."""
+        if obj.result_pdf or obj.status in PDF_STATUSES:
             return format_html(
                 '<a href="{}" target="_blank" class="button">Pobierz PDF</a>',
-                obj.result_pdf.url
+                reverse('leads:download_pdf', args=[obj.public_uuid])
             )
         return '-'
     result_pdf_link.short_description = 'Pobierz PDF'
@@ -158,24 +159,29 @@ class LeadAdmin(admin.ModelAdmin):
     @admin.action(description='Oznacz jako skontaktowano')
     def mark_as_contacted(self, request, queryset):
         """Mark selected leads as contacted."""
-        count = queryset.update(
-            status='contacted',
-            contacted_at=timezone.now(),
-            contacted_by=request.user.get_full_name() or request.user.email
-        )
+        # One by one, so each lead's status snapshot and waiting clients are updated
+        by = request.user.get_full_name() or request.user.email
+        count = 0
+        for lead in queryset:
+            lead.mark_contacted(by)
+            count += 1
         self.message_user(request, f'Oznaczono {count} leadów jako skontaktowane.')
 
     @admin.action(description='Przetwórz ponownie')
     def reprocess_leads(self, request, queryset):
         """Reprocess selected leads."""
-        from .tasks import process_lead_task
+        from .backlog import note_enqueued
+        from .dispatcher import enqueue_lead
 
         count = 0
-        for lead in queryset:
+        for lead in queryset.select_related('widget_config'):
             lead.status = 'pending'
             lead.processing_error = None
             lead.save()
-            process_lead_task.delay(lead.id)
+            # Snapshot first so the worker's transitions always land after it
+            lead.publish_status()
+            enqueue_lead(lead)
+            note_enqueued(lead.widget_config.company_id if lead.widget_config_id else None)
             count += 1
 
         self.message_user(request, f'Zlecono ponowne przetworzenie {count} leadów.')
@@ -0,0 +1,58 @@
+"""
+Admission control for new leads.
+
+Before a submission is queued we estimate how long the AI backlog will take
+to drain. Below LEAD_ADMISSION['ACCEPT_WAIT_SECONDS'] everything is accepted
+as usual. Above it:
+  - bulk callers (a company with a large backlog of its own) get 503 with
+    Retry-After,
+  - low-priority work (landing page leads) is deferred behind other work,
+  - everything else is accepted with an honest estimated delay.
+"""
+import math
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+from .backlog import get_backlog_stats
+from .eta import drain_seconds, processing_time_percentiles
+
+ACCEPT = 'accept'
+DEFER = 'defer'
+REJECT = 'reject'
+
+
+class AdmissionDecision(NamedTuple):
+    action: str
+    wait_seconds: int
+    retry_after: Optional[int] = None
+
+    @property
+    def accepted(self) -> bool:
+        return self.action != REJECT
+
+
+def estimate_wait_seconds(stats: dict) -> int:
+    """Seconds until the current backlog drains at the observed throughput."""
+    p50, _ = processing_time_percentiles()
+    return int(math.ceil(drain_seconds(stats['depth'], stats, p50)))
+
+
+def check_admission(company_id=None, low_priority: bool = False) -> AdmissionDecision:
+    """Decide whether a new lead should be accepted, deferred or rejected."""
+    config = settings.LEAD_ADMISSION
+    stats = get_backlog_stats()
+    wait = estimate_wait_seconds(stats)
+
+    if not config['ENABLED'] or wait <= config['ACCEPT_WAIT_SECONDS']:
+        return AdmissionDecision(ACCEPT, wait)
+
+    tenant_backlog = stats['per_company'].get(company_id, 0) if company_id is not None else 0
+    if tenant_backlog >= config['BULK_TENANT_BACKLOG']:
+        return AdmissionDecision(REJECT, wait, retry_after=min(wait, config['MAX_RETRY_AFTER_SECONDS']))
+
+    if low_priority:
+        return AdmissionDecision(DEFER, wait)
+
+    return AdmissionDecision(ACCEPT, wait)
+
@@ -0,0 +1,70 @@
+"""
+Live view of the AI processing backlog.
+
+Aggregates are computed with two queries and cached for a few seconds, so
+submission-time checks (admission control, ETA) stay cheap under load.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+from datetime import timedelta
+
+from .models import Lead
+
+BACKLOG_CACHE_KEY = 'leads:backlog_stats'
+BACKLOG_CACHE_TTL = 5  # seconds
+
+
+def _compute_backlog_stats() -> dict:
+    config = settings.LEAD_ADMISSION
+    window = config['THROUGHPUT_WINDOW_SECONDS']
+
+    queued = processing = 0
+    per_company = {}
+    rows = (
+        Lead.objects.filter(status__in=['pending', 'processing'])
+        .values('status', 'widget_config__company_id')
+        .annotate(count=Count('id'))
+    )
+    for row in rows:
+        if row['status'] == 'pending':
+            queued += row['count']
+        else:
+            processing += row['count']
+        company_id = row['widget_config__company_id']
+        if company_id is not None:
+            per_company[company_id] = per_company.get(company_id, 0) + row['count']
+
+    finished = Lead.objects.filter(
+        processing_completed_at__gte=timezone.now() - timedelta(seconds=window)
+    ).count()
+
+    return {
+        'queued': queued,
+        'processing': processing,
+        'depth': queued + processing,
+        'per_company': per_company,
+        'throughput_per_minute': finished / (window / 60),
+    }
+
+
+def get_backlog_stats() -> dict:
+    """Return cached backlog aggregates (depth, per-company backlog, throughput)."""
+    stats = cache.get(BACKLOG_CACHE_KEY)
+    if stats is None:
+        stats = _compute_backlog_stats()
+        cache.set(BACKLOG_CACHE_KEY, stats, BACKLOG_CACHE_TTL)
+    return stats
+
+
+def note_enqueued(company_id=None):
+    """Count a freshly queued lead in the cached stats until they are recomputed."""
+    stats = cache.get(BACKLOG_CACHE_KEY)
+    if stats is None:
+        return
+    stats['queued'] += 1
+    stats['depth'] += 1
+    if company_id is not None:
+        stats['per_company'][company_id] = stats['per_company'].get(company_id, 0) + 1
+    cache.set(BACKLOG_CACHE_KEY, stats, BACKLOG_CACHE_TTL)
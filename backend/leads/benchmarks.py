@@ -0,0 +1,93 @@
+"""
+Render benchmark of the lead result PDF (services.generate_result_pdf).
+
+Renders a synthetic completed lead, optionally with an uploaded 12 MP roof
+photo (embedded through its print-resolution copy, see core.print_images,
+created by the first render), and reports the best time per PDF over
+several rounds:
+
+    cold    fonts registered and the stylesheet built for every PDF, as each
+            render did before they were cached per process
+    warm    fonts and stylesheet reused, the steady state of a worker
+
+Nothing is saved: the lead is unsaved and the photo lives in a temporary
+MEDIA_ROOT.
+"""
+import gc
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from django.test import override_settings
+from django.utils import timezone
+from PIL import Image as PILImage
+
+from .models import Lead
+from .services import generate_result_pdf, register_polish_fonts, result_pdf_styles
+
+PHOTO_SIZE = (4000, 3000)
+
+
+def _synthetic_lead(photo_name=None):
+    lead = Lead(
+        public_uuid=uuid.uuid4(),
+        email='benchmark@example.invalid',
+        phone='123456789',
+        status='completed',
+        file_type='jpg' if photo_name else 'pdf',
+        roof_type='dwuspadowy',
+        pitch_angle=35,
+        roof_area=117.2,
+        dimensions={'dlugosc_m': 12, 'szerokosc_m': 8},
+        roof_elements={'kominy': 1, 'okna_dachowe': 2, 'kominki_wentylacyjne': 3},
+        ai_warnings=['Wymiary oszacowane na podstawie rzutu'],
+        estimated_price_min=24350,
+    )
+    lead.created_at = timezone.now()
+    if photo_name:
+        lead.uploaded_file.name = photo_name
+    return lead
+
+
+def _write_photo(media_root, size):
+    path = Path(media_root) / 'leads' / 'benchmark.jpg'
+    path.parent.mkdir(parents=True)
+    # Noise compresses like a real photo, a flat colour would not
+    PILImage.effect_noise(size, 64).convert('RGB').save(path, 'JPEG', quality=90)
+    return 'leads/benchmark.jpg'
+
+
+def _best_ms(render, renders, rounds, setup=None):
+    samples = []
+    for _ in range(rounds):
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for _ in range(renders):
+                if setup:
+                    setup()
+                render()
+            samples.append((time.perf_counter() - started) / renders * 1000)
+        finally:
+            gc.enable()
+    return round(min(samples), 2)
+
+
+def _cold():
+    register_polish_fonts.cache_clear()
+    result_pdf_styles.cache_clear()
+
+
+def run_pdf_benchmarks(renders=20, rounds=3, photo=False) -> dict:
+    """{'cold': ms per PDF, 'warm': ms per PDF, 'speedup': cold / warm, 'size': PDF bytes}."""
+    with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+        lead = _synthetic_lead(_write_photo(media_root, PHOTO_SIZE) if photo else None)
+
+        def render():
+            assert generate_result_pdf(lead), 'PDF generation failed'
+
+        size = len(generate_result_pdf(lead))
+        cold = _best_ms(render, renders, rounds, setup=_cold)
+        warm = _best_ms(render, renders, rounds)
+    return {'cold': cold, 'warm': warm, 'speedup': round(cold / warm, 2), 'size': size}
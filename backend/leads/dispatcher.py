@@ -0,0 +1,229 @@
+"""
+Asyncio AI dispatcher for lead analysis.
+
+A prefork Celery worker spends nearly all of process_lead_task blocked on the
+vision API, so concurrency equals process count. The dispatcher instead pulls
+leads from a Redis list and keeps hundreds of vision calls in flight on one
+event loop (bounded by a semaphore). Results are handed to a thread pool for
+persistence through the usual Lead lifecycle (mark_processing ->
+mark_completed / mark_failed), so one lead's writes and PDF never hold up
+another's.
+
+Jobs are moved, not popped, from the queue into the dispatcher's own
+processing list and removed from it once their lead is finished. Jobs a
+crashed or killed dispatcher left there are put back on the queue when a
+dispatcher of the same name starts again. Failed vision calls are retried
+like process_lead_task (MAX_RETRIES, RETRY_DELAY_SECONDS apart).
+
+Run with: python manage.py run_ai_dispatcher
+"""
+import asyncio
+import json
+import logging
+import socket
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Lead
+from .services import process_roof_image_async
+from .tasks import apply_lead_results
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_QUEUE_KEY = 'leads:ai_dispatch'
+# Deferred (low-priority) work is only pulled when the main queue is empty.
+DISPATCH_LOW_PRIORITY_KEY = 'leads:ai_dispatch:low'
+# Jobs a dispatcher has taken and not finished yet
+DISPATCH_PROCESSING_KEY = 'leads:ai_dispatch:processing:{}'
+
+MAX_RETRIES = 3
+RETRY_DELAY_SECONDS = 60
+
+# Redis broker default. Tasks whose ETA lies beyond the visibility timeout are
+# delivered again when it expires, so deferrals stay well below it.
+DEFAULT_VISIBILITY_TIMEOUT = 60 * 60
+
+
+def dispatcher_enabled() -> bool:
+    return getattr(settings, 'AI_DISPATCHER_ENABLED', False)
+
+
+def max_defer_seconds() -> int:
+    """Longest Celery countdown that cannot outlive the broker's visibility timeout."""
+    options = getattr(settings, 'CELERY_BROKER_TRANSPORT_OPTIONS', None) or {}
+    return options.get('visibility_timeout', DEFAULT_VISIBILITY_TIMEOUT) // 2
+
+
+def defer_countdown(defer_seconds: int) -> int:
+    """
+    Seconds before a deferred lead is queued at all. The dispatcher takes
+    low-priority work from a separate list instead of delaying it.
+    """
+    if not defer_seconds or dispatcher_enabled():
+        return 0
+    return min(defer_seconds, max_defer_seconds())
+
+
+def enqueue_lead(lead: Lead, quote_id: int = None, defer_seconds: int = 0) -> str:
+    """
+    Queue AI processing for a lead on the configured backend.
+    Stores and returns the job id (Celery task id or dispatcher job id).
+
+    defer_seconds > 0 marks low-priority work (see leads.admission): the
+    dispatcher puts it on its low-priority list, Celery delays it by that
+    many seconds (at most max_defer_seconds()) so it does not compete with
+    work admitted before it.
+    """
+    if dispatcher_enabled():
+        from django_redis import get_redis_connection
+
+        payload = json.dumps({'lead_id': lead.id, 'quote_id': quote_id})
+        queue_key = DISPATCH_LOW_PRIORITY_KEY if defer_seconds else DISPATCH_QUEUE_KEY
+        get_redis_connection('default').rpush(queue_key, payload)
+        job_id = f"dispatch-{lead.public_uuid}"
+    else:
+        from .tasks import process_lead_task
+
+        if defer_seconds:
+            job_id = process_lead_task.apply_async(
+                args=[lead.id], kwargs={'quote_id': quote_id},
+                countdown=defer_countdown(defer_seconds),
+            ).id
+        else:
+            job_id = process_lead_task.delay(lead.id, quote_id=quote_id).id
+
+    lead.celery_task_id = job_id
+    lead.save(update_fields=['celery_task_id'])
+    return job_id
+
+
+def _load_lead(lead_id):
+    return Lead.objects.select_related('widget_config').filter(id=lead_id).first()
+
+
+def _apply_results(lead, results, quote_id):
+    # Runs on a pool thread, which keeps its own connection between leads
+    close_old_connections()
+    try:
+        apply_lead_results(lead, results, quote_id=quote_id)
+    finally:
+        close_old_connections()
+
+
+class AIDispatcher:
+    """Pulls queued leads and runs their vision calls concurrently."""
+
+    def __init__(self, concurrency: int = None, redis_url: str = None, client=None,
+                 name: str = None, retry_delay: float = RETRY_DELAY_SECONDS):
+        self.concurrency = concurrency or settings.AI_DISPATCHER_CONCURRENCY
+        self.redis_url = redis_url or settings.REDIS_URL
+        self.client = client
+        # Stable across restarts, so a restarted dispatcher finds its own unfinished jobs
+        self.name = name or socket.gethostname()
+        self.processing_key = DISPATCH_PROCESSING_KEY.format(self.name)
+        self.retry_delay = retry_delay
+        self._semaphore = None
+        self._tasks = set()
+        self._stopping = False
+
+    def stop(self):
+        """Stop pulling new work; in-flight leads are allowed to finish."""
+        self._stopping = True
+
+    async def run(self):
+        import redis.asyncio as aioredis
+
+        if self.client is None:
+            from openai import AsyncOpenAI
+            self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+
+        connection = aioredis.from_url(self.redis_url)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        await self.recover(connection)
+        logger.info(f"AI dispatcher {self.name} started (concurrency={self.concurrency})")
+
+        try:
+            while not self._stopping:
+                # Only pull a job once there is a free slot for it, so the
+                # backlog stays in Redis instead of piling up in memory.
+                await self._semaphore.acquire()
+                item = await self._next_job(connection)
+                if item is None:
+                    self._semaphore.release()
+                    continue
+
+                task = asyncio.create_task(self._run_job(connection, item))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            if self._tasks:
+                logger.info(f"AI dispatcher draining {len(self._tasks)} in-flight leads")
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            await connection.aclose()
+            logger.info("AI dispatcher stopped")
+
+    async def recover(self, connection) -> int:
+        """Put jobs left in this dispatcher's processing list back at the front of the queue."""
+        recovered = 0
+        while await connection.lmove(self.processing_key, DISPATCH_QUEUE_KEY, 'RIGHT', 'LEFT'):
+            recovered += 1
+        if recovered:
+            logger.warning(f"AI dispatcher {self.name} requeued {recovered} unfinished leads")
+        return recovered
+
+    async def _next_job(self, connection):
+        # Low-priority work is only taken while the main queue is empty
+        item = await connection.lmove(DISPATCH_QUEUE_KEY, self.processing_key, 'LEFT', 'RIGHT')
+        if item is None:
+            item = await connection.lmove(DISPATCH_LOW_PRIORITY_KEY, self.processing_key, 'LEFT', 'RIGHT')
+        if item is None:
+            item = await connection.blmove(DISPATCH_QUEUE_KEY, self.processing_key, 1, 'LEFT', 'RIGHT')
+        return item
+
+    async def _run_job(self, connection, item):
+        try:
+            job = json.loads(item)
+            await self.process(job['lead_id'], job.get('quote_id'))
+        except Exception as e:
+            logger.error(f"Dispatcher job {item!r} failed: {e}")
+        finally:
+            # Acknowledge: the lead is finished (or failed for good)
+            await connection.lrem(self.processing_key, 1, item)
+            self._semaphore.release()
+
+    async def process(self, lead_id: int, quote_id: int = None):
+        """Analyse a single lead and persist the outcome, retrying failed vision calls."""
+        lead = await sync_to_async(_load_lead)(lead_id)
+        if lead is None:
+            logger.error(f"Lead {lead_id} not found")
+            return
+
+        logger.info(f"Processing lead {lead.public_uuid}")
+        await sync_to_async(lead.mark_processing)()
+
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                results = await process_roof_image_async(lead.uploaded_file.path, self.client)
+                break
+            except Exception as e:
+                if attempt == MAX_RETRIES:
+                    logger.error(f"Error processing lead {lead_id}: {e}")
+                    await sync_to_async(lead.mark_failed)(str(e))
+                    return
+                logger.warning(f"Error processing lead {lead_id} (attempt {attempt + 1}), retrying: {e}")
+                await asyncio.sleep(self.retry_delay)
+
+        if not results:
+            await sync_to_async(lead.mark_failed)("AI processing returned no results")
+            return
+
+        # Saving is not retried: that would pay for the vision calls again
+        try:
+            await sync_to_async(_apply_results, thread_sensitive=False)(lead, results, quote_id)
+        except Exception as e:
+            logger.error(f"Error saving results of lead {lead_id}: {e}")
+            await sync_to_async(lead.mark_failed)(str(e))
+            return
+        logger.info(f"Lead {lead.public_uuid} processed successfully")
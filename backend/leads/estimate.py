@@ -0,0 +1,37 @@
+"""
+Price estimates for leads.
+
+The AI results of a lead are mapped onto Quote inputs the same way a quote's
+own analysis maps them (quotes.services.ai_processor.ai_result_fields) and
+priced with the quote calculator at the company's default material, margin
+and VAT (see materials.company_prices.get_company_pricing). The pricing is
+cached per company and the quote is never saved, so an estimate costs no
+queries once the company's pricing is warm.
+"""
+import logging
+
+from materials.company_prices import get_company_pricing
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_price(results: dict, company_id=None):
+    """
+    Gross price (PLN) of the roof in the AI results at the company's default
+    pricing, or None when the results hold no building dimensions.
+    """
+    from quotes.models import Quote
+    from quotes.services.ai_processor import ai_result_fields
+    from quotes.services.calculator import calculate_roof_materials
+
+    dimensions = results.get('wymiary_budynku') or {}
+    if not dimensions.get('dlugosc_m') or not dimensions.get('szerokosc_m'):
+        return None
+
+    pricing = get_company_pricing(company_id)
+    if pricing.profile is None:
+        logger.warning(f"No active material to estimate a price for company {company_id}")
+        return None
+
+    quote = Quote(margin_percent=pricing.margin_percent, vat_rate=pricing.vat_rate, **ai_result_fields(results))
+    return calculate_roof_materials(quote, pricing.profile)['summary']['total_gross']
@@ -0,0 +1,137 @@
+"""
+Processing-time estimates for leads.
+
+Combines the lead's position in the AI queue with a rolling sample of recent
+processing durations (processing_completed_at - processing_started_at) to
+give a real ETA at submit time and on the status endpoints. A lead deferred
+by admission control waits at least its countdown. The same numbers drive
+the poll interval suggested to clients.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .backlog import get_backlog_stats
+
+DURATIONS_CACHE_KEY = 'leads:eta:durations'
+DURATIONS_SAMPLE_SIZE = 200
+DURATIONS_TTL = 60 * 60 * 24
+
+MIN_POLL_INTERVAL = 2
+MAX_POLL_INTERVAL = 30
+
+
+def record_processing_time(seconds: float):
+    """Add a finished lead's processing time to the rolling sample."""
+    durations = cache.get(DURATIONS_CACHE_KEY, [])
+    durations.append(round(seconds, 1))
+    cache.set(DURATIONS_CACHE_KEY, durations[-DURATIONS_SAMPLE_SIZE:], DURATIONS_TTL)
+
+
+def processing_time_percentiles() -> tuple:
+    """(p50, p90) processing time in seconds; configured default without data."""
+    durations = sorted(cache.get(DURATIONS_CACHE_KEY, []))
+    if not durations:
+        default = settings.LEAD_ADMISSION['DEFAULT_PROCESSING_SECONDS']
+        return default, default * 2
+
+    def percentile(p):
+        return durations[min(len(durations) - 1, int(p * len(durations)))]
+
+    return percentile(0.5), percentile(0.9)
+
+
+def drain_seconds(ahead: int, stats: dict, per_lead_seconds: float) -> float:
+    """Time for the workers to get through `ahead` leads."""
+    if ahead <= 0:
+        return 0
+    per_minute = stats['throughput_per_minute']
+    if per_minute > 0:
+        return ahead / per_minute * 60
+    rounds = math.ceil(ahead / settings.LEAD_ADMISSION['WORKER_CONCURRENCY'])
+    return rounds * per_lead_seconds
+
+
+def poll_interval(seconds: float) -> int:
+    """Suggested client poll interval: roughly ten polls over the expected wait."""
+    return int(min(MAX_POLL_INTERVAL, max(MIN_POLL_INTERVAL, seconds / 10)))
+
+
+def format_eta(seconds_min: float, seconds_max: float) -> str:
+    """Human readable (Polish) time range, e.g. '2-5 minut' or 'ok. 2 godz.'."""
+    minutes_min = max(1, math.ceil(seconds_min / 60))
+    minutes_max = max(minutes_min, math.ceil(seconds_max / 60))
+    if minutes_max >= 90:
+        return f'ok. {math.ceil(minutes_max / 60)} godz.'
+    if minutes_min == minutes_max:
+        return f'ok. {minutes_max} minut'
+    return f'{minutes_min}-{minutes_max} minut'
+
+
+def _estimate(ahead: int, stats: dict, elapsed: float = 0, queue_wait: float = None, deferred: float = 0) -> dict:
+    p50, p90 = processing_time_percentiles()
+    if queue_wait is None:
+        queue_wait = drain_seconds(ahead, stats, p50)
+    # A deferred lead is not queued before its countdown ends
+    queue_wait = max(queue_wait, deferred)
+    seconds_min = queue_wait + max(p50 - elapsed, 0)
+    seconds_max = queue_wait + max(p90 - elapsed, 0)
+    return {
+        'queue_position': ahead,
+        'estimated_seconds': int(seconds_min),
+        'estimated_seconds_max': int(seconds_max),
+        'estimated_time': format_eta(seconds_min, seconds_max),
+        'poll_interval': poll_interval(seconds_min),
+    }
+
+
+def estimate_for_submission(company_id=None, deferred: float = 0) -> dict:
+    """
+    ETA for a lead that is about to be queued.
+    deferred: admission-control countdown before it is queued (see
+    leads.dispatcher.defer_countdown).
+    """
+    stats = get_backlog_stats()
+    # The cached global depth may lag a few seconds behind; the company's own
+    # backlog is a lower bound for what is ahead of the new lead.
+    ahead = max(stats['queued'], stats['per_company'].get(company_id, 0))
+    return _estimate(ahead, stats, deferred=deferred)
+
+
+def estimate_for_lead(lead) -> dict:
+    """ETA for a pending or processing lead (empty dict otherwise)."""
+    if lead.status == 'pending':
+        ahead = type(lead).objects.filter(status='pending', id__lt=lead.id).count()
+        return _estimate(ahead, get_backlog_stats())
+    if lead.status == 'processing':
+        elapsed = 0
+        if lead.processing_started_at:
+            elapsed = (timezone.now() - lead.processing_started_at).total_seconds()
+        return _estimate(0, get_backlog_stats(), elapsed=elapsed)
+    return {}
+
+
+def estimate_from_snapshot(snapshot: dict) -> dict:
+    """
+    ETA for a cached status snapshot (see leads.status_cache), without a
+    database query: the queue wait estimated at submission is counted down.
+    """
+    status = snapshot['payload']['status']
+    if status == 'processing':
+        elapsed = time.time() - snapshot['started_at'] if snapshot.get('started_at') else 0
+        return _estimate(0, None, elapsed=elapsed)
+    if status != 'pending':
+        return {}
+
+    eta = snapshot.get('eta')
+    if not eta:
+        return _estimate(0, None)
+
+    p50, _ = processing_time_percentiles()
+    queue_total = max(eta['estimated_seconds'] - p50, 0)
+    queue_left = max(queue_total - (time.time() - eta['at']), 0)
+    ahead = math.ceil(eta['queue_position'] * queue_left / queue_total) if queue_total else 0
+    return _estimate(ahead, None, queue_wait=queue_left)
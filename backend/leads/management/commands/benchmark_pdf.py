@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from leads.benchmarks import PHOTO_SIZE, run_pdf_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark lead result PDF rendering, with and without cached fonts and styles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=20, help='PDFs per round (default: 20).')
+        parser.add_argument('--rounds', type=int, default=3, help='Timed rounds, the best is reported (default: 3).')
+        parser.add_argument('--photo', action='store_true', help='Include an uploaded 4000x3000 roof photo.')
+
+    def handle(self, *args, **options):
+        results = run_pdf_benchmarks(renders=options['renders'], rounds=options['rounds'], photo=options['photo'])
+
+        photo = f'{PHOTO_SIZE[0]}x{PHOTO_SIZE[1]} photo' if options['photo'] else 'no photo'
+        self.stdout.write(f"Lead result PDF ({photo}, {results['size'] / 1024:.0f} KiB)")
+        self.stdout.write(f"{'cold':<8}{results['cold']:>10.2f} ms/PDF  (fonts and styles per render)")
+        self.stdout.write(f"{'warm':<8}{results['warm']:>10.2f} ms/PDF  (cached per process)")
+        self.stdout.write(self.style.SUCCESS(f"Speedup {results['speedup']:.2f}x per PDF"))
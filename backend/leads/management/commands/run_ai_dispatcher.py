@@ -0,0 +1,35 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from leads.dispatcher import AIDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Run the asyncio AI dispatcher that analyses queued leads concurrently.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Maximum number of leads analysed at once (default: AI_DISPATCHER_CONCURRENCY).',
+        )
+        parser.add_argument(
+            '--name',
+            default=None,
+            help='Dispatcher name, unique per running dispatcher and kept across restarts '
+                 'so unfinished leads are picked up again (default: host name).',
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = AIDispatcher(concurrency=options['concurrency'], name=options['name'])
+        self.stdout.write(f"Starting AI dispatcher {dispatcher.name} (concurrency={dispatcher.concurrency})")
+        asyncio.run(self._run(dispatcher))
+
+    async def _run(self, dispatcher):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, dispatcher.stop)
+        await dispatcher.run()
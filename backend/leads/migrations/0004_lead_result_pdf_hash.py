@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0003_lead_widget_config_lead_widget_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='result_pdf_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Skrót danych PDF'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.conf import settings
 from django.utils import timezone
 
 
@@ -155,6 +156,13 @@ class Lead(models.Model):
         null=True,
         verbose_name='PDF z wynikami'
     )
+    # Fingerprint of the inputs result_pdf was rendered from (see leads.result_pdf)
+    result_pdf_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name='Skrót danych PDF'
+    )
 
     # Processing info
     processing_error = models.TextField(
@@ -215,11 +223,45 @@ class Lead(models.Model):
     def __str__(self):
         return f"Lead {self.public_uuid} - {self.email} ({self.get_status_display()})"
 
+    # Statuses after which nothing changes for a waiting client (leads are
+    # only marked failed once their retries are used up)
+    FINAL_STATUSES = ('completed', 'failed', 'contacted', 'converted')
+
+    def status_payload(self) -> dict:
+        """Public status fields shared by the status endpoints and status events."""
+        data = {
+            'status': self.status,
+            'status_display': self.get_status_display(),
+        }
+        if self.status == 'completed':
+            data.update({
+                'roof_type': self.roof_type,
+                'pitch_angle': str(self.pitch_angle) if self.pitch_angle else None,
+                'roof_area': str(self.roof_area) if self.roof_area else None,
+                'estimated_price': str(self.estimated_price_min) if self.estimated_price_min else None,
+                # Lazy PDFs are rendered on first download
+                'has_pdf': bool(self.result_pdf) or settings.LEAD_PDF_LAZY,
+            })
+        elif self.status == 'failed':
+            data['error'] = self.processing_error
+        return data
+
+    def publish_status(self):
+        """
+        Refresh the cached status snapshot (see leads.status_cache) and
+        notify clients waiting on this lead (see core.events).
+        """
+        from core.events import publish
+        from .status_cache import write_snapshot
+        snapshot = write_snapshot(self)
+        publish('lead', self.public_uuid, snapshot['payload'])
+
     def mark_processing(self):
         """Mark lead as processing."""
         self.status = 'processing'
         self.processing_started_at = timezone.now()
         self.save(update_fields=['status', 'processing_started_at', 'updated_at'])
+        self.publish_status()
 
     def mark_completed(self, results: dict):
         """Mark lead as completed with AI results."""
@@ -270,6 +312,13 @@ class Lead(models.Model):
         self.estimated_price_min = results.get('szacowana_cena_od')
 
         self.save()
+        self.publish_status()
+
+        if self.processing_started_at:
+            from .eta import record_processing_time
+            record_processing_time(
+                (self.processing_completed_at - self.processing_started_at).total_seconds()
+            )
 
     def mark_failed(self, error: str):
         """Mark lead as failed with error message."""
@@ -277,6 +326,7 @@ class Lead(models.Model):
         self.processing_error = error
         self.processing_completed_at = timezone.now()
         self.save(update_fields=['status', 'processing_error', 'processing_completed_at', 'updated_at'])
+        self.publish_status()
 
     def mark_contacted(self, by: str = None):
         """Mark lead as contacted."""
@@ -285,3 +335,4 @@ class Lead(models.Model):
         if by:
             self.contacted_by = by
         self.save(update_fields=['status', 'contacted_at', 'contacted_by', 'updated_at'])
+        self.publish_status()
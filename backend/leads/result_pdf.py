@@ -0,0 +1,110 @@
+"""
+Stored result PDFs of leads, rendered on first download.
+
+Many homeowners never open their PDF, so with LEAD_PDF_LAZY the worker no
+longer renders one when a lead completes (leads linked to a salesperson's
+quote still get it at once, the quote keeps a copy). The download views
+call result_pdf() instead: it serves the stored file while it is current
+and renders and stores a new one otherwise.
+
+A PDF is current when its fingerprint, a hash of everything
+services.generate_result_pdf prints plus RESULT_PDF_VERSION, matches the
+lead's. Bump RESULT_PDF_VERSION when the PDF layout changes, so stored PDFs
+are rendered again on their next download. The fingerprint is also the
+strong ETag of the download, so a browser holding the current PDF gets a
+304 without it being read from storage.
+"""
+import hashlib
+import json
+import logging
+
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .services import generate_result_pdf
+
+logger = logging.getLogger(__name__)
+
+RESULT_PDF_VERSION = 1
+
+# Statuses in which a lead has results to print
+PDF_STATUSES = ('completed', 'contacted', 'converted')
+
+FINGERPRINT_FIELDS = (
+    'public_uuid', 'email', 'phone', 'file_type', 'roof_type', 'pitch_angle', 'roof_area',
+    'dimensions', 'roof_elements', 'ai_warnings', 'estimated_price_min', 'created_at',
+)
+
+
+def pdf_fingerprint(lead) -> str:
+    """Hash of the lead fields in its result PDF and the PDF layout version."""
+    inputs = {field: getattr(lead, field) for field in FINGERPRINT_FIELDS}
+    inputs['uploaded_file'] = lead.uploaded_file.name or ''
+    inputs['version'] = RESULT_PDF_VERSION
+    encoded = json.dumps(inputs, cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def is_current(lead, fingerprint=None) -> bool:
+    """Whether the lead's stored PDF matches its current fields."""
+    if not lead.result_pdf or lead.result_pdf_hash != (fingerprint or pdf_fingerprint(lead)):
+        return False
+    return lead.result_pdf.storage.exists(lead.result_pdf.name)
+
+
+def save_result_pdf(lead, content: bytes = None, fingerprint=None):
+    """
+    Store a result PDF of the lead (rendered here unless content is given)
+    with its fingerprint, replacing an older one. Returns the PDF bytes or
+    None when rendering failed.
+    """
+    fingerprint = fingerprint or pdf_fingerprint(lead)
+    content = content or generate_result_pdf(lead)
+    if not content:
+        return None
+
+    if lead.result_pdf:
+        lead.result_pdf.delete(save=False)
+    lead.result_pdf.save(f"wycena_{lead.public_uuid}.pdf", ContentFile(content), save=False)
+    lead.result_pdf_hash = fingerprint
+    lead.save(update_fields=['result_pdf', 'result_pdf_hash'])
+    logger.info(f"PDF generated for lead {lead.public_uuid}")
+    return content
+
+
+def result_pdf(lead, fingerprint=None):
+    """The lead's current stored PDF (a FieldFile), rendered first if needed. None without results."""
+    fingerprint = fingerprint or pdf_fingerprint(lead)
+    if is_current(lead, fingerprint):
+        return lead.result_pdf
+    if lead.status not in PDF_STATUSES:
+        return None
+    if save_result_pdf(lead, fingerprint=fingerprint) is None:
+        return None
+    return lead.result_pdf
+
+
+def result_pdf_response(request, lead, filename):
+    """
+    Download response of the lead's result PDF with its fingerprint as a
+    strong ETag (304 when the client has it), or None without a PDF.
+    """
+    fingerprint = pdf_fingerprint(lead)
+    etag = f'"{fingerprint}"'
+    if lead.status in PDF_STATUSES:
+        # Revalidation is answered before touching storage
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            patch_cache_control(not_modified, private=True, no_cache=True)
+            return not_modified
+
+    pdf = result_pdf(lead, fingerprint)
+    if pdf is None:
+        return None
+
+    response = FileResponse(pdf.open('rb'), as_attachment=True, filename=filename, content_type='application/pdf')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -4,12 +4,15 @@ Based on the working code from quotes/services/ai_processor.py
 """
 import os
 import io
+import asyncio
 import json
 import re
 import math
 import base64
 import logging
-from typing import Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import NamedTuple, Optional
 from pathlib import Path
 
 from django.conf import settings
@@ -27,14 +30,20 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from PIL import Image as PILImage
 
+from core.print_images import print_image_path
+
 logger = logging.getLogger(__name__)
 
 # Initialize OpenAI client
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
 
+@lru_cache(maxsize=None)
 def register_polish_fonts():
-    """Register fonts with Polish character support."""
+    """
+    Register fonts with Polish character support. Runs once per process,
+    later calls return the registered font name.
+    """
     font_paths = [
         # macOS
         '/System/Library/Fonts/Supplemental/Arial Unicode.ttf',
@@ -305,43 +314,12 @@ def validate_roof_type_consistency(data: dict) -> dict:
 
 
 # ============================================
-# MAIN PROCESSING FUNCTION
+# PROMPTS
 # ============================================
 
-def process_roof_image(file_path: str) -> Optional[dict]:
-    """
-    Process roof image using OpenAI Vision API to extract dimensions.
-    Uses a two-step approach for better accuracy.
-
-    Returns:
-        dict with extracted data or None if processing failed
-    """
-    try:
-        logger.info(f"Processing image: {file_path}")
-
-        if not os.path.exists(file_path):
-            logger.error(f"File not found: {file_path}")
-            return None
-            
-        file_size = os.path.getsize(file_path)
-        logger.info(f"DEBUG: Image file size: {file_size} bytes")
-        if file_size == 0:
-            logger.error("DEBUG: File is empty!")
-            return None
-
-        # Encode image
-        image_data = encode_image_to_base64(file_path)
-        media_type = get_image_media_type(file_path)
-        logger.info(f"DEBUG: Media type: {media_type}")
-        
-        if not settings.OPENAI_API_KEY:
-            logger.error("DEBUG: OPENAI_API_KEY is missing!")
-            return None
-            
-        logger.info(f"DEBUG: Using API Key: {settings.OPENAI_API_KEY[:5]}...")
+AI_MODEL = "gpt-4o-2024-11-20"
 
-        # STEP 1: First, extract ONLY the angle with a focused query
-        angle_prompt = """Przeanalizuj ten rysunek techniczny dachu.
+ANGLE_PROMPT = """Przeanalizuj ten rysunek techniczny dachu.
 
 TWOJE JEDYNE ZADANIE: Znajdź kąt nachylenia dachu.
 
@@ -370,49 +348,7 @@ Jeśli nie ma kąta - odpowiedz: 0
 
 ODPOWIEDŹ (tylko liczba):"""
 
-        try:
-            angle_response = client.chat.completions.create(
-                model="gpt-4o-2024-11-20",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": angle_prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:{media_type};base64,{image_data}",
-                                    "detail": "high"
-                                }
-                            }
-                        ],
-                    }
-                ],
-                max_tokens=50,
-                temperature=0,
-            )
-
-            angle_text = angle_response.choices[0].message.content.strip()
-            logger.info(f"Angle extraction response: '{angle_text}'")
-
-            angle_match = re.search(r'(\d+)', angle_text)
-            extracted_angle = int(angle_match.group(1)) if angle_match else 0
-            logger.info(f"Extracted angle: {extracted_angle}")
-
-        except Exception as e:
-            logger.error(f"Angle extraction failed: {e}")
-            extracted_angle = 0
-
-        # STEP 2: Main analysis with the extracted angle hint
-        system_message = f"""Jesteś precyzyjnym ekspertem od analizy rysunków technicznych dachów.
-
-WAŻNE: Wstępna analiza wykryła kąt nachylenia: {extracted_angle}°
-Użyj tej wartości dla kat_nachylenia, chyba że WYRAŹNIE widzisz inną wartość na rysunku.
-
-Jeśli wstępna analiza dała 0, oznacza to że kąt nie został znaleziony - wtedy też wpisz 0."""
-
-        # Enhanced roof analysis prompt
-        prompt = """Jesteś ekspertem dekarzem analizującym rzut dachu.
+ROOF_ANALYSIS_PROMPT = """Jesteś ekspertem dekarzem analizującym rzut dachu.
 
 ## KRYTYCZNE ZASADY:
 
@@ -557,96 +493,243 @@ STRUKTURA JSON:
 
 Zwróć WYŁĄCZNIE poprawny JSON. Żadnych formuł, żadnego kodu, żadnego markdown."""
 
-        # Call OpenAI API for main analysis
-        response = client.chat.completions.create(
-            model="gpt-4o-2024-11-20",
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_message
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{media_type};base64,{image_data}",
-                                "detail": "high"
-                            }
-                        }
-                    ],
-                }
-            ],
-            max_tokens=4096,
-            temperature=0,
-        )
 
-        # Parse response
-        response_text = response.choices[0].message.content
-        logger.info(f"AI raw response (first 1000 chars): {response_text[:1000] if response_text else 'EMPTY'}")
+def build_analysis_system_message(extracted_angle: int) -> str:
+    """System message for the main analysis, carrying the angle hint from step 1."""
+    return f"""Jesteś precyzyjnym ekspertem od analizy rysunków technicznych dachów.
 
-        if not response_text:
-            logger.error("AI returned empty response")
-            return None
+WAŻNE: Wstępna analiza wykryła kąt nachylenia: {extracted_angle}°
+Użyj tej wartości dla kat_nachylenia, chyba że WYRAŹNIE widzisz inną wartość na rysunku.
 
-        # Clean up response
-        response_text = response_text.strip()
+Jeśli wstępna analiza dała 0, oznacza to że kąt nie został znaleziony - wtedy też wpisz 0."""
 
-        if response_text.startswith('```'):
-            first_newline = response_text.find('\n')
-            if first_newline != -1:
-                response_text = response_text[first_newline + 1:]
 
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
+def _image_content(image_data: str, media_type: str) -> dict:
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:{media_type};base64,{image_data}",
+            "detail": "high"
+        }
+    }
 
-        response_text = response_text.strip()
 
-        if not response_text.startswith('{'):
-            json_start = response_text.find('{')
-            if json_start != -1:
-                response_text = response_text[json_start:]
+def build_angle_request(image_data: str, media_type: str) -> dict:
+    """Keyword arguments for the step 1 (angle only) chat completion."""
+    return {
+        "model": AI_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": ANGLE_PROMPT},
+                    _image_content(image_data, media_type),
+                ],
+            }
+        ],
+        "max_tokens": 50,
+        "temperature": 0,
+    }
 
-        if not response_text.endswith('}'):
-            json_end = response_text.rfind('}')
-            if json_end != -1:
-                response_text = response_text[:json_end + 1]
 
-        result = json.loads(response_text)
+def build_analysis_request(image_data: str, media_type: str, extracted_angle: int) -> dict:
+    """Keyword arguments for the step 2 (full analysis) chat completion."""
+    return {
+        "model": AI_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": build_analysis_system_message(extracted_angle)
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": ROOF_ANALYSIS_PROMPT
+                    },
+                    _image_content(image_data, media_type),
+                ],
+            }
+        ],
+        "max_tokens": 4096,
+        "temperature": 0,
+    }
 
-        # Apply post-processing validation (dimensions first!)
-        result = validate_dimensions(result)
-        result = validate_ai_response(result)
-        result = validate_roof_type_consistency(result)
 
-        logger.info(f"Final validated result: {result}")
+def parse_angle_response(angle_text: str) -> int:
+    """Extract the angle from the step 1 answer (0 when nothing was found)."""
+    angle_text = (angle_text or '').strip()
+    logger.info(f"Angle extraction response: '{angle_text}'")
 
-        return result
+    angle_match = re.search(r'(\d+)', angle_text)
+    extracted_angle = int(angle_match.group(1)) if angle_match else 0
+    logger.info(f"Extracted angle: {extracted_angle}")
+    return extracted_angle
+
+
+def _validate_result(result: dict) -> dict:
+    # Apply post-processing validation (dimensions first!)
+    result = validate_dimensions(result)
+    result = validate_ai_response(result)
+    result = validate_roof_type_consistency(result)
+    return result
+
+
+def parse_analysis_response(response_text: Optional[str]) -> Optional[dict]:
+    """
+    Parse and validate the JSON returned by the main analysis.
+
+    Returns:
+        dict with validated data or None if the response could not be parsed
+    """
+    logger.info(f"AI raw response (first 1000 chars): {response_text[:1000] if response_text else 'EMPTY'}")
 
+    if not response_text:
+        logger.error("AI returned empty response")
+        return None
+
+    # Clean up response
+    response_text = response_text.strip()
+
+    if response_text.startswith('```'):
+        first_newline = response_text.find('\n')
+        if first_newline != -1:
+            response_text = response_text[first_newline + 1:]
+
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+
+    response_text = response_text.strip()
+
+    if not response_text.startswith('{'):
+        json_start = response_text.find('{')
+        if json_start != -1:
+            response_text = response_text[json_start:]
+
+    if not response_text.endswith('}'):
+        json_end = response_text.rfind('}')
+        if json_end != -1:
+            response_text = response_text[:json_end + 1]
+
+    try:
+        result = _validate_result(json.loads(response_text))
+        logger.info(f"Final validated result: {result}")
+        return result
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse AI response. Error: {str(e)}")
 
-        # Try to fix common JSON issues
+    # Try to fix common JSON issues
+    try:
+        cleaned = re.sub(r'//.*$', '', response_text, flags=re.MULTILINE)
+        cleaned = re.sub(r',\s*([}\]])', r'\1', cleaned)
+        return _validate_result(json.loads(cleaned))
+    except Exception:
+        return None
+
+
+def load_image_payload(file_path: str) -> Optional[tuple]:
+    """
+    Read and base64-encode an uploaded file for the vision API.
+
+    Returns:
+        (image_data, media_type) or None if the file or API key is unusable
+    """
+    logger.info(f"Processing image: {file_path}")
+
+    if not os.path.exists(file_path):
+        logger.error(f"File not found: {file_path}")
+        return None
+
+    file_size = os.path.getsize(file_path)
+    logger.info(f"DEBUG: Image file size: {file_size} bytes")
+    if file_size == 0:
+        logger.error("DEBUG: File is empty!")
+        return None
+
+    # Encode image
+    image_data = encode_image_to_base64(file_path)
+    media_type = get_image_media_type(file_path)
+    logger.info(f"DEBUG: Media type: {media_type}")
+
+    if not settings.OPENAI_API_KEY:
+        logger.error("DEBUG: OPENAI_API_KEY is missing!")
+        return None
+
+    logger.info(f"DEBUG: Using API Key: {settings.OPENAI_API_KEY[:5]}...")
+    return image_data, media_type
+
+
+# ============================================
+# MAIN PROCESSING FUNCTION
+# ============================================
+
+def process_roof_image(file_path: str) -> Optional[dict]:
+    """
+    Process roof image using OpenAI Vision API to extract dimensions.
+    Uses a two-step approach for better accuracy.
+
+    Returns:
+        dict with extracted data or None if processing failed
+    """
+    try:
+        payload = load_image_payload(file_path)
+        if payload is None:
+            return None
+        image_data, media_type = payload
+
+        # STEP 1: First, extract ONLY the angle with a focused query
         try:
-            if 'response_text' in dir():
-                cleaned = re.sub(r'//.*$', '', response_text, flags=re.MULTILINE)
-                cleaned = re.sub(r',\s*([}\]])', r'\1', cleaned)
-                result = json.loads(cleaned)
+            angle_response = client.chat.completions.create(
+                **build_angle_request(image_data, media_type)
+            )
+            extracted_angle = parse_angle_response(angle_response.choices[0].message.content)
+        except Exception as e:
+            logger.error(f"Angle extraction failed: {e}")
+            extracted_angle = 0
+
+        # STEP 2: Main analysis with the extracted angle hint
+        response = client.chat.completions.create(
+            **build_analysis_request(image_data, media_type, extracted_angle)
+        )
+        return parse_analysis_response(response.choices[0].message.content)
+
+    except Exception as e:
+        logger.error(f"AI processing error: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return None
 
-                result = validate_dimensions(result)
-                result = validate_ai_response(result)
-                result = validate_roof_type_consistency(result)
 
-                return result
-        except:
-            pass
+async def process_roof_image_async(file_path: str, async_client) -> Optional[dict]:
+    """
+    Asyncio variant of process_roof_image for the AI dispatcher.
 
+    Same two-step flow, but both vision calls are awaited on the shared
+    AsyncOpenAI client so one event loop can keep many requests in flight.
+    Errors of the main analysis call (timeouts, rate limits, ...) are raised
+    for the dispatcher to retry; None means the file or the answer is
+    unusable and retrying will not help.
+    """
+    payload = await asyncio.to_thread(load_image_payload, file_path)
+    if payload is None:
         return None
+    image_data, media_type = payload
+
+    try:
+        angle_response = await async_client.chat.completions.create(
+            **build_angle_request(image_data, media_type)
+        )
+        extracted_angle = parse_angle_response(angle_response.choices[0].message.content)
+    except Exception as e:
+        logger.error(f"Angle extraction failed: {e}")
+        extracted_angle = 0
+
+    response = await async_client.chat.completions.create(
+        **build_analysis_request(image_data, media_type, extracted_angle)
+    )
+    try:
+        return parse_analysis_response(response.choices[0].message.content)
     except Exception as e:
         logger.error(f"AI processing error: {str(e)}")
         import traceback
@@ -658,117 +741,176 @@ Zwróć WYŁĄCZNIE poprawny JSON. Żadnych formuł, żadnego kodu, żadnego mar
 # PDF GENERATION
 # ============================================
 
-def generate_result_pdf(lead) -> Optional[bytes]:
+# Largest size of the uploaded image in the result PDF (width, height)
+RESULT_IMAGE_CM = (15, 10)
+
+
+class ResultPdfStyles(NamedTuple):
+    """Read-only colours, paragraph styles and table styles of the result PDF."""
+    colors: MappingProxyType
+    paragraphs: MappingProxyType
+    tables: MappingProxyType
+
+
+@lru_cache(maxsize=None)
+def result_pdf_styles() -> ResultPdfStyles:
     """
-    Generate a professionally styled PDF with roof analysis results.
-    Returns PDF content as bytes.
+    The result PDF's stylesheet, built once per process (after the fonts are
+    registered) and shared by every render; renders must not modify it.
     """
-    try:
-        buffer = io.BytesIO()
-        polish_font = register_polish_fonts()
-
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=2*cm,
-            leftMargin=2*cm,
-            topMargin=1.5*cm,
-            bottomMargin=1.5*cm
-        )
+    polish_font = register_polish_fonts()
+
+    # Colors
+    colors = {
+        'primary': HexColor('#1a365d'),
+        'secondary': HexColor('#2d3748'),
+        'accent': HexColor('#3182ce'),
+        'success': HexColor('#38a169'),
+        'text': HexColor('#4a5568'),
+        'muted': HexColor('#718096'),
+        'faint': HexColor('#a0aec0'),
+        'light_gray': HexColor('#f7fafc'),
+        'border': HexColor('#e2e8f0'),
+        'price_background': HexColor('#f0fff4'),
+    }
 
-        # Colors
-        primary_color = HexColor('#1a365d')
-        secondary_color = HexColor('#2d3748')
-        accent_color = HexColor('#3182ce')
-        success_color = HexColor('#38a169')
-        text_color = HexColor('#4a5568')
-        light_gray = HexColor('#f7fafc')
-        border_color = HexColor('#e2e8f0')
-
-        # Styles
-        title_style = ParagraphStyle(
+    # Styles
+    paragraphs = {
+        'title': ParagraphStyle(
             'CustomTitle',
             fontName=polish_font,
             fontSize=28,
-            textColor=primary_color,
+            textColor=colors['primary'],
             spaceAfter=5,
             alignment=TA_CENTER,
             leading=34
-        )
-
-        subtitle_style = ParagraphStyle(
+        ),
+        'subtitle': ParagraphStyle(
             'Subtitle',
             fontName=polish_font,
             fontSize=11,
-            textColor=text_color,
+            textColor=colors['text'],
             spaceAfter=20,
             alignment=TA_CENTER
-        )
-
-        heading_style = ParagraphStyle(
+        ),
+        'heading': ParagraphStyle(
             'CustomHeading',
             fontName=polish_font,
             fontSize=14,
-            textColor=primary_color,
+            textColor=colors['primary'],
             spaceBefore=25,
             spaceAfter=12,
             leading=18
-        )
-
-        normal_style = ParagraphStyle(
+        ),
+        'normal': ParagraphStyle(
             'CustomNormal',
             fontName=polish_font,
             fontSize=11,
-            textColor=text_color,
+            textColor=colors['text'],
             spaceAfter=6,
             leading=16
-        )
-
-        label_style = ParagraphStyle(
+        ),
+        'label': ParagraphStyle(
             'Label',
             fontName=polish_font,
             fontSize=10,
-            textColor=HexColor('#718096'),
+            textColor=colors['muted'],
             spaceAfter=2
-        )
-
-        value_style = ParagraphStyle(
+        ),
+        'value': ParagraphStyle(
             'Value',
             fontName=polish_font,
             fontSize=12,
-            textColor=secondary_color,
+            textColor=colors['secondary'],
             spaceAfter=10
-        )
-
-        price_style = ParagraphStyle(
+        ),
+        'price': ParagraphStyle(
             'PriceStyle',
             fontName=polish_font,
             fontSize=24,
-            textColor=success_color,
+            textColor=colors['success'],
             spaceBefore=10,
             spaceAfter=5,
             alignment=TA_CENTER,
             leading=30
-        )
-
-        price_label_style = ParagraphStyle(
+        ),
+        'price_label': ParagraphStyle(
             'PriceLabel',
             fontName=polish_font,
             fontSize=12,
-            textColor=text_color,
+            textColor=colors['text'],
             spaceAfter=5,
             alignment=TA_CENTER
-        )
-
-        footer_style = ParagraphStyle(
+        ),
+        'disclaimer': ParagraphStyle(
+            'Disclaimer',
+            fontName=polish_font,
+            fontSize=9,
+            textColor=colors['muted'],
+            alignment=TA_CENTER
+        ),
+        'footer': ParagraphStyle(
             'Footer',
             fontName=polish_font,
             fontSize=9,
-            textColor=HexColor('#a0aec0'),
+            textColor=colors['faint'],
             alignment=TA_CENTER,
             spaceBefore=20
+        ),
+    }
+
+    plain = [
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ]
+    tables = {
+        'plain': TableStyle(plain),
+        'boxed': TableStyle(plain + [
+            ('BACKGROUND', (0, 0), (-1, -1), colors['light_gray']),
+            ('BOX', (0, 0), (-1, -1), 1, colors['border']),
+        ]),
+        'price': TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BACKGROUND', (0, 0), (-1, -1), colors['price_background']),
+            ('BOX', (0, 0), (-1, -1), 2, colors['success']),
+            ('TOPPADDING', (0, 0), (-1, -1), 15),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
+        ]),
+    }
+
+    return ResultPdfStyles(MappingProxyType(colors), MappingProxyType(paragraphs), MappingProxyType(tables))
+
+
+def generate_result_pdf(lead) -> Optional[bytes]:
+    """
+    Generate a professionally styled PDF with roof analysis results.
+    Returns PDF content as bytes.
+    """
+    try:
+        buffer = io.BytesIO()
+
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            rightMargin=2*cm,
+            leftMargin=2*cm,
+            topMargin=1.5*cm,
+            bottomMargin=1.5*cm
         )
 
+        styles = result_pdf_styles()
+        colors, paragraphs, tables = styles.colors, styles.paragraphs, styles.tables
+        accent_color, border_color = colors['accent'], colors['border']
+        title_style, subtitle_style = paragraphs['title'], paragraphs['subtitle']
+        heading_style, normal_style = paragraphs['heading'], paragraphs['normal']
+        label_style, value_style = paragraphs['label'], paragraphs['value']
+        price_style, price_label_style = paragraphs['price'], paragraphs['price_label']
+        footer_style = paragraphs['footer']
+
         # Build content
         content = []
 
@@ -787,11 +929,13 @@ def generate_result_pdf(lead) -> Optional[bytes]:
             try:
                 img_path = lead.uploaded_file.path
                 if os.path.exists(img_path):
+                    # Embed a print-resolution copy, not the full-size upload
+                    img_path = print_image_path(img_path, RESULT_IMAGE_CM[0], RESULT_IMAGE_CM[1])
                     with PILImage.open(img_path) as pil_img:
                         img_width, img_height = pil_img.size
 
-                    max_width = 15 * cm
-                    max_height = 10 * cm
+                    max_width = RESULT_IMAGE_CM[0] * cm
+                    max_height = RESULT_IMAGE_CM[1] * cm
 
                     aspect = img_width / img_height
                     if img_width > img_height:
@@ -823,13 +967,7 @@ def generate_result_pdf(lead) -> Optional[bytes]:
         ]
 
         contact_table = Table(contact_data, colWidths=[3*cm, 13*cm])
-        contact_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 0),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
+        contact_table.setStyle(tables['plain'])
         content.append(contact_table)
 
         # Roof analysis results
@@ -854,15 +992,7 @@ def generate_result_pdf(lead) -> Optional[bytes]:
 
         if analysis_data:
             analysis_table = Table(analysis_data, colWidths=[5*cm, 11*cm])
-            analysis_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                ('TOPPADDING', (0, 0), (-1, -1), 3),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-                ('BACKGROUND', (0, 0), (-1, -1), light_gray),
-                ('BOX', (0, 0), (-1, -1), 1, border_color),
-            ]))
+            analysis_table.setStyle(tables['boxed'])
             content.append(analysis_table)
 
         # Dimensions
@@ -884,13 +1014,7 @@ def generate_result_pdf(lead) -> Optional[bytes]:
 
             if dim_data:
                 dim_table = Table(dim_data, colWidths=[5*cm, 11*cm])
-                dim_table.setStyle(TableStyle([
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                    ('TOPPADDING', (0, 0), (-1, -1), 3),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-                ]))
+                dim_table.setStyle(tables['plain'])
                 content.append(dim_table)
 
         # Roof elements
@@ -932,27 +1056,13 @@ def generate_result_pdf(lead) -> Optional[bytes]:
             ]]
 
             price_table = Table(price_box_data, colWidths=[16*cm])
-            price_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('BACKGROUND', (0, 0), (-1, -1), HexColor('#f0fff4')),
-                ('BOX', (0, 0), (-1, -1), 2, success_color),
-                ('TOPPADDING', (0, 0), (-1, -1), 15),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
-            ]))
+            price_table.setStyle(tables['price'])
             content.append(price_table)
 
             content.append(Spacer(1, 10))
-            disclaimer_style = ParagraphStyle(
-                'Disclaimer',
-                fontName=polish_font,
-                fontSize=9,
-                textColor=HexColor('#718096'),
-                alignment=TA_CENTER
-            )
             content.append(Paragraph(
                 "* Ostateczna cena zalezy od wybranego materialu i szczegolów wykonania",
-                disclaimer_style
+                paragraphs['disclaimer']
             ))
 
         # Footer
@@ -0,0 +1,85 @@
+"""
+Cached status snapshots for the public polling endpoints.
+
+Lead lifecycle methods (via Lead.publish_status) write a compact snapshot of
+the public status to the cache (Redis), so check_status and the widget token
+status endpoint answer polls without touching the database. A missing
+snapshot (evicted, or a lead older than this cache) is rebuilt from the
+database once.
+
+Pending leads also carry the ETA given at submission; status polls count it
+down instead of re-counting the queue (see leads.eta.estimate_from_snapshot).
+"""
+import time
+
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+
+SNAPSHOT_KEY = 'leads:status:{}'
+# In-flight snapshots are rewritten on every transition
+ACTIVE_TTL = 60 * 60 * 6
+# Finished snapshots outlive the 7 day email tokens
+FINAL_TTL = 60 * 60 * 24 * 8
+
+# Statuses whose public payload will not change any more. A completed lead
+# only counts once its PDF is there (the PDF is saved after mark_completed),
+# failed leads may still be reprocessed from the admin.
+SETTLED_STATUSES = ('completed', 'contacted', 'converted')
+SETTLED_MAX_AGE = 60 * 5
+
+
+def snapshot_key(public_uuid) -> str:
+    return SNAPSHOT_KEY.format(public_uuid)
+
+
+def write_snapshot(lead, eta: dict = None) -> dict:
+    """
+    Store the lead's current status snapshot and return it.
+    eta: estimate given at submission (pending leads only).
+    """
+    from .models import Lead
+
+    snapshot = {
+        'payload': lead.status_payload(),
+        'started_at': lead.processing_started_at.timestamp() if lead.processing_started_at else None,
+    }
+    if eta and lead.status == 'pending':
+        snapshot['eta'] = {
+            'queue_position': eta['queue_position'],
+            'estimated_seconds': eta['estimated_seconds'],
+            'at': time.time(),
+        }
+
+    ttl = FINAL_TTL if lead.status in Lead.FINAL_STATUSES else ACTIVE_TTL
+    cache.set(snapshot_key(lead.public_uuid), snapshot, ttl)
+    return snapshot
+
+
+def load_snapshot(public_uuid):
+    """Cached snapshot for a lead, rebuilt from the database on a miss. None if no such lead."""
+    snapshot = cache.get(snapshot_key(public_uuid))
+    if snapshot is not None:
+        return snapshot
+
+    from .eta import estimate_for_lead
+    from .models import Lead
+
+    lead = Lead.objects.filter(public_uuid=public_uuid).first()
+    if lead is None:
+        return None
+    return write_snapshot(lead, eta=estimate_for_lead(lead))
+
+
+def is_settled(payload: dict) -> bool:
+    if payload['status'] not in SETTLED_STATUSES:
+        return False
+    return payload['status'] != 'completed' or payload['has_pdf']
+
+
+def apply_cache_headers(response, payload: dict):
+    """Let browsers and proxies reuse settled answers; everything else is revalidated."""
+    if is_settled(payload):
+        patch_cache_control(response, private=True, max_age=SETTLED_MAX_AGE)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
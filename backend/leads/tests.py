@@ -1,3 +1,461 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import shutil
+import tempfile
+from collections import defaultdict
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.admin.sites import AdminSite
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from PIL import Image as PILImage
+from reportlab.pdfbase.ttfonts import TTFont
+
+from core.print_images import print_size_px
+from materials.company_prices import clear_company_prices
+from materials.models import Material
+from quotes.models import Quote
+from quotes.services.ai_processor import apply_ai_result
+from quotes.services.calculator import calculate_roof_materials
+from users.models import Company, User
+from widget.models import WidgetConfig
+from .admin import LeadAdmin
+from .admission import ACCEPT, DEFER, check_admission
+from .dispatcher import DISPATCH_LOW_PRIORITY_KEY, DISPATCH_QUEUE_KEY, AIDispatcher, enqueue_lead
+from .estimate import estimate_price
+from .eta import estimate_for_lead, record_processing_time
+from .models import Lead
+from .result_pdf import pdf_fingerprint
+from .services import generate_result_pdf, register_polish_fonts, result_pdf_styles
+from .tasks import apply_lead_results, process_lead_task
+from .status_cache import load_snapshot, write_snapshot
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+AI_RESULTS = {
+    'typ_dachu': 'dwuspadowy',
+    'kat_nachylenia': 35,
+    'wymiary_budynku': {'dlugosc_m': 12, 'szerokosc_m': 8},
+    'pomiary': {
+        'powierzchnia_dachu_m2': 117.2, 'dlugosc_kalenic_m': 13, 'dlugosc_okapow_m': 27,
+        'dlugosc_krawedzi_szczytowych_lewych_m': 6, 'dlugosc_krawedzi_szczytowych_prawych_m': 6,
+    },
+    'elementy_gasiorowe': {'gasiory_poczatkowe_szt': 2, 'gasiory_koncowe_szt': 2},
+    'system_odwodnienia': {'narozniki_rynien_szt': 2, 'rury_spustowe_szt': 4, 'zaslepki_rynien_szt': 4},
+    'elementy_dodatkowe': {'kominy_szt': 1},
+    'pewnosc_oszacowania': 'wysoka',
+}
+
+
+class LeadFixtures:
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def create_lead(self, **kwargs):
+        defaults = {
+            'email': 'customer@example.com',
+            'phone': '123456789',
+            'uploaded_file': SimpleUploadedFile('roof.jpg', b'file_content', content_type='image/jpeg'),
+            'file_type': 'jpg',
+        }
+        defaults.update(kwargs)
+        return Lead.objects.create(**defaults)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class LeadTestCase(LeadFixtures, TestCase):
+    pass
+
+
+class FakeRedisList:
+    """The list commands of a redis.asyncio connection used by the dispatcher."""
+
+    def __init__(self):
+        self.lists = defaultdict(list)
+
+    async def lmove(self, source, destination, wherefrom, whereto):
+        if not self.lists[source]:
+            return None
+        item = self.lists[source].pop(0 if wherefrom == 'LEFT' else -1)
+        self.lists[destination].insert(0 if whereto == 'LEFT' else len(self.lists[destination]), item)
+        return item
+
+    async def blmove(self, source, destination, timeout, wherefrom, whereto):
+        return await self.lmove(source, destination, wherefrom, whereto)
+
+    async def lrem(self, key, count, item):
+        self.lists[key].remove(item)
+
+
+def vision_response(content):
+    """A chat completion of the vision API answering content."""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def vision_client(create):
+    """An AsyncOpenAI client whose chat completions are create."""
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+# Dispatcher results are saved on pool threads, which need committed data
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DispatcherTest(LeadFixtures, TransactionTestCase):
+    @patch('leads.tasks.process_lead_task.delay')
+    def test_enqueue_uses_celery_by_default(self, mock_delay):
+        mock_delay.return_value.id = 'celery-task-id'
+        lead = self.create_lead()
+
+        enqueue_lead(lead)
+
+        mock_delay.assert_called_once_with(lead.id, quote_id=None)
+        lead.refresh_from_db()
+        self.assertEqual(lead.celery_task_id, 'celery-task-id')
+
+    @patch('leads.tasks.process_lead_task.apply_async')
+    def test_deferral_stays_below_visibility_timeout(self, mock_apply):
+        mock_apply.return_value.id = 'celery-task-id'
+        lead = self.create_lead()
+
+        with override_settings(CELERY_BROKER_TRANSPORT_OPTIONS={'visibility_timeout': 3600}):
+            enqueue_lead(lead, defer_seconds=7200)
+
+        self.assertEqual(mock_apply.call_args.kwargs['countdown'], 1800)
+
+    @patch('leads.result_pdf.generate_result_pdf', return_value=None)
+    @patch('leads.dispatcher.process_roof_image_async', new_callable=AsyncMock)
+    def test_process_marks_lead_completed(self, mock_ai, mock_pdf):
+        mock_ai.return_value = dict(AI_RESULTS)
+        lead = self.create_lead()
+
+        async_to_sync(AIDispatcher(concurrency=4, client=object()).process)(lead.id)
+
+        lead.refresh_from_db()
+        self.assertEqual(lead.status, 'completed')
+        self.assertIsNotNone(lead.processing_started_at)
+        self.assertEqual(lead.roof_type, 'dwuspadowy')
+
+    @patch('leads.dispatcher.process_roof_image_async', new_callable=AsyncMock, return_value=None)
+    def test_process_marks_lead_failed_without_results(self, mock_ai):
+        lead = self.create_lead()
+
+        async_to_sync(AIDispatcher(concurrency=4, client=object()).process)(lead.id)
+
+        lead.refresh_from_db()
+        self.assertEqual(lead.status, 'failed')
+
+    @override_settings(OPENAI_API_KEY='sk-test')
+    @patch('leads.result_pdf.generate_result_pdf', return_value=None)
+    def test_failed_vision_calls_are_retried(self, mock_pdf):
+        # Angle and analysis per attempt; the first analysis times out
+        create = AsyncMock(side_effect=[
+            vision_response('35'), TimeoutError('vision API timed out'),
+            vision_response('35'), vision_response(json.dumps(AI_RESULTS)),
+        ])
+        lead = self.create_lead()
+
+        async_to_sync(AIDispatcher(concurrency=4, client=vision_client(create), retry_delay=0).process)(lead.id)
+
+        lead.refresh_from_db()
+        self.assertEqual(create.await_count, 4)
+        self.assertEqual(lead.status, 'completed')
+
+    @override_settings(OPENAI_API_KEY='sk-test')
+    @patch('leads.dispatcher._apply_results', side_effect=RuntimeError('database is gone'))
+    def test_failed_save_does_not_repeat_vision_calls(self, mock_apply):
+        create = AsyncMock(side_effect=[vision_response('35'), vision_response(json.dumps(AI_RESULTS))])
+        lead = self.create_lead()
+
+        async_to_sync(AIDispatcher(concurrency=4, client=vision_client(create), retry_delay=0).process)(lead.id)
+
+        lead.refresh_from_db()
+        self.assertEqual(create.await_count, 2)
+        self.assertEqual(lead.status, 'failed')
+
+    @patch('leads.dispatcher.AIDispatcher.process', new_callable=AsyncMock)
+    def test_jobs_stay_queued_until_finished(self, mock_process):
+        connection = FakeRedisList()
+        connection.lists[DISPATCH_LOW_PRIORITY_KEY] = [b'{"lead_id": 2}']
+        connection.lists[DISPATCH_QUEUE_KEY] = [b'{"lead_id": 1}']
+        dispatcher = AIDispatcher(concurrency=4, client=object(), name='worker-1')
+
+        async def take_two_and_crash():
+            first = await dispatcher._next_job(connection)
+            second = await dispatcher._next_job(connection)
+            self.assertEqual(connection.lists[dispatcher.processing_key], [first, second])
+            # The first job finishes, the process dies before the second does
+            dispatcher._semaphore = asyncio.Semaphore(0)
+            await dispatcher._run_job(connection, first)
+            return first, await AIDispatcher(client=object(), name='worker-1').recover(connection)
+
+        first, recovered = async_to_sync(take_two_and_crash)()
+
+        self.assertEqual(first, b'{"lead_id": 1}')
+        mock_process.assert_awaited_once_with(1, None)
+        self.assertEqual(recovered, 1)
+        self.assertEqual(connection.lists[dispatcher.processing_key], [])
+        self.assertEqual(connection.lists[DISPATCH_QUEUE_KEY], [b'{"lead_id": 2}'])
+
+
+ADMISSION = {
+    'ENABLED': True, 'ACCEPT_WAIT_SECONDS': 100, 'BULK_TENANT_BACKLOG': 50,
+    'MAX_RETRY_AFTER_SECONDS': 3600, 'THROUGHPUT_WINDOW_SECONDS': 900,
+    'WORKER_CONCURRENCY': 2, 'DEFAULT_PROCESSING_SECONDS': 60,
+}
+
+
+@override_settings(LEAD_ADMISSION=ADMISSION)
+class AdmissionTest(LeadTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_accepts_when_backlog_is_short(self):
+        self.create_lead()
+
+        decision = check_admission(low_priority=True)
+
+        self.assertEqual(decision.action, ACCEPT)
+        self.assertEqual(decision.wait_seconds, 60)
+
+    def test_defers_low_priority_work_when_backlog_is_deep(self):
+        for _ in range(6):
+            self.create_lead()
+
+        self.assertEqual(check_admission(low_priority=True).action, DEFER)
+        decision = check_admission()
+        self.assertEqual(decision.action, ACCEPT)
+        self.assertEqual(decision.wait_seconds, 180)
+
+
+@override_settings(LEAD_ADMISSION=ADMISSION)
+class EstimateTest(LeadTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_estimate_uses_recorded_processing_times(self):
+        for seconds in [30, 40, 50, 60, 200]:
+            record_processing_time(seconds)
+        self.create_lead()
+        self.create_lead()
+        lead = self.create_lead()
+
+        eta = estimate_for_lead(lead)
+
+        # Two leads ahead on two workers: one round of p50 (50s) before ours
+        self.assertEqual(eta['queue_position'], 2)
+        self.assertEqual(eta['estimated_seconds'], 100)
+        self.assertEqual(eta['estimated_seconds_max'], 250)
+        self.assertEqual(eta['estimated_time'], '2-5 minut')
+        self.assertEqual(eta['poll_interval'], 10)
+
+    @patch('leads.tasks.process_lead_task.apply_async')
+    def test_deferred_submission_waits_out_its_countdown(self, mock_apply):
+        mock_apply.return_value.id = 'celery-task-id'
+        for _ in range(6):
+            self.create_lead(status='processing')
+
+        response = self.client.post('/submit/', {
+            'email': 'customer@example.com', 'phone': '123456789',
+            'file': SimpleUploadedFile('roof.jpg', b'file_content', content_type='image/jpeg'),
+        })
+
+        # Hardly anything queued ahead, but the lead is only queued after
+        # four rounds of the two workers
+        self.assertEqual(mock_apply.call_args.kwargs['countdown'], 240)
+        self.assertEqual(response.json()['estimated_seconds'], 240 + 60)
+        result = self.client.get(f"/wynik/{response.json()['uuid']}/")
+        self.assertContains(result, 'Szacowany czas: <span id="eta">5-6 minut</span>')
+
+    def test_no_estimate_for_finished_lead(self):
+        lead = self.create_lead(status='completed')
+        self.assertEqual(estimate_for_lead(lead), {})
+
+
+class PriceEstimateTest(LeadTestCase):
+    fixtures = ['materials']
+
+    def setUp(self):
+        cache.clear()
+        clear_company_prices()
+        self.addCleanup(clear_company_prices)
+
+    @patch('leads.result_pdf.generate_result_pdf', return_value=None)
+    def test_estimate_uses_company_default_pricing(self, mock_pdf):
+        material = Material.objects.get(pk=2)
+        company = Company.objects.create(
+            name='Dekarz', settings={'default_material_id': material.id, 'default_margin': 25, 'default_vat': 8},
+        )
+        lead = self.create_lead(source='widget', widget_config=WidgetConfig.objects.create(company=company))
+
+        apply_lead_results(lead, dict(AI_RESULTS))
+
+        # Priced as the quote analysing the same roof would be
+        quote = Quote(margin_percent=25, vat_rate=8)
+        apply_ai_result(quote, dict(AI_RESULTS))
+        expected = calculate_roof_materials(quote, material)['summary']['total_gross']
+        lead.refresh_from_db()
+        self.assertEqual(lead.estimated_price_min, Decimal(str(expected)))
+        # Company pricing is cached: later estimates run no queries
+        with self.assertNumQueries(0):
+            self.assertEqual(estimate_price(dict(AI_RESULTS), company.id), expected)
+
+    def test_no_estimate_without_dimensions(self):
+        self.assertIsNone(estimate_price({'pomiary': {'powierzchnia_dachu_m2': 117.2}}))
+
+
+class ResultPdfTest(LeadTestCase):
+    def test_fonts_and_styles_are_built_once(self):
+        register_polish_fonts.cache_clear()
+        result_pdf_styles.cache_clear()
+        lead = self.create_lead(status='completed', roof_type='dwuspadowy', estimated_price_min=24350)
+
+        with patch('leads.services.TTFont', wraps=TTFont) as font:
+            first = generate_result_pdf(lead)
+            second = generate_result_pdf(lead)
+
+        self.assertTrue(first.startswith(b'%PDF'))
+        self.assertEqual(len(second), len(first))
+        self.assertLessEqual(font.call_count, 1)
+        self.assertIs(result_pdf_styles(), result_pdf_styles())
+
+    def test_uploaded_photo_is_embedded_at_print_resolution(self):
+        buffer = io.BytesIO()
+        PILImage.new('RGBA', (4000, 3000), (200, 30, 30, 128)).save(buffer, format='PNG')
+        lead = self.create_lead(
+            status='completed', file_type='png',
+            uploaded_file=SimpleUploadedFile('roof.png', buffer.getvalue(), content_type='image/png'),
+        )
+
+        pdf = generate_result_pdf(lead)
+
+        path = Path(lead.uploaded_file.path)
+        derivative = path.with_name(f'{path.stem}.print200.jpg')
+        with PILImage.open(derivative) as image:
+            self.assertEqual(image.format, 'JPEG')
+            # 4:3 fitted into 15 x 10 cm at 200 DPI
+            self.assertEqual(image.size, (1049, print_size_px(15, 10)[1]))
+        self.assertLess(len(pdf), len(buffer.getvalue()))
+        modified = derivative.stat().st_mtime_ns
+        generate_result_pdf(lead)
+        self.assertEqual(derivative.stat().st_mtime_ns, modified)
+
+    @override_settings(LEAD_PDF_LAZY=True)
+    def test_pdf_is_rendered_on_first_download(self):
+        lead = self.create_lead(file_type='pdf')
+        apply_lead_results(lead, dict(AI_RESULTS))
+        lead.refresh_from_db()
+        self.assertFalse(lead.result_pdf)
+        self.assertTrue(lead.status_payload()['has_pdf'])
+        url = f'/api/pdf/{lead.public_uuid}/'
+
+        with patch('leads.result_pdf.generate_result_pdf', wraps=generate_result_pdf) as render:
+            first = self.client.get(url)
+            second = self.client.get(url)
+            revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(render.call_count, 1)
+        self.assertTrue(b''.join(first.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(first['ETag'], f'"{pdf_fingerprint(lead)}"')
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        # Changed results are rendered again under a new ETag
+        lead.estimated_price_min = Decimal('31000')
+        lead.save()
+        with patch('leads.result_pdf.generate_result_pdf', wraps=generate_result_pdf) as render:
+            changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(render.call_count, 1)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_no_pdf_before_results(self):
+        lead = self.create_lead(file_type='pdf')
+
+        self.assertEqual(self.client.get(f'/api/pdf/{lead.public_uuid}/').status_code, 404)
+
+
+class StatusEventsTest(LeadTestCase):
+    @patch('core.events.publish')
+    def test_lifecycle_publishes_status(self, mock_publish):
+        lead = self.create_lead()
+
+        lead.mark_processing()
+        lead.mark_failed('AI error')
+
+        statuses = [call.args[2]['status'] for call in mock_publish.call_args_list]
+        self.assertEqual(statuses, ['processing', 'failed'])
+        self.assertEqual(mock_publish.call_args.args[:2], ('lead', lead.public_uuid))
+
+    @patch('core.events.publish')
+    @patch('leads.tasks.process_roof_image', side_effect=RuntimeError('vision API timed out'))
+    def test_lead_fails_only_when_retries_are_used_up(self, mock_ai, mock_publish):
+        lead = self.create_lead()
+
+        process_lead_task.apply(args=(lead.id,))
+
+        statuses = [call.args[2]['status'] for call in mock_publish.call_args_list]
+        self.assertEqual(mock_ai.call_count, process_lead_task.max_retries + 1)
+        self.assertEqual(statuses, ['processing'] * mock_ai.call_count + ['failed'])
+
+    async def test_stream_of_finished_lead_sends_final_state(self):
+        lead = await Lead.objects.acreate(
+            email='done@example.com', phone='1', file_type='jpg',
+            uploaded_file='leads/uploads/roof.jpg', status='failed', processing_error='AI error',
+        )
+
+        response = await self.async_client.get(f'/api/status/{lead.public_uuid}/stream/')
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(body.count('data: '), 1)
+        self.assertIn('"status": "failed"', body)
+
+
+class StatusSnapshotTest(LeadTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_status_is_served_from_snapshot(self):
+        lead = self.create_lead()
+        write_snapshot(lead, eta={'queue_position': 3, 'estimated_seconds': 240})
+        lead.mark_processing()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/status/{lead.public_uuid}/')
+
+        self.assertEqual(response.json()['status'], 'processing')
+        self.assertIn('estimated_seconds', response.json())
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_settled_status_is_cacheable(self):
+        lead = self.create_lead(status='contacted')
+
+        response = self.client.get(f'/api/status/{lead.public_uuid}/')
+
+        self.assertEqual(response.json()['status'], 'contacted')
+        self.assertIn('max-age=300', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/status/{lead.public_uuid}/')
+
+    @patch('leads.dispatcher.enqueue_lead')
+    def test_admin_actions_rewrite_snapshot(self, mock_enqueue):
+        lead = self.create_lead(status='completed')
+        write_snapshot(lead)
+        request = RequestFactory().post('/admin/leads/lead/')
+        request.user = User.objects.create_user(username='admin', email='admin@example.com', password='password')
+        admin = LeadAdmin(Lead, AdminSite())
+        queryset = Lead.objects.filter(pk=lead.pk)
+
+        with patch.object(LeadAdmin, 'message_user'):
+            admin.mark_as_contacted(request, queryset)
+            self.assertEqual(load_snapshot(lead.public_uuid)['payload']['status'], 'contacted')
+
+            admin.reprocess_leads(request, queryset)
+            self.assertEqual(load_snapshot(lead.public_uuid)['payload']['status'], 'pending')
@@ -15,5 +15,6 @@ urlpatterns = [
 
     # API endpoints
     path('api/status/<uuid:uuid>/', views.check_status, name='check_status'),
+    path('api/status/<uuid:uuid>/stream/', views.status_stream, name='status_stream'),
     path('api/pdf/<uuid:uuid>/', views.download_pdf, name='download_pdf'),
 ]
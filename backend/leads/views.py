@@ -1,11 +1,19 @@
 import os
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, FileResponse, Http404
+from django.http import JsonResponse, Http404
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
+from core.events import sse_response
+
 from .models import Lead
-from .tasks import process_lead_task
+from .admission import DEFER, check_admission
+from .backlog import note_enqueued
+from .dispatcher import defer_countdown, enqueue_lead
+from .eta import estimate_from_snapshot, estimate_for_submission
+from .result_pdf import result_pdf_response
+from .status_cache import apply_cache_headers, load_snapshot, write_snapshot
 
 
 def landing_page(request):
@@ -59,14 +67,22 @@ def submit_lead(request):
             status='pending'
         )
 
-        # Queue processing task
-        task = process_lead_task.delay(lead.id)
-        lead.celery_task_id = task.id
-        lead.save(update_fields=['celery_task_id'])
+        # Queue processing task (landing page leads are low priority and
+        # are deferred behind widget work while the backlog is deep)
+        decision = check_admission(low_priority=True)
+        defer_seconds = decision.wait_seconds if decision.action == DEFER else 0
+        eta = estimate_for_submission(deferred=defer_countdown(defer_seconds))
+        # Snapshot first so the worker's transitions always land after it
+        write_snapshot(lead, eta=eta)
+        enqueue_lead(lead, defer_seconds=defer_seconds)
+        note_enqueued()
 
         return JsonResponse({
             'success': True,
             'uuid': str(lead.public_uuid),
+            'estimated_time': eta['estimated_time'],
+            'estimated_seconds': eta['estimated_seconds'],
+            'poll_interval': eta['poll_interval'],
             'message': 'Dziękujemy! Analizujemy Twój dach. Wyniki będą dostępne wkrótce.'
         })
 
@@ -80,10 +96,13 @@ def submit_lead(request):
 def result_page(request, uuid):
     """Display the results page for a specific lead."""
     lead = get_object_or_404(Lead, public_uuid=uuid)
+    is_processing = lead.status in ['pending', 'processing']
 
     context = {
         'lead': lead,
-        'is_processing': lead.status in ['pending', 'processing'],
+        'is_processing': is_processing,
+        # Counted down from the submission estimate, deferral included
+        'eta': estimate_from_snapshot(load_snapshot(uuid)) if is_processing else {},
         'is_completed': lead.status == 'completed',
         'is_failed': lead.status == 'failed',
     }
@@ -92,39 +111,43 @@ def result_page(request, uuid):
 
 
 def check_status(request, uuid):
-    """API endpoint to check lead processing status."""
-    lead = get_object_or_404(Lead, public_uuid=uuid)
+    """API endpoint to check lead processing status (served from the status snapshot)."""
+    snapshot = load_snapshot(uuid)
+    if snapshot is None:
+        raise Http404("Lead nie istnieje")
 
     response_data = {
-        'status': lead.status,
-        'status_display': lead.get_status_display(),
+        **snapshot['payload'],
+        **estimate_from_snapshot(snapshot),
     }
 
-    if lead.status == 'completed':
-        response_data.update({
-            'roof_type': lead.roof_type,
-            'pitch_angle': str(lead.pitch_angle) if lead.pitch_angle else None,
-            'roof_area': str(lead.roof_area) if lead.roof_area else None,
-            'estimated_price': str(lead.estimated_price_min) if lead.estimated_price_min else None,
-            'has_pdf': bool(lead.result_pdf),
-        })
-    elif lead.status == 'failed':
-        response_data['error'] = lead.processing_error
+    return apply_cache_headers(JsonResponse(response_data), snapshot['payload'])
+
+
+def _lead_status_payload(uuid):
+    snapshot = load_snapshot(uuid)
+    if snapshot is None:
+        raise Http404("Lead nie istnieje")
+    return snapshot['payload']
 
-    return JsonResponse(response_data)
+
+async def status_stream(request, uuid):
+    """Server-Sent Events stream of a lead's status, replacing check_status polling."""
+    load_state = sync_to_async(_lead_status_payload)
+    await load_state(uuid)  # 404 before the stream starts
+
+    return sse_response(
+        'lead', uuid,
+        load_state=lambda: load_state(uuid),
+        is_final=lambda payload: payload['status'] in Lead.FINAL_STATUSES,
+    )
 
 
 def download_pdf(request, uuid):
-    """Download the generated PDF for a lead."""
+    """Download the PDF for a lead, rendered on first download (see leads.result_pdf)."""
     lead = get_object_or_404(Lead, public_uuid=uuid)
 
-    if not lead.result_pdf:
+    response = result_pdf_response(request, lead, f'wycena_{uuid}.pdf')
+    if response is None:
         raise Http404("PDF nie jest jeszcze dostępny")
-
-    # Return the file
-    response = FileResponse(
-        lead.result_pdf.open('rb'),
-        content_type='application/pdf'
-    )
-    response['Content-Disposition'] = f'attachment; filename="wycena_{uuid}.pdf"'
     return response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Material
+from .models import CompanyMaterialPrice, Material, ObstaclePrice
 
 
 @admin.register(Material)
@@ -8,3 +8,17 @@ class MaterialAdmin(admin.ModelAdmin):
     list_filter = ['category', 'active']
     list_editable = ['price_per_m2', 'active', 'sort_order']
     search_fields = ['name']
+
+
+@admin.register(ObstaclePrice)
+class ObstaclePriceAdmin(admin.ModelAdmin):
+    list_display = ['obstacle_type', 'name', 'area_deduction_m2', 'flashing_price', 'updated_at']
+    list_editable = ['area_deduction_m2', 'flashing_price']
+
+
+@admin.register(CompanyMaterialPrice)
+class CompanyMaterialPriceAdmin(admin.ModelAdmin):
+    list_display = ['company', 'material', 'price_per_m2', 'waste_factor', 'updated_at']
+    list_filter = ['company']
+    list_editable = ['price_per_m2', 'waste_factor']
+    search_fields = ['company__name', 'material__name']
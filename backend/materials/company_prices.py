@@ -0,0 +1,160 @@
+"""
+Per-company material prices for the roof calculator.
+
+Prices resolve company overlay (CompanyMaterialPrice) -> global Material ->
+config defaults. Each company's overlays are loaded once per process into a
+CompanyPriceTable, which compiles a MaterialProfile per overlaid material on
+first use and keeps it until the material changes; materials without an
+overlay use the global profile. Pricing a material for a company is then a
+dict lookup. The table also holds the company's default pricing (default
+material, margin and VAT from Company.settings) for estimates made without
+a salesperson, e.g. widget leads.
+
+Like the obstacle price table, each company's table carries a version stamp
+shared through the cache: saving or deleting an overlay or the company
+replaces the stamp, saving a material replaces the stamp shared by all
+companies (see materials.signals). Every process compares its tables
+against the stamps at most once per CHECK_INTERVAL seconds.
+"""
+import threading
+import time
+import uuid
+from typing import NamedTuple, Optional
+
+from django.core.cache import cache
+
+from .profiles import MaterialProfile, get_profile
+
+VERSION_KEY = 'materials:company_prices:{}:version'
+MATERIALS_VERSION_KEY = 'materials:company_prices:version'
+CHECK_INTERVAL = 30
+
+DEFAULT_MARGIN = 35
+DEFAULT_VAT = 23
+
+
+class CompanyPricing(NamedTuple):
+    """A company's default material (at its prices, None without materials), margin and VAT."""
+    profile: Optional[MaterialProfile]
+    margin_percent: int
+    vat_rate: int
+
+
+class CompanyPriceTable:
+    """A company's overlays (material id -> CompanyMaterialPrice) and their compiled profiles."""
+
+    __slots__ = ('company_id', 'version', 'overlays', 'profiles', 'pricing', 'checked_at')
+
+    def __init__(self, company_id, version, overlays):
+        self.company_id = company_id
+        self.version = version
+        self.overlays = overlays
+        self.profiles = {}
+        self.pricing = None
+        self.checked_at = time.monotonic()
+
+    def profile(self, material) -> MaterialProfile:
+        """The material's profile at this company's prices."""
+        overlay = self.overlays.get(material.pk)
+        if overlay is None:
+            return get_profile(material)
+        profile = self.profiles.get(material.pk)
+        if profile is None or profile.version != material.updated_at:
+            profile = self.profiles[material.pk] = MaterialProfile(material, overlay)
+        return profile
+
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def current_version(company_id) -> tuple:
+    """(materials stamp, company stamp) of a company's table."""
+    keys = (MATERIALS_VERSION_KEY, VERSION_KEY.format(company_id))
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def _load(company_id, version) -> CompanyPriceTable:
+    from .models import CompanyMaterialPrice
+
+    overlays = CompanyMaterialPrice.objects.filter(company_id=company_id)
+    return CompanyPriceTable(company_id, version, {overlay.material_id: overlay for overlay in overlays})
+
+
+def get_company_prices(company_id) -> CompanyPriceTable:
+    """This process's price table of a company, reloaded when the shared version moved."""
+    table = _tables.get(company_id)
+    if table is not None and time.monotonic() - table.checked_at < CHECK_INTERVAL:
+        return table
+
+    # Read the stamp before the rows, so a concurrent change forces another reload
+    version = current_version(company_id)
+    if table is None or table.version != version:
+        table = _load(company_id, version)
+        with _lock:
+            _tables[company_id] = table
+    else:
+        table.checked_at = time.monotonic()
+    return table
+
+
+def _load_pricing(table) -> CompanyPricing:
+    from users.models import Company
+    from .models import Material
+
+    settings = Company.objects.filter(pk=table.company_id).values_list('settings', flat=True).first() or {}
+    materials = Material.objects.filter(active=True)
+    material = None
+    if settings.get('default_material_id'):
+        material = materials.filter(pk=settings['default_material_id']).first()
+    material = material or materials.first()
+    return CompanyPricing(
+        table.profile(material) if material else None,
+        settings.get('default_margin') or DEFAULT_MARGIN,
+        settings.get('default_vat') or DEFAULT_VAT,
+    )
+
+
+def get_company_pricing(company_id) -> CompanyPricing:
+    """
+    Default pricing of a company (global defaults for None): its
+    settings['default_material_id'] or else the first active material,
+    default_margin and default_vat. Cached with the company's table.
+    """
+    table = get_company_prices(company_id)
+    if table.pricing is None:
+        table.pricing = _load_pricing(table)
+    return table.pricing
+
+
+def get_company_profile(material, company_id) -> MaterialProfile:
+    """
+    Profile of a Material at a company's prices (the global profile without
+    a company). Compiled profiles are returned as they are.
+    """
+    if company_id is None or isinstance(material, MaterialProfile):
+        return get_profile(material)
+    return get_company_prices(company_id).profile(material)
+
+
+def bump_version(company_id):
+    """Make every process reload the company's table (this one immediately)."""
+    cache.set(VERSION_KEY.format(company_id), uuid.uuid4().hex, None)
+    with _lock:
+        _tables.pop(company_id, None)
+
+
+def bump_materials_version():
+    """Make every process reload all company tables (after a material change)."""
+    cache.set(MATERIALS_VERSION_KEY, uuid.uuid4().hex, None)
+    clear_company_prices()
+
+
+def clear_company_prices():
+    with _lock:
+        _tables.clear()
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObstaclePrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('obstacle_type', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('area_deduction_m2', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('flashing_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['obstacle_type'],
+            },
+        ),
+    ]
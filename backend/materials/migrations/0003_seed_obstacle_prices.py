@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:53
+
+from decimal import Decimal
+
+from django.db import migrations
+
+# Prices previously hardcoded in the calculator
+OBSTACLE_PRICES = [
+    ('chimney', 'Obróbka komina', Decimal('1'), Decimal('50')),
+    ('skylight', 'Obróbka okna dachowego', Decimal('0.5'), Decimal('80')),
+    ('roof_hatch', 'Obróbka wyłazu dachowego', Decimal('0.8'), Decimal('40')),
+    ('vent_pipe', 'Obróbka kominka wentylacyjnego', Decimal('0.1'), Decimal('35')),
+]
+
+
+def seed_obstacle_prices(apps, schema_editor):
+    ObstaclePrice = apps.get_model('materials', 'ObstaclePrice')
+    for obstacle_type, name, area_deduction, flashing_price in OBSTACLE_PRICES:
+        ObstaclePrice.objects.get_or_create(
+            obstacle_type=obstacle_type,
+            defaults={'name': name, 'area_deduction_m2': area_deduction, 'flashing_price': flashing_price},
+        )
+
+
+def remove_obstacle_prices(apps, schema_editor):
+    ObstaclePrice = apps.get_model('materials', 'ObstaclePrice')
+    ObstaclePrice.objects.filter(obstacle_type__in=[row[0] for row in OBSTACLE_PRICES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0002_obstacleprice'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_obstacle_prices, remove_obstacle_prices),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0003_seed_obstacle_prices'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyMaterialPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_per_m2', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('waste_factor', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True)),
+                ('config', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='material_prices', to='users.company')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='company_prices', to='materials.material')),
+            ],
+            options={
+                'ordering': ['company', 'material'],
+                'constraints': [models.UniqueConstraint(fields=('company', 'material'), name='unique_company_material_price')],
+            },
+        ),
+    ]
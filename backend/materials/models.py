@@ -38,3 +38,41 @@ class Material(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.price_per_m2} PLN/m²)"
+
+
+class ObstaclePrice(models.Model):
+    """Roofing area deducted and flashing cost per obstacle (chimney, skylight, ...)."""
+    obstacle_type = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=200)
+    area_deduction_m2 = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    flashing_price = models.DecimalField(max_digits=8, decimal_places=2)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['obstacle_type']
+    
+    def __str__(self):
+        return f"{self.name} ({self.flashing_price} PLN/szt)"
+
+
+class CompanyMaterialPrice(models.Model):
+    """A company's negotiated price of a material, overriding the global one."""
+    company = models.ForeignKey('users.Company', on_delete=models.CASCADE, related_name='material_prices')
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name='company_prices')
+    # Empty fields keep the material's own value
+    price_per_m2 = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    waste_factor = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
+    config = models.JSONField(default=dict, blank=True)
+    # config: overrides of Material.config keys, e.g. {"membrane_price_m2": 6.5}
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['company', 'material']
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'material'], name='unique_company_material_price'),
+        ]
+    
+    def __str__(self):
+        return f"{self.company} / {self.material.name}"
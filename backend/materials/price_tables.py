@@ -0,0 +1,85 @@
+"""
+Obstacle price table for the roof calculator.
+
+ObstaclePrice rows are loaded once per process into a dict keyed by obstacle
+type, so the calculator's lookups stay O(1). The table carries a version
+stamp shared through the cache: saving or deleting a price replaces the
+stamp (see materials.signals), and every process compares its table against
+the stamp at most once per CHECK_INTERVAL seconds, reloading when it moved.
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+
+from core.fixed_point import MM2, scaled, to_grosze
+
+VERSION_KEY = 'materials:obstacle_prices:version'
+CHECK_INTERVAL = 30
+
+
+class ObstaclePriceTable:
+    """
+    Obstacle type -> (area deducted per piece in mm², flashing cost per piece
+    in grosze), the calculator's fixed-point units (see core.fixed_point).
+    """
+
+    __slots__ = ('version', 'prices', 'checked_at')
+
+    def __init__(self, version, prices):
+        self.version = version
+        self.prices = prices
+        self.checked_at = time.monotonic()
+
+    def get(self, obstacle_type):
+        return self.prices.get(obstacle_type)
+
+
+_table = None
+
+
+def current_version() -> str:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # First process up (or the stamp was evicted): everyone reloads once
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _load(version) -> ObstaclePriceTable:
+    from .models import ObstaclePrice
+
+    rows = ObstaclePrice.objects.values_list('obstacle_type', 'area_deduction_m2', 'flashing_price')
+    return ObstaclePriceTable(version, {
+        obstacle_type: (scaled(area_deduction, MM2), to_grosze(flashing_price))
+        for obstacle_type, area_deduction, flashing_price in rows
+    })
+
+
+def get_obstacle_prices() -> ObstaclePriceTable:
+    """This process's obstacle price table, reloaded when the shared version moved."""
+    global _table
+    table = _table
+    if table is not None and time.monotonic() - table.checked_at < CHECK_INTERVAL:
+        return table
+
+    # Read the stamp before the rows, so a concurrent change forces another reload
+    version = current_version()
+    if table is None or table.version != version:
+        table = _table = _load(version)
+    else:
+        table.checked_at = time.monotonic()
+    return table
+
+
+def bump_version():
+    """Make every process reload the table (this one immediately)."""
+    global _table
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    _table = None
+
+
+def clear_obstacle_prices():
+    global _table
+    _table = None
@@ -0,0 +1,158 @@
+"""
+Compiled material profiles for the roof calculator.
+
+A profile holds a material's pricing constants already converted to Decimal
+and to the calculator's fixed-point ints (grosze, millimetres and scaled
+ratios, see core.fixed_point), plus the float unit prices shown in
+breakdowns, with config defaults applied once. Profiles are cached per
+process by (pk, updated_at) and dropped when a Material is saved or deleted
+(see materials.signals). A company's negotiated prices are compiled into
+profiles of their own, see materials.company_prices.
+"""
+from decimal import Decimal
+
+from core.fixed_point import scaled, to_grosze
+
+# Defaults for keys missing from Material.config
+CONFIG_DEFAULTS = {
+    'battens_spacing_cm': 32,
+    'screws_per_m2': 7,
+    'membrane_price_m2': 7,
+    'battens_price_mb': 4,
+    'counter_battens_price_mb': 5,
+    'screws_price_per_100': 30,
+    'ridge_tape_price_mb': 15,
+    'valley_price_mb': 25,
+}
+DEFAULT_WASTE_FACTOR = Decimal('1.12')
+
+# Sheet materials are planned sheet by sheet (see quotes.services.sheets)
+# instead of using the waste factor; config keys override these, a
+# sheet_width_cm of 0 falls back to the waste factor.
+SHEET_DEFAULTS = {
+    'metal_tile': {'sheet_width_cm': 110, 'sheet_module_cm': 35, 'sheet_max_length_cm': 630, 'sheet_overlap_cm': 15},
+    'metal_sheet': {'sheet_width_cm': 110, 'sheet_module_cm': 1, 'sheet_max_length_cm': 800, 'sheet_overlap_cm': 20},
+}
+NO_SHEETS = {'sheet_width_cm': 0, 'sheet_module_cm': 0, 'sheet_max_length_cm': 0, 'sheet_overlap_cm': 0}
+
+# Scale of the fixed-point waste factor and screws per m²
+WASTE_SCALE = 10000
+SCREWS_SCALE = 1000
+
+
+def _decimal(value) -> Decimal:
+    return Decimal(str(value))
+
+
+class MaterialProfile:
+    """Immutable, precomputed view of a Material used by the calculator."""
+
+    __slots__ = (
+        'id', 'version', 'overlay', 'name', 'category',
+        'price_per_m2', 'waste_factor',
+        'battens_spacing_cm', 'screws_per_m2',
+        'membrane_price_m2', 'battens_price_mb', 'counter_battens_price_mb',
+        'screws_price_per_100', 'ridge_tape_price_mb', 'valley_price_mb',
+        'unit_prices',
+        # Fixed-point: grosze per unit, spacing in mm, ratios over their scale
+        'price_per_m2_gr', 'waste_factor_scaled', 'battens_spacing_mm', 'screws_per_m2_scaled',
+        'membrane_gr', 'battens_gr', 'counter_battens_gr', 'screws_per_100_gr', 'ridge_tape_gr', 'valley_gr',
+        # Sheet planning in mm, sheet_width_mm 0 for materials priced with the waste factor
+        'sheet_width_mm', 'sheet_module_mm', 'sheet_max_length_mm', 'sheet_overlap_mm',
+    )
+
+    def __init__(self, material, overlay=None):
+        """
+        overlay: a CompanyMaterialPrice of the material, whose set fields and
+        config keys take precedence over the material's.
+        """
+        config = {
+            **CONFIG_DEFAULTS, **SHEET_DEFAULTS.get(material.category, NO_SHEETS), **(material.config or {}),
+            **((overlay.config or {}) if overlay else {}),
+        }
+        price_per_m2 = material.price_per_m2
+        waste_factor = material.waste_factor
+        if overlay:
+            if overlay.price_per_m2 is not None:
+                price_per_m2 = overlay.price_per_m2
+            if overlay.waste_factor:
+                waste_factor = overlay.waste_factor
+
+        set_ = object.__setattr__
+        set_(self, 'id', material.pk)
+        set_(self, 'version', material.updated_at)
+        # (company id, overlay updated_at) of company profiles, part of their memo keys
+        set_(self, 'overlay', (overlay.company_id, overlay.updated_at.isoformat()) if overlay else None)
+        set_(self, 'name', material.name)
+        set_(self, 'category', material.category)
+        set_(self, 'price_per_m2', _decimal(price_per_m2))
+        set_(self, 'waste_factor', _decimal(waste_factor) if waste_factor else DEFAULT_WASTE_FACTOR)
+        set_(self, 'battens_spacing_cm', config['battens_spacing_cm'])
+        set_(self, 'screws_per_m2', config['screws_per_m2'])
+        set_(self, 'membrane_price_m2', _decimal(config['membrane_price_m2']))
+        set_(self, 'battens_price_mb', _decimal(config['battens_price_mb']))
+        set_(self, 'counter_battens_price_mb', _decimal(config['counter_battens_price_mb']))
+        set_(self, 'screws_price_per_100', _decimal(config['screws_price_per_100']))
+        set_(self, 'ridge_tape_price_mb', _decimal(config['ridge_tape_price_mb']))
+        set_(self, 'valley_price_mb', _decimal(config['valley_price_mb']))
+        set_(self, 'price_per_m2_gr', to_grosze(self.price_per_m2))
+        set_(self, 'waste_factor_scaled', scaled(self.waste_factor, WASTE_SCALE))
+        set_(self, 'battens_spacing_mm', scaled(self.battens_spacing_cm or 0, 10))
+        set_(self, 'screws_per_m2_scaled', scaled(self.screws_per_m2 or 0, SCREWS_SCALE))
+        set_(self, 'membrane_gr', to_grosze(self.membrane_price_m2))
+        set_(self, 'battens_gr', to_grosze(self.battens_price_mb))
+        set_(self, 'counter_battens_gr', to_grosze(self.counter_battens_price_mb))
+        set_(self, 'screws_per_100_gr', to_grosze(self.screws_price_per_100))
+        set_(self, 'ridge_tape_gr', to_grosze(self.ridge_tape_price_mb))
+        set_(self, 'valley_gr', to_grosze(self.valley_price_mb))
+        sheet_width = scaled(config['sheet_width_cm'] or 0, 10)
+        max_length = scaled(config['sheet_max_length_cm'] or 0, 10)
+        # Without a usable sheet size the material is priced with the waste factor
+        if sheet_width <= 0 or max_length <= 0:
+            sheet_width = max_length = 0
+        set_(self, 'sheet_width_mm', sheet_width)
+        set_(self, 'sheet_max_length_mm', max_length)
+        set_(self, 'sheet_module_mm', max(scaled(config['sheet_module_cm'] or 0, 10), 1))
+        # Split pieces have to gain length
+        set_(self, 'sheet_overlap_mm', min(max(scaled(config['sheet_overlap_cm'] or 0, 10), 0), max_length // 2))
+        # Unit prices as shown in materials_breakdown
+        set_(self, 'unit_prices', {
+            'roofing': float(self.price_per_m2),
+            'membrane': float(self.membrane_price_m2),
+            'counter_battens': float(self.counter_battens_price_mb),
+            'battens': float(self.battens_price_mb),
+            'screws': round(float(self.screws_price_per_100 / 100), 3),
+            'ridge_tape': float(self.ridge_tape_price_mb),
+            'valleys': float(self.valley_price_mb),
+        })
+
+    def __setattr__(self, name, value):
+        raise AttributeError('MaterialProfile is immutable')
+
+    def __repr__(self):
+        company = f" company {self.overlay[0]}" if self.overlay else ''
+        return f"<MaterialProfile {self.id} {self.name!r}{company} @ {self.version}>"
+
+
+_profiles = {}
+
+
+def get_profile(material) -> MaterialProfile:
+    """Compiled profile for a Material (or the profile itself)."""
+    if isinstance(material, MaterialProfile):
+        return material
+    if material.pk is None:
+        return MaterialProfile(material)
+
+    profile = _profiles.get(material.pk)
+    if profile is None or profile.version != material.updated_at:
+        profile = _profiles[material.pk] = MaterialProfile(material)
+    return profile
+
+
+def invalidate_profile(pk):
+    _profiles.pop(pk, None)
+
+
+def clear_profiles():
+    _profiles.clear()
@@ -11,3 +11,15 @@ class MaterialSerializer(serializers.ModelSerializer):
             'id', 'name', 'category', 'category_display', 'description',
             'price_per_m2', 'waste_factor', 'config', 'active', 'sort_order'
         ]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        table = self.context.get('company_prices')
+        overlay = table.overlays.get(instance.pk) if table else None
+        if overlay:
+            if overlay.price_per_m2 is not None:
+                data['price_per_m2'] = self.fields['price_per_m2'].to_representation(overlay.price_per_m2)
+            if overlay.waste_factor:
+                data['waste_factor'] = self.fields['waste_factor'].to_representation(overlay.waste_factor)
+            data['config'] = {**data['config'], **overlay.config}
+        return data
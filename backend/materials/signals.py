@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Company
+from . import company_prices
+from .models import CompanyMaterialPrice, Material, ObstaclePrice
+from .price_tables import bump_version
+from .profiles import invalidate_profile
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def drop_material_profile(sender, instance, **kwargs):
+    """Recompile the calculator profile (and company defaults) on next use."""
+    invalidate_profile(instance.pk)
+    company_prices.bump_materials_version()
+
+
+@receiver(post_save, sender=ObstaclePrice)
+@receiver(post_delete, sender=ObstaclePrice)
+def bump_obstacle_prices(sender, instance, **kwargs):
+    """Reload the obstacle price table in every process."""
+    bump_version()
+
+
+@receiver(post_save, sender=CompanyMaterialPrice)
+@receiver(post_delete, sender=CompanyMaterialPrice)
+def bump_company_prices(sender, instance, **kwargs):
+    """Reload the company's price table in every process."""
+    company_prices.bump_version(instance.company_id)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def bump_company_settings(sender, instance, **kwargs):
+    """Company.settings hold its default material, margin and VAT."""
+    company_prices.bump_version(instance.pk)
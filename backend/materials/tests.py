@@ -1,3 +1,107 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from users.models import Company
+from .company_prices import clear_company_prices, get_company_profile
+from .models import CompanyMaterialPrice, Material, ObstaclePrice
+from .price_tables import clear_obstacle_prices, get_obstacle_prices
+from .profiles import clear_profiles, get_profile
+
+
+class MaterialProfileTest(TestCase):
+    fixtures = ['materials']
+
+    def setUp(self):
+        clear_profiles()
+
+    def test_profile_applies_config_defaults(self):
+        material = Material.objects.get(pk=1)
+        material.config = {'battens_spacing_cm': 40}
+
+        profile = get_profile(material)
+
+        self.assertEqual(profile.battens_spacing_cm, 40)
+        self.assertEqual(profile.membrane_price_m2, Decimal('7'))
+        self.assertEqual(profile.unit_prices['screws'], 0.3)
+
+    def test_profile_is_cached_until_material_is_saved(self):
+        material = Material.objects.get(pk=1)
+        profile = get_profile(material)
+        self.assertIs(get_profile(Material.objects.get(pk=1)), profile)
+
+        material.price_per_m2 = Decimal('99.00')
+        material.save()
+
+        self.assertEqual(get_profile(material).price_per_m2, Decimal('99.00'))
+        self.assertIsNot(get_profile(material), profile)
+
+
+class ObstaclePriceTableTest(TestCase):
+    def setUp(self):
+        clear_obstacle_prices()
+        self.addCleanup(clear_obstacle_prices)
+
+    def test_table_is_seeded_with_previous_prices(self):
+        table = get_obstacle_prices()
+
+        # mm² and grosze
+        self.assertEqual(table.get('chimney'), (1000000, 5000))
+        self.assertEqual(table.get('vent_pipe'), (100000, 3500))
+        self.assertIsNone(table.get('dormer'))
+
+    def test_table_is_loaded_once_and_reloaded_after_a_change(self):
+        table = get_obstacle_prices()
+        with self.assertNumQueries(0):
+            self.assertIs(get_obstacle_prices(), table)
+
+        ObstaclePrice.objects.filter(obstacle_type='chimney').update(flashing_price=Decimal('999'))
+        self.assertEqual(get_obstacle_prices().get('chimney')[1], 5000)
+
+        price = ObstaclePrice.objects.get(obstacle_type='chimney')
+        price.flashing_price = Decimal('65.00')
+        price.save()
+
+        reloaded = get_obstacle_prices()
+        self.assertNotEqual(reloaded.version, table.version)
+        self.assertEqual(reloaded.get('chimney')[1], 6500)
+
+
+class CompanyPriceTableTest(TestCase):
+    fixtures = ['materials']
+
+    def setUp(self):
+        clear_company_prices()
+        self.addCleanup(clear_company_prices)
+        self.company = Company.objects.create(name='Dekarz')
+        self.material = Material.objects.get(pk=1)
+        self.overlay = CompanyMaterialPrice.objects.create(
+            company=self.company, material=self.material, price_per_m2=Decimal('39.90'),
+            config={'membrane_price_m2': 6.5},
+        )
+
+    def test_overlay_resolves_before_material_and_defaults(self):
+        profile = get_company_profile(self.material, self.company.id)
+
+        self.assertEqual(profile.price_per_m2, Decimal('39.90'))
+        self.assertEqual(profile.waste_factor, self.material.waste_factor)
+        self.assertEqual(profile.membrane_price_m2, Decimal('6.5'))
+        self.assertEqual(profile.battens_price_mb, get_profile(self.material).battens_price_mb)
+        self.assertEqual(get_profile(self.material).price_per_m2, self.material.price_per_m2)
+        # Materials without an overlay and users without a company get the global profile
+        other = Material.objects.get(pk=2)
+        self.assertIs(get_company_profile(other, self.company.id), get_profile(other))
+        self.assertIs(get_company_profile(self.material, None), get_profile(self.material))
+
+    def test_table_is_compiled_once_and_reloaded_after_a_change(self):
+        profile = get_company_profile(self.material, self.company.id)
+        with self.assertNumQueries(0):
+            self.assertIs(get_company_profile(self.material, self.company.id), profile)
+
+        self.overlay.price_per_m2 = Decimal('37.00')
+        self.overlay.save()
+
+        self.assertEqual(get_company_profile(self.material, self.company.id).price_per_m2, Decimal('37.00'))
+
+        self.overlay.delete()
+        self.assertIs(get_company_profile(self.material, self.company.id), get_profile(self.material))
@@ -1,6 +1,7 @@
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 
+from .company_prices import get_company_prices
 from .models import Material
 from .serializers import MaterialSerializer
 
@@ -10,3 +11,11 @@ class MaterialViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Material.objects.filter(active=True)
     serializer_class = MaterialSerializer
     permission_classes = [IsAuthenticated]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # Show the user's company prices where it negotiated them
+        company_id = getattr(self.request.user, 'company_id', None)
+        if company_id:
+            context['company_prices'] = get_company_prices(company_id)
+        return context
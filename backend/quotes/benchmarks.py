@@ -0,0 +1,214 @@
+"""
+Micro-benchmarks of the quote calculator and pricing endpoints.
+
+Synthetic quotes cover every Quote.ROOF_TYPES entry, pitches from near-flat
+to steep, L-shaped wings, AI-measured edges and obstacle mixes. Each
+benchmark reports the best time per call over several rounds (with the
+garbage collector paused), the least noisy figure on a shared machine:
+
+    evaluate        one uncached calculation (calculator._evaluate_quote),
+                    sheet plans included
+    memo_hit        calculate_roof_materials served by the in-process memo
+    batch           evaluate_quotes over all synthetic quotes, per quote
+    compare         compare_materials with BENCHMARK_MATERIALS materials
+    sweep           sweep_prices, 11 pitches x materials x 2 wastes x 3 margins
+    view_calculate  QuoteViewSet.calculate end to end (request to saved quote)
+
+Everything runs inside a rolled-back transaction against a local-memory
+cache, so the database and the shared cache are left untouched. Results are
+compared with a stored baseline (see the benchmark_calculator command).
+"""
+import gc
+import json
+import platform
+import random
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from materials.models import Material
+from users.models import User
+from .models import Quote
+from .services import calculator, memo, sheets
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+
+BENCHMARK_MATERIALS = 4
+VIEW_QUOTES = 50
+
+PITCHES = (5, 15, 25, 30, 35, 40, 45, 60)
+OBSTACLE_MIXES = (
+    [],
+    [{'type': 'chimney', 'quantity': 1}],
+    [{'type': 'chimney', 'quantity': 2}, {'type': 'skylight', 'quantity': 3}],
+    [
+        {'type': 'chimney', 'quantity': 1}, {'type': 'skylight', 'quantity': 2},
+        {'type': 'roof_hatch', 'quantity': 1}, {'type': 'vent_pipe', 'quantity': 4},
+    ],
+)
+
+_LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks'}}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def synthetic_quotes(count, seed=0):
+    """Unsaved quotes cycling through roof types, pitches and obstacle mixes."""
+    rng = random.Random(seed)
+    roof_types = [roof_type for roof_type, _ in Quote.ROOF_TYPES]
+    quotes = []
+    for index in range(count):
+        dimensions = {'length': round(rng.uniform(6, 30), 2), 'width': round(rng.uniform(5, 16), 2), 'unit': 'm'}
+        if index % 3 == 0:
+            dimensions.update(wing_length=round(rng.uniform(3, 10), 2), wing_width=round(rng.uniform(4, 9), 2))
+        measurements = {}
+        if index % 4 == 0:
+            measurements = {'ridge_length': round(dimensions['length'] * 0.9, 2), 'eave_length': 0}
+        quotes.append(Quote(
+            number=f'BENCH-{index}',
+            roof_type=roof_types[index % len(roof_types)],
+            pitch_angle=PITCHES[index % len(PITCHES)],
+            dimensions=dimensions,
+            roof_measurements=measurements,
+            obstacles=OBSTACLE_MIXES[index % len(OBSTACLE_MIXES)],
+            margin_percent=rng.choice((20, 30, 35)),
+            vat_rate=rng.choice((8, 23)),
+        ))
+    return quotes
+
+
+def _best_us(run, rounds, calls, setup=None):
+    """Best microseconds per call of run() doing `calls` calls, over rounds."""
+    samples = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - started) / calls * 1e6)
+        finally:
+            gc.enable()
+    return round(min(samples), 1)
+
+
+def _create_fixtures(view_quotes):
+    user = User.objects.create_user(username='benchmark', email='benchmark@example.invalid', password=None)
+    materials = [
+        Material.objects.create(
+            name=f'Benchmark {index}', category=category, price_per_m2=Decimal('45.50') + index * 10,
+            config={'battens_spacing_cm': 30 + index, 'screws_per_m2': 7 + index},
+        )
+        for index, (category, _) in enumerate(Material.CATEGORY_CHOICES[:BENCHMARK_MATERIALS])
+    ]
+    for quote in view_quotes:
+        quote.user = user
+    Quote.objects.bulk_create(view_quotes)
+    return user, materials, list(Quote.objects.filter(user=user).order_by('id'))
+
+
+def _run(quote_count, rounds):
+    from .views import QuoteViewSet
+
+    quotes = synthetic_quotes(quote_count)
+    user, materials, saved_quotes = _create_fixtures(synthetic_quotes(min(VIEW_QUOTES, quote_count), seed=1))
+    material = materials[0]
+    profile = calculator.get_profile(material)
+
+    def evaluate():
+        for quote in quotes:
+            calculator._evaluate_quote(quote, profile)
+
+    def memo_hits():
+        for quote in quotes:
+            calculator.calculate_roof_materials(quote, material)
+
+    def clear_memo():
+        memo.clear_local()
+        memo.cache.clear()
+        sheets.clear_plans()
+
+    sample = quotes[:20]
+
+    def compare():
+        for quote in sample:
+            calculator.compare_materials(quote, materials)
+
+    def sweep():
+        for quote in sample[:5]:
+            calculator.sweep_prices(
+                quote, materials, margins=[20, 30, 35], pitches=range(30, 41), waste_factors=[None, Decimal('1.15')],
+            )
+
+    view = QuoteViewSet.as_view({'post': 'calculate'})
+    factory = APIRequestFactory()
+
+    def calculate_view():
+        for quote in saved_quotes:
+            request = factory.post(f'/api/quotes/{quote.id}/calculate/', {'material_id': material.id}, format='json')
+            force_authenticate(request, user=user)
+            response = view(request, pk=quote.id)
+            assert response.status_code == 200, response.data
+
+    memo_hits()  # warm the memo
+    return {
+        'evaluate': _best_us(evaluate, rounds, len(quotes), setup=sheets.clear_plans),
+        'memo_hit': _best_us(memo_hits, rounds, len(quotes)),
+        'batch': _best_us(
+            lambda: calculator.evaluate_quotes(quotes, profile), rounds, len(quotes), setup=sheets.clear_plans,
+        ),
+        'compare': _best_us(compare, rounds, len(sample)),
+        'sweep': _best_us(sweep, rounds, len(sample[:5])),
+        'view_calculate': _best_us(calculate_view, rounds, len(saved_quotes), setup=clear_memo),
+    }
+
+
+def run_benchmarks(quote_count=500, rounds=5):
+    """Best µs per call of each benchmark (nothing is kept in the database)."""
+    results = {}
+    with override_settings(CACHES=_LOCAL_CACHE):
+        try:
+            with transaction.atomic():
+                results = _run(quote_count, rounds)
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            memo.clear_local()
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    path = Path(path)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def save_baseline(results, quote_count, rounds, path=BASELINE_PATH):
+    Path(path).write_text(json.dumps({
+        'created_at': timezone.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'quotes': quote_count,
+        'rounds': rounds,
+        'us_per_call': results,
+    }, indent=2) + '\n')
+
+
+def regressions(results, baseline, tolerance_percent):
+    """{name: (baseline µs, current µs)} for benchmarks slower than baseline + tolerance."""
+    slower = {}
+    for name, current in results.items():
+        previous = (baseline or {}).get('us_per_call', {}).get(name)
+        if previous and current > previous * (1 + tolerance_percent / 100):
+            slower[name] = (previous, current)
+    return slower
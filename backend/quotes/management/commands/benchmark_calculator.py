@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quotes.benchmarks import BASELINE_PATH, load_baseline, regressions, run_benchmarks, save_baseline
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the quote calculator and pricing endpoints against the stored baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quotes', type=int, default=500, help='Synthetic quotes per benchmark (default: 500).')
+        parser.add_argument('--rounds', type=int, default=5, help='Timed rounds, the best is reported (default: 5).')
+        parser.add_argument('--baseline', default=str(BASELINE_PATH), help='Baseline JSON file.')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=25.0,
+            help='Allowed slowdown against the baseline in percent (default: 25).',
+        )
+        parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline.')
+
+    def handle(self, *args, **options):
+        results = run_benchmarks(quote_count=options['quotes'], rounds=options['rounds'])
+        baseline = load_baseline(options['baseline'])
+        previous = (baseline or {}).get('us_per_call', {})
+
+        self.stdout.write(f"{'benchmark':<16}{'µs/call':>10}{'baseline':>10}{'change':>9}")
+        for name, current in results.items():
+            line = f"{name:<16}{current:>10.1f}"
+            if previous.get(name):
+                line += f"{previous[name]:>10.1f}{(current / previous[name] - 1) * 100:>+8.1f}%"
+            self.stdout.write(line)
+
+        if options['save_baseline']:
+            save_baseline(results, options['quotes'], options['rounds'], options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['baseline']}"))
+            return
+
+        if baseline is None:
+            self.stdout.write(self.style.WARNING('No baseline yet, run with --save-baseline to store one.'))
+            return
+
+        slower = regressions(results, baseline, options['tolerance'])
+        if slower:
+            raise CommandError('Slower than baseline: ' + ', '.join(
+                f"{name} {current:.1f} µs (was {was:.1f})" for name, (was, current) in slower.items()
+            ))
+        self.stdout.write(self.style.SUCCESS(f"No regressions beyond {options['tolerance']:g}%"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from quotes.services.repricing import CHUNK_SIZE, reprice_material_quotes
+
+
+class Command(BaseCommand):
+    help = 'Reprice draft quotes calculated with a material and report the value change per company.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('material_id', type=int)
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Quotes repriced per bulk update (default: {CHUNK_SIZE}).',
+        )
+
+    def handle(self, *args, **options):
+        report = reprice_material_quotes(options['material_id'], chunk_size=options['chunk_size'])
+        self.stdout.write(f"Repriced {report['updated']} of {report['quotes']} draft quotes")
+        for change in report['companies']:
+            self.stdout.write(
+                f"  {change['company'] or '(no company)'}: {change['quotes']} quotes, "
+                f"net {change['total_net_change']:+.2f} PLN, gross {change['total_gross_change']:+.2f} PLN"
+            )
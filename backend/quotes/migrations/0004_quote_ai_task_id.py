@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0003_comprehensive_roof_analysis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='ai_task_id',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='quote',
+            name='roof_type',
+            field=models.CharField(choices=[('shed', 'Jednospadowy'), ('gable', 'Dwuspadowy'), ('gable_l', 'Dwuspadowy L'), ('hip', 'Czterospadowy'), ('hip_envelope', 'Kopertowy'), ('multi_hip', 'Wielospadowy'), ('multi_hip_l', 'Wielospadowy L'), ('mansard', 'Mansardowy'), ('half_hip', 'Naczółkowy'), ('skillion', 'Pulpitowy'), ('flat', 'Płaski')], default='gable', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='quote',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Roboczy'), ('contacted', 'Skontaktowano'), ('sent', 'Wysłano'), ('accepted', 'Zaakceptowano'), ('rejected', 'Odrzucono')], default='draft', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0004_quote_ai_task_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='ai_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0005_quote_ai_error'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='calculation_state',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0006_quote_calculation_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='pdf_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='quote',
+            name='pdf_task_id',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
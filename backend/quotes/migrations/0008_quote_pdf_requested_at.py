@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0007_quote_pdf_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='pdf_requested_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,8 @@
+from datetime import timedelta
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from materials.models import Material
 
 
@@ -77,6 +80,8 @@ class Quote(models.Model):
     ai_confidence = models.FloatField(null=True, blank=True)
     ai_processed = models.BooleanField(default=False)
     ai_processing = models.BooleanField(default=False)
+    ai_task_id = models.CharField(max_length=255, blank=True, default='')
+    ai_error = models.TextField(blank=True, default='')
     
     # Materials
     material = models.ForeignKey(Material, on_delete=models.SET_NULL, null=True, blank=True)
@@ -87,9 +92,14 @@ class Quote(models.Model):
     vat_rate = models.IntegerField(default=23)
     total_net = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     total_gross = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Exact calculator node values of the last calculation (see services.calculator.recalculate)
+    calculation_state = models.JSONField(default=dict, blank=True)
     
     # PDF
     pdf_file = models.FileField(upload_to='quotes/pdfs/', null=True, blank=True)
+    pdf_task_id = models.CharField(max_length=255, blank=True, default='')
+    pdf_error = models.TextField(blank=True, default='')
+    pdf_requested_at = models.DateTimeField(null=True, blank=True)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -110,5 +120,44 @@ class Quote(models.Model):
             self.number = f"{now.year}/{now.month:02d}/{count:04d}"
         super().save(*args, **kwargs)
     
+    @property
+    def ai_job_status(self):
+        """State of the background AI analysis: idle, processing, completed or failed."""
+        if self.ai_processing:
+            return 'processing'
+        if self.ai_processed:
+            return 'completed'
+        if self.ai_error:
+            return 'failed'
+        return 'idle'
+
+    def expire_pdf_job(self):
+        """Fail the PDF render if no worker finished it within QUOTE_PDF_TIMEOUT."""
+        if not self.pdf_task_id or self.pdf_requested_at is None:
+            return
+        deadline = self.pdf_requested_at + timedelta(seconds=settings.QUOTE_PDF_TIMEOUT)
+        if timezone.now() < deadline:
+            return
+        # Only this render: a newer request or the worker may have moved on
+        error = 'PDF nie został wygenerowany w wyznaczonym czasie'
+        expired = Quote.objects.filter(pk=self.pk, pdf_task_id=self.pdf_task_id).update(
+            pdf_task_id='', pdf_error=error
+        )
+        if expired:
+            self.pdf_task_id, self.pdf_error = '', error
+        else:
+            self.refresh_from_db(fields=['pdf_task_id', 'pdf_error', 'pdf_file'])
+
+    @property
+    def pdf_job_status(self):
+        """State of the background PDF render: idle, processing, completed or failed."""
+        if self.pdf_task_id:
+            return 'processing'
+        if self.pdf_error:
+            return 'failed'
+        if self.pdf_file:
+            return 'completed'
+        return 'idle'
+
     def __str__(self):
         return f"{self.number} - {self.client_name or 'Brak klienta'}"
@@ -93,3 +93,27 @@ class QuoteCalculateSerializer(serializers.Serializer):
     """Serializer for calculation request."""
     material_id = serializers.IntegerField()
     margin_percent = serializers.IntegerField(min_value=0, max_value=100, required=False, default=35)
+
+
+class QuoteCompareSerializer(serializers.Serializer):
+    """Serializer for material comparison query parameters."""
+    margin_percent = serializers.IntegerField(min_value=0, max_value=100, required=False)
+
+
+class QuoteSweepSerializer(serializers.Serializer):
+    """Serializer for what-if sweep request (each list is one grid axis)."""
+    MAX_CELLS = 20000
+
+    material_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False, max_length=50
+    )
+    margins = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=100), required=False, allow_empty=False, max_length=50
+    )
+    pitches = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=89), required=False, allow_empty=False, max_length=50
+    )
+    waste_factors = serializers.ListField(
+        child=serializers.DecimalField(max_digits=4, decimal_places=2, min_value=1, max_value=2),
+        required=False, allow_empty=False, max_length=20
+    )
@@ -741,3 +741,158 @@ def create_mock_response():
         'success': True,
         'data': mock_data
     }
+
+
+# Roof type mapping (extended): AI labels -> Quote.ROOF_TYPES
+ROOF_TYPE_MAP = {
+    'jednospadowy': 'shed',
+    'dwuspadowy': 'gable',
+    'dwuspadowy_l': 'gable_l',
+    'czterospadowy': 'hip',
+    'kopertowy': 'hip_envelope',
+    'wielospadowy': 'multi_hip',
+    'wielospadowy_l': 'multi_hip_l',
+    'mansardowy': 'mansard',
+    'naczolkowy': 'half_hip',
+    'pulpitowy': 'skillion',
+    'plaski': 'flat'
+}
+
+CONFIDENCE_MAP = {'wysoka': 0.9, 'srednia': 0.7, 'niska': 0.4}
+
+# Quote fields written by an AI analysis
+AI_RESULT_FIELDS = [
+    'ai_extracted_data', 'roof_type', 'pitch_angle', 'dimensions', 'plan_area',
+    'roof_measurements', 'gasior_elements', 'gutter_system', 'obstacles',
+    'ai_confidence', 'ai_processed', 'ai_processing', 'ai_error',
+]
+
+
+# 'elementy_dodatkowe' key -> Quote obstacle type
+OBSTACLE_MAP = {
+    'kominy_szt': 'chimney',
+    'kominki_wentylacyjne_szt': 'vent_pipe',
+    'okna_dachowe_szt': 'skylight',
+    'wylazy_dachowe_szt': 'roof_hatch',
+}
+
+
+def ai_result_fields(data: dict) -> dict:
+    """
+    Quote fields (roof type, pitch, dimensions, measurements, ...) mapped
+    from the (Polish) AI response. Shared by quote analyses and lead price
+    estimates, so both price the same roof.
+    """
+    fields = {}
+
+    typ_dachu = (data.get('typ_dachu') or 'dwuspadowy').lower()
+    fields['roof_type'] = ROOF_TYPE_MAP.get(typ_dachu, 'gable')
+
+    # Pitch angle
+    if data.get('kat_nachylenia'):
+        fields['pitch_angle'] = int(float(data['kat_nachylenia']))
+
+    # Building dimensions
+    wymiary = data.get('wymiary_budynku', {})
+    fields['dimensions'] = {
+        'length': wymiary.get('dlugosc_m', 10),
+        'width': wymiary.get('szerokosc_m', 8),
+        'unit': 'm'
+    }
+
+    # Calculate plan area
+    dims = fields['dimensions']
+    if dims.get('length') and dims.get('width'):
+        fields['plan_area'] = dims['length'] * dims['width']
+
+    # Roof measurements (ridges, valleys, eaves)
+    pomiary = data.get('pomiary', {})
+    fields['roof_measurements'] = {
+        'surface_area': pomiary.get('powierzchnia_dachu_m2', 0),
+        'gable_edge_left': pomiary.get('dlugosc_krawedzi_szczytowych_lewych_m', 0),
+        'gable_edge_right': pomiary.get('dlugosc_krawedzi_szczytowych_prawych_m', 0),
+        'ridge_length': pomiary.get('dlugosc_kalenic_m', 0),
+        'valley_length': pomiary.get('dlugosc_koszy_m', 0),
+        'eave_length': pomiary.get('dlugosc_okapow_m', 0)
+    }
+
+    # Gasior elements
+    gasiory = data.get('elementy_gasiorowe', {})
+    fields['gasior_elements'] = {
+        'junctions': gasiory.get('trojniki_szt', 0),
+        'corner_gasiors': gasiory.get('gasiory_narozne_szt', 0),
+        'start_gasiors': gasiory.get('gasiory_poczatkowe_szt', 0),
+        'end_gasiors': gasiory.get('gasiory_koncowe_szt', 0)
+    }
+
+    # Gutter system
+    rynny = data.get('system_odwodnienia', {})
+    fields['gutter_system'] = {
+        'corners': rynny.get('narozniki_rynien_szt', 0),
+        'downpipes': rynny.get('rury_spustowe_szt', 0),
+        'end_caps': rynny.get('zaslepki_rynien_szt', 0)
+    }
+
+    # Obstacles from additional elements
+    elementy = data.get('elementy_dodatkowe', {})
+    fields['obstacles'] = [
+        {'type': obstacle_type, 'quantity': elementy[key]}
+        for key, obstacle_type in OBSTACLE_MAP.items()
+        if elementy.get(key, 0) > 0
+    ]
+
+    # Confidence mapping
+    fields['ai_confidence'] = CONFIDENCE_MAP.get(data.get('pewnosc_oszacowania', 'srednia'), 0.7)
+
+    return fields
+
+
+def apply_ai_result(quote, data):
+    """Map the (Polish) AI response onto quote fields. Does not save."""
+    quote.ai_extracted_data = data
+    for field, value in ai_result_fields(data).items():
+        setattr(quote, field, value)
+    quote.ai_processed = True
+
+
+def _save_ai_result(quote, task_id) -> bool:
+    """Save the AI fields, unless another analysis (task id) took the quote over meanwhile."""
+    from django.db import transaction
+
+    with transaction.atomic():
+        if task_id:
+            current = (
+                type(quote).objects.select_for_update()
+                .filter(pk=quote.pk).values_list('ai_task_id', flat=True).first()
+            )
+            if current != task_id:
+                return False
+        quote.save(update_fields=AI_RESULT_FIELDS + ['updated_at'])
+    return True
+
+
+def analyze_quote(quote, task_id=None):
+    """
+    Run AI analysis on quote.original_image and store the result on the quote.
+
+    Only the AI fields are saved, so edits made while the analysis was running
+    (client data, margin, ...) are not overwritten. With a task_id nothing is
+    saved once the quote's ai_task_id moved on to a newer analysis. Failures
+    are kept in quote.ai_error. Returns the process_roof_image result dict.
+    """
+    quote.ai_error = ''
+    try:
+        result = process_roof_image(quote.original_image.path)
+        if result['success']:
+            apply_ai_result(quote, result['data'])
+        else:
+            quote.ai_error = result.get('error', 'Błąd przetwarzania')
+        return result
+    except Exception as e:
+        quote.ai_error = str(e)
+        raise
+    finally:
+        quote.ai_processing = False
+        if _save_ai_result(quote, task_id):
+            from core.events import publish
+            publish('quote', quote.id, {'status': quote.ai_job_status})
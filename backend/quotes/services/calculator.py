@@ -1,179 +1,636 @@
 """
 Calculation service for roof materials.
+
+Calculations run in fixed-point ints (mm, mm², grosze; see core.fixed_point).
+Each line cost is rounded to whole grosze once and the summary adds up those
+rounded costs, so the breakdown always sums to the totals. Results are
+converted to metres / PLN floats only in build_result.
+
+Materials are priced at the quote's company prices where it has negotiated
+them (see materials.company_prices). Sheet materials (metal tiles and sheets) are planned sheet by sheet (see
+quotes.services.sheets) and priced on the ordered sheet area; the others use
+the material's waste factor.
 """
-import math
 from decimal import Decimal
 
+from core.fixed_point import (
+    MM, MM2, PERCENT, div_round, mm2_display, mm_display, pln_display, scaled, to_basis_points, to_mm,
+)
+from materials.company_prices import get_company_profile
+from materials.price_tables import get_obstacle_prices
+from materials.profiles import SCREWS_SCALE, WASTE_SCALE, get_profile
 
-def calculate_roof_materials(quote, material):
-    """
-    Calculate all materials needed for a roof based on quote dimensions and selected material.
-    
-    Returns a dict with materials breakdown and financial summary.
-    """
+from . import memo
+from .geometry import roof_geometries
+from .sheets import sheet_plan, waste_basis_points
+
+# Membrane overlap (%)
+MEMBRANE_OVERLAP_PERCENT = 105
+
+
+def _company_id(quote):
+    # Annotated by bulk queries (see repricing), otherwise the owner's company
+    if hasattr(quote, 'company_id'):
+        return quote.company_id
+    return quote.user.company_id if quote.user_id else None
+
+
+def quote_profile(quote, material):
+    """Profile of a material at the prices of the quote's company."""
+    return get_company_profile(material, _company_id(quote))
+
+
+def _pitch(quote, pitch_angle=None):
+    # A pitch of 0 is a flat roof, not a missing pitch
+    if pitch_angle is None:
+        pitch_angle = quote.pitch_angle
+    if pitch_angle is None:
+        pitch_angle = 35
+    return pitch_angle
+
+
+def _roof_geometries(quote, pitches):
     # Get dimensions
-    length = Decimal(str(quote.dimensions.get('length', 0)))
-    width = Decimal(str(quote.dimensions.get('width', 0)))
-    pitch_angle = quote.pitch_angle or 35
-    
-    # Get material config with defaults
-    config = material.config or {}
-    waste_factor = material.waste_factor or Decimal('1.12')
-    
-    # Configuration values
-    battens_spacing_cm = config.get('battens_spacing_cm', 32)
-    screws_per_m2 = config.get('screws_per_m2', 7)
-    membrane_price_m2 = Decimal(str(config.get('membrane_price_m2', 7)))
-    battens_price_mb = Decimal(str(config.get('battens_price_mb', 4)))
-    counter_battens_price_mb = Decimal(str(config.get('counter_battens_price_mb', 5)))
-    screws_price_per_100 = Decimal(str(config.get('screws_price_per_100', 30)))
-    ridge_tape_price_mb = Decimal(str(config.get('ridge_tape_price_mb', 15)))
-    
-    # 1. Calculate areas
-    plan_area = length * width
-    pitch_radians = math.radians(pitch_angle)
-    cos_pitch = Decimal(str(math.cos(pitch_radians)))
-    real_area = plan_area / cos_pitch if cos_pitch > 0 else plan_area
-    
-    # 2. Calculate material with waste factor
-    material_needed = real_area * waste_factor
-    
-    # 3. Calculate additional materials
-    # Rafter height for battens length
-    roof_height = (width / 2) * Decimal(str(math.tan(pitch_radians)))
-    rafter_length = Decimal(str(math.sqrt(float((width / 2) ** 2 + roof_height ** 2))))
-    
-    # Battens: horizontal strips
-    battens_rows = int(rafter_length * 100 / battens_spacing_cm) + 1
-    battens_meters = battens_rows * length * 2  # Both sides of roof
-    
-    # Counter-battens: vertical strips (assume ~10 per side)
-    counter_battens_count = 10
-    counter_battens_meters = counter_battens_count * rafter_length * 2
-    
-    # Membrane (similar to real area)
-    membrane_area = real_area * Decimal('1.05')  # 5% overlap
+    length = to_mm(quote.dimensions.get('length', 0))
+    width = to_mm(quote.dimensions.get('width', 0))
     
-    # Screws
-    screws_quantity = int(material_needed * screws_per_m2)
-    
-    # Ridge tape (length of roof)
-    ridge_length = length
-    
-    # 4. Calculate obstacle costs
-    obstacles_area_reduction = Decimal('0')
-    obstacles_extra_cost = Decimal('0')
+    # Planes, areas and edges for the roof type
+    return roof_geometries(
+        quote.roof_type, length, width, pitches,
+        dimensions=quote.dimensions,
+        measurements=quote.roof_measurements,
+        gasior_elements=quote.gasior_elements,
+        gutter_system=quote.gutter_system,
+    )
+
+
+def _roof_geometry(quote, pitch_angle=None):
+    return _roof_geometries(quote, [_pitch(quote, pitch_angle)])[0]
+
+
+def _obstacle_totals(obstacles):
+    obstacles_area_reduction = 0
+    obstacles_extra_cost = 0
+    price_table = get_obstacle_prices()
     
-    for obstacle in (quote.obstacles or []):
+    for obstacle in (obstacles or []):
         qty = obstacle.get('quantity', 0)
-        obs_type = obstacle.get('type', '')
-        
-        if obs_type == 'chimney':
-            obstacles_area_reduction += Decimal('1') * qty
-            obstacles_extra_cost += Decimal('50') * qty  # Chimney flashing
-        elif obs_type == 'skylight':
-            obstacles_area_reduction += Decimal('0.5') * qty
-            obstacles_extra_cost += Decimal('80') * qty  # Skylight flashing
-        elif obs_type == 'roof_hatch':
-            obstacles_area_reduction += Decimal('0.8') * qty
-            obstacles_extra_cost += Decimal('40') * qty  # Roof hatch flashing
-        elif obs_type == 'vent_pipe':
-            obstacles_area_reduction += Decimal('0.1') * qty
-            obstacles_extra_cost += Decimal('35') * qty  # Vent pipe flashing
+        prices = price_table.get(obstacle.get('type', ''))
+        if prices:
+            obstacles_area_reduction += prices[0] * qty
+            obstacles_extra_cost += prices[1] * qty
     
+    return {
+        'obstacles_area_reduction': obstacles_area_reduction,
+        'obstacles_extra_cost': obstacles_extra_cost,
+        'obstacles_count': sum(o.get('quantity', 0) for o in (obstacles or [])),
+    }
+
+
+def measure_roof(quote, pitch_angle=None):
+    """
+    Material-independent part of the calculation: roof planes, areas and
+    edges (see quotes.services.geometry) and obstacle totals. Computed once
+    per quote and shared by every material priced against it (see
+    compare_materials). pitch_angle overrides the quote's pitch (what-if).
+    """
+    return {**_roof_geometry(quote, pitch_angle), **_obstacle_totals(quote.obstacles)}
+
+
+def measure_roofs(quote, pitches):
+    """measure_roof() of a quote at each of several pitches, in one geometry batch."""
+    obstacles = _obstacle_totals(quote.obstacles)
+    return [{**geometry, **obstacles} for geometry in _roof_geometries(quote, pitches)]
+
+
+class _LazyMeasurements(dict):
+    """measure_roof() of a quote, computing each half only when a node reads it."""
+    GEOMETRY_KEYS = ('plan_area', 'real_area', 'planes', 'edges', 'accessories')
+    OBSTACLE_KEYS = ('obstacles_area_reduction', 'obstacles_extra_cost', 'obstacles_count')
+
+    def __init__(self, quote):
+        super().__init__()
+        self.quote = quote
+
+    def __missing__(self, key):
+        if key in self.GEOMETRY_KEYS:
+            self.update(_roof_geometry(self.quote))
+        elif key in self.OBSTACLE_KEYS:
+            self.update(_obstacle_totals(self.quote.obstacles))
+        else:
+            raise KeyError(key)
+        return self[key]
+
+
+def plane_battens(planes, battens_spacing_mm):
+    """(battens, counter-battens) in mm over the roof planes."""
+    # Battens: horizontal rows up each plane (none for spacing 0, e.g. bitumen on boarding)
+    battens_x2 = 0
+    counter_battens = 0
+    for plane in planes:
+        if battens_spacing_mm:
+            battens_rows = plane.slope // battens_spacing_mm + 1
+            battens_x2 += battens_rows * plane.batten_width_x2
+        # Counter-battens: vertical strips along the slope
+        counter_battens += plane.counter_battens * plane.slope
+    return div_round(battens_x2, 2), counter_battens
+
+
+# Calculation graph
+#
+# Inputs are the things a quote edit can change: 'roof' (dimensions, pitch,
+# roof type and measured data), 'obstacle_list', 'material', 'margin' and
+# 'vat', plus 'waste': a what-if waste factor (scaled, see sweep_prices) in
+# values['waste'] replacing the material's waste factor and sheet plan. Each node is (name, dependencies, compute) in evaluation order;
+# compute(values, measurements, profile, margin_percent, vat_rate) sees the
+# values of the nodes before it. Node values are fixed-point ints: line
+# quantities in mm² / mm / pieces and costs in grosze.
+
+def _line(quantity, cost):
+    return {'quantity': quantity, 'cost': cost}
+
+
+def _areas(values, m, profile, margin_percent, vat_rate):
+    return {'plan_area': m['plan_area'], 'real_area': m['real_area']}
+
+
+def _sheets(values, m, profile, margin_percent, vat_rate):
+    return sheet_plan(m['planes'], profile)
+
+
+def _material_needed(values, m, profile, margin_percent, vat_rate):
+    # Ordered sheets, or the area with the waste factor
+    waste = values.get('waste')
+    if waste is None and values['sheets']:
+        return values['sheets']['area']
+    return div_round(values['areas']['real_area'] * (waste or profile.waste_factor_scaled), WASTE_SCALE)
+
+
+def _area_line(area, price_gr):
+    return _line(area, div_round(area * price_gr, MM2))
+
+
+def _length_line(length, price_gr):
+    return _line(length, div_round(length * price_gr, MM))
+
+
+def _roofing(values, m, profile, margin_percent, vat_rate):
     # Adjust material needed for obstacles
-    adjusted_material = material_needed - obstacles_area_reduction
-    
-    # 5. Calculate costs
-    roofing_cost = adjusted_material * material.price_per_m2
-    battens_cost = battens_meters * battens_price_mb
-    counter_battens_cost = counter_battens_meters * counter_battens_price_mb
-    membrane_cost = membrane_area * membrane_price_m2
-    screws_cost = Decimal(screws_quantity) / 100 * screws_price_per_100
-    ridge_tape_cost = ridge_length * ridge_tape_price_mb
-    
-    materials_net = (
-        roofing_cost + battens_cost + counter_battens_cost + 
-        membrane_cost + screws_cost + ridge_tape_cost + obstacles_extra_cost
-    )
-    
+    adjusted_material = values['material_needed'] - m['obstacles_area_reduction']
+    return _area_line(adjusted_material, profile.price_per_m2_gr)
+
+
+def _membrane(values, m, profile, margin_percent, vat_rate):
+    membrane_area = div_round(values['areas']['real_area'] * MEMBRANE_OVERLAP_PERCENT, 100)
+    return _area_line(membrane_area, profile.membrane_gr)
+
+
+def _counter_battens(values, m, profile, margin_percent, vat_rate):
+    length = plane_battens(m['planes'], profile.battens_spacing_mm)[1]
+    return _length_line(length, profile.counter_battens_gr)
+
+
+def _battens(values, m, profile, margin_percent, vat_rate):
+    length = plane_battens(m['planes'], profile.battens_spacing_mm)[0]
+    return _length_line(length, profile.battens_gr)
+
+
+def _screw_count(material_needed, profile):
+    return material_needed * profile.screws_per_m2_scaled // (MM2 * SCREWS_SCALE)
+
+
+def _screws(values, m, profile, margin_percent, vat_rate):
+    screws_quantity = _screw_count(values['material_needed'], profile)
+    return _line(screws_quantity, div_round(screws_quantity * profile.screws_per_100_gr, 100))
+
+
+def _ridge_tape(values, m, profile, margin_percent, vat_rate):
+    # Ridge tape along ridges and hips
+    return _length_line(m['edges']['ridge'] + m['edges']['hips'], profile.ridge_tape_gr)
+
+
+def _valleys(values, m, profile, margin_percent, vat_rate):
+    return _length_line(m['edges']['valleys'], profile.valley_gr)
+
+
+def _obstacles(values, m, profile, margin_percent, vat_rate):
+    return _line(m['obstacles_count'], m['obstacles_extra_cost'])
+
+
+def _totals(materials_net, margin_percent, vat_rate):
     # Labor cost based on margin
-    margin_percent = quote.margin_percent or 35
-    labor_cost = materials_net * Decimal(str(margin_percent)) / 100
+    labor_cost = div_round(materials_net * to_basis_points(margin_percent), PERCENT)
     
     total_net = materials_net + labor_cost
-    vat_rate = quote.vat_rate or 23
-    vat = total_net * Decimal(str(vat_rate)) / 100
-    total_gross = total_net + vat
-    
-    # Build result
+    vat = div_round(total_net * to_basis_points(vat_rate), PERCENT)
+    return {
+        'materials_net': materials_net,
+        'labor_net': labor_cost,
+        'total_net': total_net,
+        'vat': vat,
+        'total_gross': total_net + vat,
+    }
+
+
+def _summary(values, m, profile, margin_percent, vat_rate):
+    materials_net = (
+        values['roofing']['cost'] + values['battens']['cost'] + values['counter_battens']['cost'] + 
+        values['membrane']['cost'] + values['screws']['cost'] + values['ridge_tape']['cost'] +
+        values['obstacles']['cost']
+    )
+    if values['valleys']['quantity']:
+        materials_net += values['valleys']['cost']
+    return _totals(materials_net, margin_percent, vat_rate)
+
+
+NODES = (
+    ('areas', ('roof',), _areas),
+    ('sheets', ('roof', 'material'), _sheets),
+    ('material_needed', ('areas', 'sheets', 'material', 'waste'), _material_needed),
+    ('roofing', ('material_needed', 'obstacle_list', 'material'), _roofing),
+    ('membrane', ('areas', 'material'), _membrane),
+    ('counter_battens', ('roof', 'material'), _counter_battens),
+    ('battens', ('roof', 'material'), _battens),
+    ('screws', ('material_needed', 'material'), _screws),
+    ('ridge_tape', ('roof', 'material'), _ridge_tape),
+    ('valleys', ('roof', 'material'), _valleys),
+    ('obstacles', ('obstacle_list',), _obstacles),
+    ('summary', (
+        'roofing', 'membrane', 'counter_battens', 'battens', 'screws',
+        'ridge_tape', 'valleys', 'obstacles', 'margin', 'vat',
+    ), _summary),
+)
+
+GRAPH_INPUTS = ('roof', 'obstacle_list', 'material', 'margin', 'vat', 'waste')
+
+# Quote field -> graph input it feeds
+QUOTE_FIELD_INPUTS = {
+    'dimensions': 'roof',
+    'pitch_angle': 'roof',
+    'roof_type': 'roof',
+    'roof_measurements': 'roof',
+    'gasior_elements': 'roof',
+    'gutter_system': 'roof',
+    'obstacles': 'obstacle_list',
+    'material': 'material',
+    'margin_percent': 'margin',
+    'vat_rate': 'vat',
+}
+
+# Breakdown line -> (name, unit); roofing is named after the material
+LINE_LABELS = {
+    'membrane': ('Membrana dachowa', 'm²'),
+    'counter_battens': ('Kontrłaty', 'mb'),
+    'battens': ('Łaty', 'mb'),
+    'screws': ('Wkręty montażowe', 'szt'),
+    'ridge_tape': ('Taśma kalenicowa', 'mb'),
+    'valleys': ('Obróbka koszy dachowych', 'mb'),
+    'obstacles': ('Obróbki (kominy, okna, wyłazy, kominki went.)', 'szt'),
+}
+
+
+def affected_nodes(inputs):
+    """Nodes that have to be recomputed when the given graph inputs change."""
+    dirty = set(inputs)
+    for node, dependencies, _ in NODES:
+        if dirty.intersection(dependencies):
+            dirty.add(node)
+    return dirty.difference(GRAPH_INPUTS)
+
+
+def evaluate(measurements, material, margin_percent, vat_rate, values=None, dirty=None):
+    """
+    Evaluate the calculation graph. values: node values of an earlier
+    evaluation; with `dirty`, only those nodes are recomputed.
+    """
+    profile = get_profile(material)
+    values = dict(values or {})
+    for node, _, compute in NODES:
+        if dirty is None or node in dirty:
+            values[node] = compute(values, measurements, profile, margin_percent, vat_rate)
+    return values
+
+
+# Breakdown unit -> display conversion of a line quantity
+QUANTITY_DISPLAY = {
+    'm²': lambda area: mm2_display(area, 1),
+    'mb': lambda length: mm_display(length, 1),
+    'szt': int,
+}
+
+
+def sheets_display(plan, real_area):
+    """API shape of a sheet plan: sheets per length (m) and the real waste."""
+    lengths = {}
+    for length in plan['sheets']:
+        lengths[length] = lengths.get(length, 0) + 1
+    return {
+        'count': len(plan['sheets']),
+        'lengths': [{'length': mm_display(length), 'count': count} for length, count in lengths.items()],
+        'total_length': mm_display(plan['ordered_length'], 1),
+        'area': mm2_display(plan['area'], 1),
+        'waste_percent': waste_basis_points(plan, real_area) / 100,
+        'optimal': plan['optimal'],
+    }
+
+
+def build_result(values, material, vat_rate, measurements=None):
+    """API / materials_breakdown shape (metres, PLN) of evaluated node values."""
+    profile = get_profile(material)
     materials_breakdown = {
         'roofing': {
-            'name': material.name,
-            'quantity': round(float(adjusted_material), 1),
-            'unit': 'm²',
-            'unit_price': float(material.price_per_m2),
-            'total': round(float(roofing_cost), 2)
-        },
-        'membrane': {
-            'name': 'Membrana dachowa',
-            'quantity': round(float(membrane_area), 1),
+            'name': profile.name,
+            'quantity': mm2_display(values['roofing']['quantity'], 1),
             'unit': 'm²',
-            'unit_price': float(membrane_price_m2),
-            'total': round(float(membrane_cost), 2)
-        },
-        'counter_battens': {
-            'name': 'Kontrłaty',
-            'quantity': round(float(counter_battens_meters), 1),
-            'unit': 'mb',
-            'unit_price': float(counter_battens_price_mb),
-            'total': round(float(counter_battens_cost), 2)
-        },
-        'battens': {
-            'name': 'Łaty',
-            'quantity': round(float(battens_meters), 1),
-            'unit': 'mb',
-            'unit_price': float(battens_price_mb),
-            'total': round(float(battens_cost), 2)
-        },
-        'screws': {
-            'name': 'Wkręty montażowe',
-            'quantity': screws_quantity,
-            'unit': 'szt',
-            'unit_price': round(float(screws_price_per_100 / 100), 3),
-            'total': round(float(screws_cost), 2)
+            'unit_price': profile.unit_prices['roofing'],
+            'total': pln_display(values['roofing']['cost'])
         },
-        'ridge_tape': {
-            'name': 'Taśma kalenicowa',
-            'quantity': round(float(ridge_length), 1),
-            'unit': 'mb',
-            'unit_price': float(ridge_tape_price_mb),
-            'total': round(float(ridge_tape_cost), 2)
-        }
     }
-    
-    # Add obstacles if any
-    if obstacles_extra_cost > 0:
-        materials_breakdown['obstacles'] = {
-            'name': 'Obróbki (kominy, okna, wyłazy, kominki went.)',
-            'quantity': sum(o.get('quantity', 0) for o in (quote.obstacles or [])),
-            'unit': 'szt',
-            'unit_price': None,
-            'total': round(float(obstacles_extra_cost), 2)
+    for key, (name, unit) in LINE_LABELS.items():
+        line = values[key]
+        # Valley flashing only for roofs with valleys, obstacles only if any
+        if key == 'valleys' and not line['quantity']:
+            continue
+        if key == 'obstacles' and not line['cost'] > 0:
+            continue
+        materials_breakdown[key] = {
+            'name': name,
+            'quantity': QUANTITY_DISPLAY[unit](line['quantity']),
+            'unit': unit,
+            'unit_price': profile.unit_prices.get(key),
+            'total': pln_display(line['cost'])
         }
     
     summary = {
-        'materials_net': round(float(materials_net), 2),
-        'labor_net': round(float(labor_cost), 2),
-        'total_net': round(float(total_net), 2),
-        'vat': round(float(vat), 2),
-        'vat_rate': vat_rate,
-        'total_gross': round(float(total_gross), 2)
+        name: pln_display(values['summary'][name])
+        for name in ('materials_net', 'labor_net', 'total_net', 'vat')
     }
+    summary['vat_rate'] = vat_rate
+    summary['total_gross'] = pln_display(values['summary']['total_gross'])
     
-    return {
-        'plan_area': round(float(plan_area), 2),
-        'real_area': round(float(real_area), 2),
+    result = {
+        'plan_area': mm2_display(values['areas']['plan_area']),
+        'real_area': mm2_display(values['areas']['real_area']),
         'materials': materials_breakdown,
-        'summary': summary
+        'summary': summary,
     }
+    if values['sheets']:
+        result['sheets'] = sheets_display(values['sheets'], values['areas']['real_area'])
+    if measurements is not None:
+        result['geometry'] = {
+            'edges': {name: mm_display(value) for name, value in measurements['edges'].items()},
+            'accessories': {
+                # *_m accessories are lengths, the rest are counts
+                name: mm_display(value) if name.endswith('_m') else value
+                for name, value in measurements['accessories'].items()
+            },
+        }
+    return result
+
+
+def price_roof(measurements, material, margin_percent=35, vat_rate=23):
+    """
+    Price one material against the output of measure_roof().
+    material: a Material or its compiled MaterialProfile.
+    """
+    values = evaluate(measurements, material, margin_percent, vat_rate)
+    return build_result(values, material, vat_rate, measurements)
+
+
+def calculate_roof_materials(quote, material):
+    """
+    Calculate all materials needed for a roof based on quote dimensions and selected material.
+    
+    Returns a dict with materials breakdown and financial summary.
+    """
+    return evaluate_quote(quote, material)[0]
+
+
+def evaluate_quote(quote, material):
+    """
+    Full calculation of a quote: (result, calculation_state to store on the
+    quote). Memoized on the quote's inputs, see quotes.services.memo.
+    """
+    profile = quote_profile(quote, material)
+    result, state = memo.remember(quote, profile, lambda: _evaluate_quote(quote, profile))
+    return result, state
+
+
+def _evaluate_quote(quote, material, measurements=None):
+    measurements = measurements or measure_roof(quote)
+    vat_rate = quote.vat_rate or 23
+    values = evaluate(measurements, material, quote.margin_percent or 35, vat_rate)
+    return build_result(values, material, vat_rate, measurements), dump_state(values, material)
+
+
+def _material_stamp(profile):
+    return [
+        profile.id, profile.version.isoformat() if profile.version else None,
+        list(profile.overlay) if profile.overlay else None,
+    ]
+
+
+# Bumped when the node values change units (older states are recalculated in full)
+STATE_FORMAT = 3
+
+
+def dump_state(values, material):
+    """Node values (fixed-point ints, so plain JSON) for Quote.calculation_state."""
+    return {
+        'format': STATE_FORMAT,
+        'material': _material_stamp(get_profile(material)),
+        'prices': get_obstacle_prices().version,
+        'nodes': values,
+    }
+
+
+# Quote fields written by a (re)calculation; Decimal fields are compared at 2 places
+RESULT_DECIMAL_FIELDS = ('plan_area', 'real_area', 'total_net', 'total_gross')
+
+
+def recalculate(quote, changed_fields):
+    """
+    Bring a calculated quote up to date after `changed_fields` were edited.
+
+    Only the graph nodes that depend on the changed fields are recomputed;
+    the rest come from quote.calculation_state. A material edited since the
+    last calculation is re-priced as well, and so are obstacles after an
+    obstacle price change. Returns the changed fields (see apply_result).
+    Quotes that were never calculated are left alone.
+    """
+    state = quote.calculation_state
+    if not quote.material_id or not state:
+        return []
+
+    profile = quote_profile(quote, quote.material)
+    inputs = {QUOTE_FIELD_INPUTS[field] for field in changed_fields if field in QUOTE_FIELD_INPUTS}
+    if state.get('material') != _material_stamp(profile):
+        inputs.add('material')
+    if state.get('prices') != get_obstacle_prices().version:
+        inputs.add('obstacle_list')
+    if not inputs:
+        return []
+
+    vat_rate = quote.vat_rate or 23
+    if state.get('format') == STATE_FORMAT:
+        values, dirty = state['nodes'], affected_nodes(inputs)
+    else:
+        values, dirty = None, None
+    values = evaluate(
+        _LazyMeasurements(quote), profile, quote.margin_percent or 35, vat_rate, values=values, dirty=dirty,
+    )
+    return apply_result(quote, build_result(values, profile, vat_rate), dump_state(values, profile))
+
+
+def apply_result(quote, result, state):
+    """
+    Set a calculation's result fields on the quote (nothing is saved) and
+    return the names of those that changed, for save(update_fields=...).
+    """
+    new_values = {
+        'plan_area': result['plan_area'],
+        'real_area': result['real_area'],
+        'materials_breakdown': result['materials'],
+        'total_net': result['summary']['total_net'],
+        'total_gross': result['summary']['total_gross'],
+        'calculation_state': state,
+    }
+    changed = []
+    for field, value in new_values.items():
+        if field in RESULT_DECIMAL_FIELDS:
+            value = Decimal(str(value)).quantize(Decimal('0.01'))
+        if getattr(quote, field) != value:
+            setattr(quote, field, value)
+            changed.append(field)
+    return changed
+
+
+def evaluate_quotes(quotes, material):
+    """
+    (result, calculation_state) for each of a batch of quotes priced with
+    one material. Quotes with identical inputs (see memo.memo_inputs) are
+    calculated once and share the result, and the geometry of each roof is
+    computed in one roof_geometries() batch over the pitches quoted for it.
+    The shared memo is bypassed, batches are one-off work.
+    """
+    distinct = {}
+    keys = []
+    for quote in quotes:
+        profile = quote_profile(quote, material)
+        inputs = memo.memo_inputs(quote, profile)
+        keys.append(inputs)
+        distinct.setdefault(inputs, (quote, profile))
+
+    # Roof -> {pitch: a quote of that roof and pitch}
+    roofs = {}
+    for quote, _ in distinct.values():
+        roofs.setdefault(memo.roof_inputs(quote), {}).setdefault(_pitch(quote), quote)
+    geometries = {}
+    for roof, by_pitch in roofs.items():
+        pitches = list(by_pitch)
+        for pitch, geometry in zip(pitches, _roof_geometries(by_pitch[pitches[0]], pitches)):
+            geometries[roof, pitch] = geometry
+
+    evaluated = {}
+    for inputs, (quote, profile) in distinct.items():
+        geometry = geometries[memo.roof_inputs(quote), _pitch(quote)]
+        measurements = {**geometry, **_obstacle_totals(quote.obstacles)}
+        evaluated[inputs] = _evaluate_quote(quote, profile, measurements)
+    return [evaluated[inputs] for inputs in keys]
+
+
+# Column order of the comparison matrix
+LINE_ITEMS = ('roofing', 'membrane', 'counter_battens', 'battens', 'screws', 'ridge_tape', 'valleys', 'obstacles')
+
+
+def compare_materials(quote, materials, margin_percent=None):
+    """
+    Price a quote with every given material at once, without saving anything.
+
+    The geometry is measured once and only the per-material pricing runs for
+    each material. Returns one row per material with line item quantities and
+    totals in LINE_ITEMS order (0 for items that do not apply).
+    """
+    measurements = measure_roof(quote)
+    if margin_percent is None:
+        margin_percent = quote.margin_percent or 35
+    vat_rate = quote.vat_rate or 23
+    company_id = _company_id(quote)
+
+    rows = []
+    for material in materials:
+        material = get_company_profile(material, company_id)
+        result = price_roof(measurements, material, margin_percent=margin_percent, vat_rate=vat_rate)
+        items = result['materials']
+        rows.append({
+            'material_id': material.id,
+            'name': material.name,
+            'category': material.category,
+            'price_per_m2': float(material.price_per_m2),
+            'quantities': [items[key]['quantity'] if key in items else 0 for key in LINE_ITEMS],
+            'totals': [items[key]['total'] if key in items else 0 for key in LINE_ITEMS],
+            'summary': result['summary'],
+        })
+
+    return {
+        'plan_area': mm2_display(measurements['plan_area']),
+        'real_area': mm2_display(measurements['real_area']),
+        'margin_percent': margin_percent,
+        'line_items': list(LINE_ITEMS),
+        'materials': rows,
+    }
+
+
+# Sweep nodes per waste factor, then per margin; the rest once per (pitch, material)
+SWEEP_MARGIN_NODES = affected_nodes(('margin',))
+SWEEP_WASTE_NODES = affected_nodes(('waste',)) - SWEEP_MARGIN_NODES
+SWEEP_FIXED_NODES = {node for node, _, _ in NODES} - SWEEP_WASTE_NODES - SWEEP_MARGIN_NODES
+
+
+def sweep_prices(quote, materials, margins, pitches, waste_factors):
+    """
+    What-if grid of quote totals, without saving anything.
+
+    Axes are pitch x material x waste factor x margin (a waste factor of None
+    means the material's own, or its sheet plan for sheet materials). The
+    roof is measured at every pitch in one batch (see measure_roofs) and each cell evaluates the calculation
+    graph like calculate_roof_materials, recomputing only the nodes its
+    waste factor and margin reach. Returns (total_net, total_gross) as
+    nested lists indexed [pitch][material][waste][margin].
+    """
+    company_id = _company_id(quote)
+    profiles = [get_company_profile(material, company_id) for material in materials]
+    vat_rate = quote.vat_rate or 23
+    waste_scaled = [None if waste is None else scaled(waste, WASTE_SCALE) for waste in waste_factors]
+
+    net_grid = []
+    gross_grid = []
+    for measurements in measure_roofs(quote, pitches):
+
+        pitch_net = []
+        pitch_gross = []
+        for profile in profiles:
+            fixed = evaluate(measurements, profile, None, vat_rate, dirty=SWEEP_FIXED_NODES)
+
+            material_net = []
+            material_gross = []
+            for waste in waste_scaled:
+                values = evaluate(
+                    measurements, profile, None, vat_rate, values={**fixed, 'waste': waste}, dirty=SWEEP_WASTE_NODES,
+                )
+                net = []
+                gross = []
+                for margin in margins:
+                    summary = evaluate(
+                        measurements, profile, margin, vat_rate, values=values, dirty=SWEEP_MARGIN_NODES,
+                    )['summary']
+                    net.append(pln_display(summary['total_net']))
+                    gross.append(pln_display(summary['total_gross']))
+                material_net.append(net)
+                material_gross.append(gross)
+            pitch_net.append(material_net)
+            pitch_gross.append(material_gross)
+        net_grid.append(pitch_net)
+        gross_grid.append(pitch_gross)
+
+    return net_grid, gross_grid
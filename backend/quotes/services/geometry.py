@@ -0,0 +1,298 @@
+"""
+Roof geometry per roof type.
+
+Each roof type is split into planes over the building footprint (length along
+the ridge, width across it). A plane knows its plan area, pitch, slope length
+and eave/top widths, which is enough for areas, battens and counter-battens.
+Edge lengths (ridge, hips, valleys, eaves, rakes) and the accessory counts
+derived from them (ridge caps, gutters, downpipes) come with it.
+
+Edges measured by the AI analysis (Quote.roof_measurements) and the gasior /
+gutter counts it extracted override the computed values when present.
+
+All lengths are whole millimetres and areas square millimetres (see
+core.fixed_point); pitches are whole degrees (Quote.pitch_angle), so the trig
+factors come from precomputed tables.
+"""
+from typing import NamedTuple
+
+from core.fixed_point import FACTOR, MM, div_round, hip_factor, sec_factor, to_mm
+
+DEFAULT_PITCH = 35
+# Flat roofs keep only a drainage fall
+FLAT_MAX_PITCH = 10
+# Half-hip: the hipped part covers this share (%) of the gable height
+HALF_HIP_PERCENT = 33
+# Mansard: steep lower planes over this share (%) of the half-width
+MANSARD_LOWER_PITCH = 70
+MANSARD_LOWER_RUN_PERCENT = 25
+# L-shaped roofs without measured wing dimensions (% of the length)
+DEFAULT_WING_LENGTH_PERCENT = 50
+
+# Counter-battens per plane (a full slope / a hip end)
+COUNTER_BATTENS_PER_PLANE = 10
+COUNTER_BATTENS_PER_END = 5
+
+# One downpipe per this many metres of gutter, at least two
+GUTTER_PER_DOWNPIPE_M = 10
+
+# Gasior and gutter fittings per roof type when the AI did not count them
+ROOF_TYPE_FITTINGS = {
+    'gable': {'junctions': 0, 'corner_gasiors': 0, 'start_gasiors': 1, 'end_gasiors': 1, 'gutter_corners': 0, 'gutter_end_caps': 4},
+    'gable_l': {'junctions': 1, 'corner_gasiors': 0, 'start_gasiors': 2, 'end_gasiors': 1, 'gutter_corners': 2, 'gutter_end_caps': 4},
+    'half_hip': {'junctions': 2, 'corner_gasiors': 4, 'start_gasiors': 0, 'end_gasiors': 0, 'gutter_corners': 0, 'gutter_end_caps': 4},
+    'hip': {'junctions': 2, 'corner_gasiors': 4, 'start_gasiors': 0, 'end_gasiors': 0, 'gutter_corners': 4, 'gutter_end_caps': 0},
+    'hip_envelope': {'junctions': 2, 'corner_gasiors': 4, 'start_gasiors': 0, 'end_gasiors': 0, 'gutter_corners': 4, 'gutter_end_caps': 0},
+    'multi_hip': {'junctions': 4, 'corner_gasiors': 6, 'start_gasiors': 0, 'end_gasiors': 0, 'gutter_corners': 6, 'gutter_end_caps': 0},
+    'multi_hip_l': {'junctions': 3, 'corner_gasiors': 6, 'start_gasiors': 0, 'end_gasiors': 0, 'gutter_corners': 6, 'gutter_end_caps': 0},
+    'mansard': {'junctions': 0, 'corner_gasiors': 0, 'start_gasiors': 1, 'end_gasiors': 1, 'gutter_corners': 0, 'gutter_end_caps': 4},
+    'shed': {'junctions': 0, 'corner_gasiors': 0, 'start_gasiors': 0, 'end_gasiors': 0, 'gutter_corners': 0, 'gutter_end_caps': 2},
+    'skillion': {'junctions': 0, 'corner_gasiors': 0, 'start_gasiors': 0, 'end_gasiors': 0, 'gutter_corners': 0, 'gutter_end_caps': 2},
+    'flat': {'junctions': 0, 'corner_gasiors': 0, 'start_gasiors': 0, 'end_gasiors': 0, 'gutter_corners': 4, 'gutter_end_caps': 0},
+}
+
+
+class Plane(NamedTuple):
+    plan_area: int  # mm²
+    pitch: int
+    slope: int  # eave to top, along the slope (mm)
+    eave: int  # width at the eave (mm)
+    top: int  # width at the top, 0 for a triangle (mm)
+    counter_battens: int
+
+    @property
+    def batten_width_x2(self) -> int:
+        """Twice the average width of a horizontal batten row (mm)."""
+        return self.eave + self.top
+
+
+def rafter(run: int, pitch) -> int:
+    """
+    Slope length over a horizontal run (mm), rounded down: a slope just short
+    of a batten spacing multiple must not gain a batten row.
+    """
+    return run * sec_factor(pitch) // FACTOR
+
+
+def hip(run: int, pitch) -> int:
+    """Hip or valley length between two planes of equal pitch over a run (mm)."""
+    return div_round(run * hip_factor(pitch), FACTOR)
+
+
+def _edges(ridge=0, hips=0, valleys=0, eaves=0, rakes=0, breaks=0):
+    return {'ridge': ridge, 'hips': hips, 'valleys': valleys, 'eaves': eaves, 'rakes': rakes, 'breaks': breaks}
+
+
+def _gable(length, width, pitch, wing):
+    run = div_round(width, 2)
+    slope = rafter(run, pitch)
+    plane = Plane(div_round(length * width, 2), pitch, slope, length, length, COUNTER_BATTENS_PER_PLANE)
+    return [plane, plane], _edges(ridge=length, eaves=length * 2, rakes=slope * 4)
+
+
+def _shed(length, width, pitch, wing):
+    slope = rafter(width, pitch)
+    plane = Plane(length * width, pitch, slope, length, length, COUNTER_BATTENS_PER_PLANE)
+    return [plane], _edges(eaves=length, rakes=slope * 2)
+
+
+def _flat(length, width, pitch, wing):
+    return _shed(length, width, min(pitch, FLAT_MAX_PITCH), wing)
+
+
+def _hip_planes(length, width, pitch):
+    if width > length:
+        length, width = width, length
+    run = div_round(width, 2)
+    slope = rafter(run, pitch)
+    ridge = length - width
+    side = Plane(div_round((length + ridge) * run, 2), pitch, slope, length, ridge, COUNTER_BATTENS_PER_PLANE)
+    end = Plane(div_round(width * run, 2), pitch, slope, width, 0, COUNTER_BATTENS_PER_END)
+    return [side, side, end, end], ridge, hip(run, pitch)
+
+
+def _hipped(length, width, pitch, wing):
+    planes, ridge, hip_length = _hip_planes(length, width, pitch)
+    return planes, _edges(ridge=ridge, hips=hip_length * 4, eaves=(length + width) * 2)
+
+
+def _half_hip(length, width, pitch, wing):
+    run = div_round(width, 2)
+    hip_run = div_round(run * HALF_HIP_PERCENT, 100)
+    slope = rafter(run, pitch)
+    corner = hip_run * hip_run
+    ridge = length - hip_run * 2
+    side = Plane(length * run - corner, pitch, slope, length, ridge, COUNTER_BATTENS_PER_PLANE)
+    end = Plane(corner, pitch, rafter(hip_run, pitch), hip_run * 2, 0, COUNTER_BATTENS_PER_END)
+    return [side, side, end, end], _edges(
+        ridge=ridge, hips=hip(hip_run, pitch) * 4, eaves=length * 2,
+        rakes=div_round(slope * (100 - HALF_HIP_PERCENT) * 4, 100),
+    )
+
+
+def _mansard(length, width, pitch, wing):
+    run = div_round(width, 2)
+    lower_run = div_round(run * MANSARD_LOWER_RUN_PERCENT, 100)
+    upper_run = run - lower_run
+    lower_slope = rafter(lower_run, MANSARD_LOWER_PITCH)
+    upper_slope = rafter(upper_run, pitch)
+    lower = Plane(length * lower_run, MANSARD_LOWER_PITCH, lower_slope, length, length, COUNTER_BATTENS_PER_PLANE)
+    upper = Plane(length * upper_run, pitch, upper_slope, length, length, COUNTER_BATTENS_PER_PLANE)
+    return [lower, lower, upper, upper], _edges(
+        ridge=length, eaves=length * 2, rakes=(lower_slope + upper_slope) * 4, breaks=length * 2,
+    )
+
+
+def _gable_l(length, width, pitch, wing):
+    wing_length, wing_width = wing
+    planes, edges = _gable(length, width, pitch, None)
+    wing_run = div_round(wing_width, 2)
+    wing_slope = rafter(wing_run, pitch)
+    wing_plane = Plane(
+        div_round(wing_length * wing_width, 2), pitch, wing_slope, wing_length, wing_length, COUNTER_BATTENS_PER_PLANE,
+    )
+    edges['ridge'] += wing_length + div_round(min(wing_width, width), 2)
+    edges['valleys'] += hip(wing_run, pitch) * 2
+    edges['eaves'] += wing_length * 2 - wing_width
+    edges['rakes'] += wing_slope * 2
+    return planes + [wing_plane, wing_plane], edges
+
+
+def _hipped_l(length, width, pitch, wing):
+    wing_length, wing_width = wing
+    planes, ridge, hip_length = _hip_planes(length, width, pitch)
+    wing_run = div_round(wing_width, 2)
+    wing_slope = rafter(wing_run, pitch)
+    wing_hip = hip(wing_run, pitch)
+    wing_top = max(wing_length - wing_run, 0)
+    wing_side = Plane(
+        div_round((wing_length + wing_top) * wing_run, 2), pitch, wing_slope, wing_length, wing_top,
+        COUNTER_BATTENS_PER_PLANE,
+    )
+    wing_end = Plane(div_round(wing_width * wing_run, 2), pitch, wing_slope, wing_width, 0, COUNTER_BATTENS_PER_END)
+    return planes + [wing_side, wing_side, wing_end], _edges(
+        ridge=ridge + wing_length,
+        hips=hip_length * 4 + wing_hip * 2,
+        valleys=wing_hip * 2,
+        eaves=(length + width) * 2 + wing_length * 2 - wing_width,
+    )
+
+
+ROOF_TYPE_BUILDERS = {
+    'gable': _gable,
+    'gable_l': _gable_l,
+    'hip': _hipped,
+    'hip_envelope': _hipped,
+    'multi_hip': _hipped,
+    'multi_hip_l': _hipped_l,
+    'half_hip': _half_hip,
+    'mansard': _mansard,
+    'shed': _shed,
+    'skillion': _shed,
+    'flat': _flat,
+}
+
+# Quote.roof_measurements key -> edges it replaces
+MEASURED_EDGES = {
+    'ridge_length': 'ridge',
+    'valley_length': 'valleys',
+    'eave_length': 'eaves',
+}
+
+
+def _positive(value) -> int:
+    """A measured length in metres as positive millimetres (0 if missing or invalid)."""
+    return max(to_mm(value), 0)
+
+
+def roof_geometry(roof_type, length, width, pitch, dimensions=None, measurements=None,
+                  gasior_elements=None, gutter_system=None):
+    """
+    Planes, edges and accessories of a roof.
+
+    length/width: building footprint in millimetres
+    dimensions: Quote.dimensions, for the 'wing_length'/'wing_width' of L-shaped roofs (metres)
+    measurements, gasior_elements, gutter_system: AI-extracted values (override computed ones)
+
+    Areas are returned in mm², edges and the *_m accessories in mm.
+    """
+    return roof_geometries(
+        roof_type, length, width, [pitch], dimensions=dimensions, measurements=measurements,
+        gasior_elements=gasior_elements, gutter_system=gutter_system,
+    )[0]
+
+
+def roof_geometries(roof_type, length, width, pitches, dimensions=None, measurements=None,
+                    gasior_elements=None, gutter_system=None):
+    """
+    roof_geometry() of one roof at each of several pitches (what-if sweeps),
+    in the order of pitches. The footprint, wings and measured edges are
+    worked out once for all of them.
+    """
+    dimensions = dimensions or {}
+    builder = ROOF_TYPE_BUILDERS.get(roof_type, _gable)
+
+    wing = None
+    if builder in (_gable_l, _hipped_l):
+        wing = (
+            _positive(dimensions.get('wing_length')) or div_round(length * DEFAULT_WING_LENGTH_PERCENT, 100),
+            _positive(dimensions.get('wing_width')) or width,
+        )
+
+    measurements = measurements or {}
+    measured = {}
+    for key, edge in MEASURED_EDGES.items():
+        value = _positive(measurements.get(key))
+        if value:
+            measured[edge] = value
+    measured_rakes = _positive(measurements.get('gable_edge_left')) + _positive(measurements.get('gable_edge_right'))
+    if measured_rakes:
+        measured['rakes'] = measured_rakes
+
+    plan_area = length * width
+    if wing:
+        plan_area += wing[0] * wing[1]
+
+    geometries = []
+    for pitch in pitches:
+        planes, edges = builder(length, width, pitch, wing)
+
+        # Real area per pitch, so each pitch's factor is applied once
+        plan_by_pitch = {}
+        for plane in planes:
+            plan_by_pitch[plane.pitch] = plan_by_pitch.get(plane.pitch, 0) + plane.plan_area
+        real_area = 0
+        for plane_pitch, plan in plan_by_pitch.items():
+            sec = sec_factor(plane_pitch)
+            real_area += div_round(plan * sec, FACTOR) if sec > 0 else plan
+
+        edges.update(measured)
+        geometries.append({
+            'plan_area': plan_area,
+            'real_area': real_area,
+            'planes': planes,
+            'edges': edges,
+            'accessories': _accessories(roof_type, edges, gasior_elements or {}, gutter_system or {}),
+        })
+    return geometries
+
+
+def _accessories(roof_type, edges, gasior_elements, gutter_system):
+    fittings = ROOF_TYPE_FITTINGS.get(roof_type, ROOF_TYPE_FITTINGS['gable'])
+    downpipes = max(2, -(-edges['eaves'] // (GUTTER_PER_DOWNPIPE_M * MM))) if edges['eaves'] else 0
+
+    def counted(source, key, default):
+        value = source.get(key)
+        return int(value) if value else default
+
+    return {
+        'ridge_caps_m': edges['ridge'] + edges['hips'],
+        'gutters_m': edges['eaves'],
+        'junctions': counted(gasior_elements, 'junctions', fittings['junctions']),
+        'corner_gasiors': counted(gasior_elements, 'corner_gasiors', fittings['corner_gasiors']),
+        'start_gasiors': counted(gasior_elements, 'start_gasiors', fittings['start_gasiors']),
+        'end_gasiors': counted(gasior_elements, 'end_gasiors', fittings['end_gasiors']),
+        'gutter_corners': counted(gutter_system, 'corners', fittings['gutter_corners']),
+        'gutter_end_caps': counted(gutter_system, 'end_caps', fittings['gutter_end_caps']),
+        'downpipes': counted(gutter_system, 'downpipes', downpipes),
+    }
@@ -0,0 +1,160 @@
+"""
+Memoized quote calculations.
+
+Many quotes share identical inputs (catalogue houses with the same material
+and the default margin), so full calculations are memoized on the normalized
+inputs: dimensions, pitch, roof type and measured roof data, obstacle counts
+per type and the obstacle price table version, the material's id and
+version (and the company's price overlay, if any), margin and VAT.
+
+Two tiers: a small LRU per process keyed by the normalized inputs themselves,
+then the shared cache (Redis) keyed by their digest. Results are stored
+pickled, so every caller gets its own copy. Since the material version
+(updated_at) is part of the key, a saved Material never hits its old entries;
+its local entries are dropped as well (see quotes.signals) and the shared
+ones expire.
+"""
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from materials.price_tables import get_obstacle_prices
+from materials.profiles import get_profile
+
+# Bump when calculator formulas change, so the shared tier never serves
+# results computed by an older deploy
+CALCULATOR_VERSION = 3
+
+MEMO_KEY = 'quotes:calc:{}'
+MEMO_TTL = 60 * 60 * 24
+LOCAL_MAX_ENTRIES = 512
+
+
+def _normalize(value):
+    """Hashable, stable form of a quote input: numbers as floats, dicts as sorted items."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        return float(value)
+    if isinstance(value, dict):
+        return tuple((str(key), _normalize(item)) for key, item in sorted(value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    return value
+
+
+def _obstacle_counts(obstacles):
+    # Totals only depend on the count per type, not on order or grouping
+    counts = {}
+    for obstacle in (obstacles or []):
+        obstacle_type = obstacle.get('type', '')
+        counts[obstacle_type] = counts.get(obstacle_type, 0) + obstacle.get('quantity', 0)
+    return tuple(sorted(counts.items()))
+
+
+def memo_inputs(quote, profile) -> tuple:
+    return (
+        CALCULATOR_VERSION,
+        _normalize(quote.dimensions),
+        _normalize(quote.pitch_angle if quote.pitch_angle is not None else 35),
+        quote.roof_type,
+        _normalize(quote.roof_measurements),
+        _normalize(quote.gasior_elements),
+        _normalize(quote.gutter_system),
+        _obstacle_counts(quote.obstacles),
+        get_obstacle_prices().version,
+        profile.id,
+        profile.version.isoformat() if profile.version else None,
+        profile.overlay,
+        quote.margin_percent or 35,
+        quote.vat_rate or 23,
+    )
+
+
+def roof_inputs(quote) -> tuple:
+    """The inputs of memo_inputs() the roof geometry depends on, but for the pitch."""
+    return (
+        _normalize(quote.dimensions),
+        quote.roof_type,
+        _normalize(quote.roof_measurements),
+        _normalize(quote.gasior_elements),
+        _normalize(quote.gutter_system),
+    )
+
+
+def memo_key(inputs: tuple) -> str:
+    """Shared cache key of memo_inputs()."""
+    return MEMO_KEY.format(hashlib.sha1(repr(inputs).encode()).hexdigest())
+
+
+class _LRUCache:
+    """Thread-safe in-process LRU of inputs -> (material id, pickled result)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, material_id, payload):
+        with self._lock:
+            self._entries[key] = (material_id, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def drop_material(self, material_id):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0] == material_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = _LRUCache(LOCAL_MAX_ENTRIES)
+
+
+def remember(quote, material, compute):
+    """
+    compute() for the quote and material, memoized on their inputs.
+    Hits return a fresh copy.
+    """
+    profile = get_profile(material)
+    if profile.id is None:
+        return compute()
+
+    inputs = memo_inputs(quote, profile)
+    payload = _local.get(inputs)
+    if payload is None:
+        key = memo_key(inputs)
+        payload = cache.get(key)
+        if payload is None:
+            value = compute()
+            payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            cache.set(key, payload, MEMO_TTL)
+            _local.set(inputs, profile.id, payload)
+            return value
+        _local.set(inputs, profile.id, payload)
+    return pickle.loads(payload)
+
+
+def forget_material(material_id):
+    """Drop this process's memoized results for a material."""
+    _local.drop_material(material_id)
+
+
+def clear_local():
+    _local.clear()
@@ -1,28 +1,71 @@
 """
 PDF generation service using WeasyPrint.
+
+Rendering runs in the PDF worker (quotes.tasks.generate_quote_pdf_task on
+the QUOTE_PDF_QUEUE), not in web requests. Everything a render does not need
+to redo is built once per process and kept: the compiled template, the
+parsed stylesheet (templates/quotes/pdf_template.css, kept out of the HTML
+so it is not parsed again for every quote) and the font configuration, whose
+fontconfig lookups are the slow part of a cold render. warm_renderer()
+builds them ahead of the first quote; PDF workers call it when they start.
 """
-import os
-from django.template.loader import render_to_string
+import logging
+from functools import lru_cache
+from typing import NamedTuple
+
 from django.conf import settings
 from django.core.files.base import ContentFile
+from django.template.loader import get_template
 
 try:
-    from weasyprint import HTML
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
     WEASYPRINT_AVAILABLE = True
-except ImportError:
+except (ImportError, OSError):
+    # OSError: installed, but the system Pango libraries are missing
     WEASYPRINT_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
 
-def generate_quote_pdf(quote):
-    """
-    Generate PDF for a quote and save it to the quote model.
-    
-    Returns the saved file path.
-    """
+TEMPLATE_NAME = 'quotes/pdf_template.html'
+STYLESHEET_PATH = settings.BASE_DIR / 'templates' / 'quotes' / 'pdf_template.css'
+
+
+class PdfRenderer(NamedTuple):
+    """Per-process WeasyPrint state shared by every quote PDF."""
+    font_config: object
+    stylesheet: object
+
+
+@lru_cache(maxsize=None)
+def quote_pdf_template():
+    """The compiled quote PDF template."""
+    return get_template(TEMPLATE_NAME)
+
+
+@lru_cache(maxsize=None)
+def pdf_renderer() -> PdfRenderer:
+    """Font configuration and parsed stylesheet, created once per process."""
     if not WEASYPRINT_AVAILABLE:
         raise ImportError("WeasyPrint is not installed")
-    
-    # Prepare context
+    font_config = FontConfiguration()
+    stylesheet = CSS(filename=str(STYLESHEET_PATH), font_config=font_config)
+    return PdfRenderer(font_config, stylesheet)
+
+
+def warm_renderer():
+    """Build the template, stylesheet and fonts now instead of on the first quote."""
+    quote_pdf_template()
+    renderer = pdf_renderer()
+    # Lays out a line of text, so fontconfig resolves the stylesheet's fonts
+    HTML(string='<p class="total">Oferta</p>').write_pdf(
+        stylesheets=[renderer.stylesheet], font_config=renderer.font_config
+    )
+    logger.info("Quote PDF renderer ready")
+
+
+def quote_pdf_context(quote) -> dict:
+    """Template context of a quote PDF."""
     context = {
         'quote': quote,
         'quote_number': quote.number,
@@ -42,29 +85,44 @@ def generate_quote_pdf(quote):
         'margin_percent': quote.margin_percent,
         'user': quote.user,
     }
-    
+
     # Calculate VAT amount
     if quote.total_net and quote.total_gross:
         context['vat_amount'] = float(quote.total_gross) - float(quote.total_net)
-    
+
     # Calculate labor cost
     if quote.materials_breakdown:
         materials_sum = sum(
-            m.get('total', 0) 
-            for m in quote.materials_breakdown.values() 
+            m.get('total', 0)
+            for m in quote.materials_breakdown.values()
             if isinstance(m, dict)
         )
         context['materials_net'] = materials_sum
         context['labor_net'] = float(quote.total_net or 0) - materials_sum if quote.total_net else 0
-    
-    # Render HTML
-    html_string = render_to_string('quotes/pdf_template.html', context)
-    
-    # Generate PDF
-    pdf_file = HTML(string=html_string, base_url=str(settings.BASE_DIR)).write_pdf()
-    
+
+    return context
+
+
+def render_quote_pdf(quote) -> bytes:
+    """PDF bytes of a quote."""
+    renderer = pdf_renderer()
+    html_string = quote_pdf_template().render(quote_pdf_context(quote))
+    return HTML(string=html_string, base_url=str(settings.BASE_DIR)).write_pdf(
+        stylesheets=[renderer.stylesheet], font_config=renderer.font_config
+    )
+
+
+def generate_quote_pdf(quote):
+    """
+    Generate PDF for a quote and save it to the quote model.
+
+    Returns the saved file path.
+    """
+    pdf_file = render_quote_pdf(quote)
+
     # Save to quote
     filename = f'oferta_{quote.number.replace("/", "-")}.pdf'
-    quote.pdf_file.save(filename, ContentFile(pdf_file), save=True)
-    
+    quote.pdf_file.save(filename, ContentFile(pdf_file), save=False)
+    quote.save(update_fields=['pdf_file', 'updated_at'])
+
     return quote.pdf_file.path
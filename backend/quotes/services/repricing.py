@@ -0,0 +1,153 @@
+"""
+Bulk repricing of draft quotes after a material's prices change.
+
+Affected quotes are streamed with iterator() and repriced in chunks:
+calculator.evaluate_quotes calculates each distinct set of inputs in a chunk
+once, and the changed quotes are written back per chunk (one UPDATE per
+group of identical quotes, bulk_update for the rest) instead of two saves
+per quote.
+
+The changed quotes of a chunk are locked before they are written. A quote
+saved since it was read (updated_at moved) is read again under the lock and
+repriced from its current inputs, since not every save recalculates.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from materials.models import Material
+from users.models import Company
+from ..models import Quote
+from .calculator import apply_result, evaluate_quotes
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+# Only open drafts are repriced, sent quotes keep the price the client saw
+REPRICED_STATUSES = ('draft',)
+
+QUOTE_FIELDS = (
+    'id', 'number', 'material_id', 'dimensions', 'pitch_angle', 'roof_type',
+    'roof_measurements', 'gasior_elements', 'gutter_system', 'obstacles',
+    'margin_percent', 'vat_rate', 'plan_area', 'real_area', 'materials_breakdown',
+    'total_net', 'total_gross', 'calculation_state', 'updated_at',
+)
+UPDATE_FIELDS = (
+    'plan_area', 'real_area', 'materials_breakdown', 'total_net', 'total_gross',
+    'calculation_state', 'updated_at',
+)
+
+
+def _draft_quotes(material_id):
+    return (
+        Quote.objects
+        .filter(material_id=material_id, status__in=REPRICED_STATUSES)
+        .only(*QUOTE_FIELDS)
+        .annotate(company_id=F('user__company_id'))
+    )
+
+
+def _evaluate_changes(quotes, material):
+    # (quote, evaluation, old totals, updated_at as read) of the quotes the material changes
+    changed = []
+    for quote, evaluation in zip(quotes, evaluate_quotes(quotes, material)):
+        old_totals = (quote.total_net or Decimal('0'), quote.total_gross or Decimal('0'), quote.updated_at)
+        if apply_result(quote, *evaluation):
+            changed.append((quote, evaluation, old_totals))
+    return changed
+
+
+def _reprice_chunk(chunk, material, report):
+    changed = _evaluate_changes(chunk, material)
+    if not changed:
+        return
+
+    with transaction.atomic():
+        stored = dict(
+            Quote.objects.select_for_update()
+            .filter(pk__in=[quote.pk for quote, _, _ in changed])
+            .values_list('pk', 'updated_at')
+        )
+        stale = [quote.pk for quote, _, (_, _, read_at) in changed if stored.get(quote.pk) != read_at]
+        if stale:
+            # Saved since they were read: reprice the locked rows as they are
+            # now (quotes no longer drafts of the material are left alone)
+            fresh = list(_draft_quotes(material.pk).filter(pk__in=stale))
+            report['skipped'] += len(stale) - len(fresh)
+            changed = [entry for entry in changed if entry[0].pk not in stale] + _evaluate_changes(fresh, material)
+
+        now = timezone.now()
+        # Changed quotes grouped by their (shared) evaluation
+        groups = {}
+        for quote, evaluation, (old_net, old_gross, _) in changed:
+            quote.updated_at = now
+            groups.setdefault(id(evaluation), []).append(quote)
+
+            change = report['companies'].setdefault(quote.company_id, {
+                'company_id': quote.company_id,
+                'quotes': 0,
+                'total_net_change': Decimal('0'),
+                'total_gross_change': Decimal('0'),
+            })
+            change['quotes'] += 1
+            change['total_net_change'] += quote.total_net - old_net
+            change['total_gross_change'] += quote.total_gross - old_gross
+
+        # Identical quotes (catalogue houses) take one UPDATE per group; the
+        # CASE expressions bulk_update builds per row are its main cost.
+        single = []
+        for quotes in groups.values():
+            if len(quotes) == 1:
+                single.extend(quotes)
+                continue
+            Quote.objects.filter(pk__in=[quote.pk for quote in quotes]).update(
+                **{name: getattr(quotes[0], name) for name in UPDATE_FIELDS}
+            )
+        if single:
+            Quote.objects.bulk_update(single, UPDATE_FIELDS)
+    report['updated'] += sum(len(quotes) for quotes in groups.values())
+
+
+def reprice_material_quotes(material_id, chunk_size=CHUNK_SIZE) -> dict:
+    """
+    Reprice every draft quote calculated with the material.
+
+    Returns {'material_id', 'quotes', 'updated', 'skipped', 'companies'},
+    skipped counting quotes that stopped being drafts of the material during
+    the run and companies listing the quotes updated and the total net and
+    gross change per company (company_id None for users without one).
+    """
+    material = Material.objects.get(pk=material_id)
+    report = {'material_id': material_id, 'quotes': 0, 'updated': 0, 'skipped': 0, 'companies': {}}
+
+    quotes = _draft_quotes(material_id).order_by('id')
+    chunk = []
+    for quote in quotes.iterator(chunk_size=chunk_size):
+        report['quotes'] += 1
+        chunk.append(quote)
+        if len(chunk) >= chunk_size:
+            _reprice_chunk(chunk, material, report)
+            chunk = []
+    if chunk:
+        _reprice_chunk(chunk, material, report)
+
+    companies = report['companies'].values()
+    names = dict(Company.objects.filter(pk__in=[c['company_id'] for c in companies]).values_list('id', 'name'))
+    report['companies'] = [
+        {
+            **change,
+            'company': names.get(change['company_id'], ''),
+            'total_net_change': float(change['total_net_change']),
+            'total_gross_change': float(change['total_gross_change']),
+        }
+        for change in companies
+    ]
+
+    logger.info(
+        f"Repriced {report['updated']} of {report['quotes']} draft quotes for material {material_id}"
+    )
+    return report
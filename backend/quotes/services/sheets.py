@@ -0,0 +1,277 @@
+"""
+Sheet planning (cutting stock) for metal roofing.
+
+Metal tiles and trapezoidal sheets are ordered as sheets cut to length, so
+instead of a flat waste factor the roof is laid out in sheets:
+
+- every plane is covered by columns one effective sheet width wide, running
+  from the eave up the slope. A column needs a piece as long as the longest
+  slope inside it: the full slope under the ridge, less towards the hips of
+  trapezoid and triangle planes. Slopes longer than a sheet are split into
+  pieces that overlap.
+- every piece is rounded up to the profile module: metal tiles are pressed
+  in whole modules and can only be cut where one ends, so each piece cut
+  from a sheet is whole modules long, and slopes are split at the longest
+  whole-module piece a sheet holds.
+- pieces are packed into as few sheets of at most the maximum length as
+  possible. The ordered length is the pieces' total either way, fewer
+  sheets mean fewer cuts and parts to handle.
+
+Packing is first-fit decreasing, run by run of equal pieces (a roof has a
+few piece lengths, mostly full slopes). When that misses the lower bound
+(see _lower_bound), a branch and bound search over at most
+EXACT_NODE_BUDGET nodes looks for fewer sheets. The price does not depend
+on the packing, only the sheet count shown does, and on the benchmark roofs
+a larger budget saves about one sheet per hundred roofs; the budget is a
+node count rather than a deadline so that the same roof always gets the
+same plan. Plans are cached per process on the planes and sheet size (so no
+material edit can make one stale), which compare_materials and
+sweep_prices ask for repeatedly. All lengths are whole millimetres,
+computed in integers.
+"""
+from collections import Counter
+from functools import lru_cache
+
+from core.fixed_point import div_round
+
+EXACT_NODE_BUDGET = 50
+# Larger layouts take first-fit decreasing as it is
+EXACT_MAX_PIECES = 60
+
+
+def _ceil_to(value, module):
+    return -(-value // module) * module if module > 1 else value
+
+
+def _ceil_div(numerator, denominator):
+    return -(-numerator // denominator)
+
+
+def plane_pieces(plane, sheet_width, max_length, overlap):
+    """Piece lengths (mm) covering one plane with sheets of sheet_width."""
+    if plane.eave <= 0 or plane.slope <= 0:
+        return []
+    eave, slope = plane.eave, plane.slope
+    # Horizontal positions are doubled so the middle of the plane and the
+    # run of each hip cut (half the difference of the edges) stay whole
+    cut = max(eave - plane.top, 0)
+    columns = _ceil_div(eave, sheet_width)
+    # Columns reaching between the hip cuts need the full slope
+    if cut:
+        first = max(_ceil_div(cut, 2 * sheet_width) - 1, 0)
+        last = min((2 * eave - cut) // (2 * sheet_width), columns - 1)
+    else:
+        first, last = 0, columns - 1
+
+    pieces = _split(slope, max_length, overlap) * max(last - first + 1, 0)
+    for column in (*range(first), *range(last + 1, columns)):
+        # The column's point nearest the middle of the plane has its longest slope
+        start, end = 2 * column * sheet_width, 2 * min((column + 1) * sheet_width, eave)
+        nearest = min(max(eave, start), end)
+        distance = min(nearest, 2 * eave - nearest)
+        if distance > 0:
+            pieces.extend(_split(_ceil_div(slope * distance, cut), max_length, overlap))
+    return pieces
+
+
+def _split(length, max_length, overlap):
+    # Slopes longer than one sheet are split, consecutive pieces overlapping
+    pieces = []
+    while length > max_length:
+        pieces.append(max_length)
+        length -= max_length - overlap
+    pieces.append(length)
+    return pieces
+
+
+def roof_pieces(planes, sheet_width, max_length, overlap):
+    pieces = []
+    for plane in planes:
+        pieces.extend(plane_pieces(plane, sheet_width, max_length, overlap))
+    return pieces
+
+
+def _first_fit_decreasing(runs, max_length):
+    """Sheet contents of (length, count) runs of pieces (longest first) packed first fit."""
+    shortest = runs[-1][0] if runs else 0
+    # Sheets in first fit order as (content, sheets) groups of equal sheets,
+    # filled a run at a time: first fit fills the first sheet with room
+    # before moving on. Sheets the shortest piece no longer fits on are done.
+    groups = []
+    done = []
+    for piece, count in runs:
+        placed = []
+        for content, sheets in groups:
+            per_sheet = (max_length - content) // piece if count else 0
+            if not per_sheet:
+                placed.append((content, sheets))
+                continue
+            filled = min(count // per_sheet, sheets)
+            count -= filled * per_sheet
+            placed.append((content + per_sheet * piece, filled))
+            if count and filled < sheets:
+                placed.append((content + count * piece, 1))
+                filled += 1
+                count = 0
+            placed.append((content, sheets - filled))
+        per_sheet = max_length // piece
+        placed.append((per_sheet * piece, count // per_sheet))
+        placed.append((count % per_sheet * piece, 1 if count % per_sheet else 0))
+
+        groups = []
+        for content, sheets in placed:
+            if sheets:
+                (groups if max_length - content >= shortest else done).append((content, sheets))
+    return _expand(done + groups)
+
+
+def _expand(runs):
+    # (length, count) runs as a flat list of lengths
+    lengths = []
+    for length, count in runs:
+        lengths += [length] * count
+    return lengths
+
+
+def _lower_bound(runs, max_length):
+    """
+    Fewest sheets that can hold (length, count) runs of pieces (longest
+    first), the L2 bound of Martello and Toth: for each length k of the
+    short pieces, the pieces no short one fits next to take a sheet each,
+    the pieces longer than half a sheet one more each, and short pieces of
+    at least k fill what the latter leave free before opening sheets of
+    their own.
+    """
+    long_runs = [(piece, count) for piece, count in runs if 2 * piece > max_length]
+    long_count = sum(count for _, count in long_runs)
+    bound = max(long_count, _ceil_div(sum(piece * count for piece, count in runs), max_length))
+    short_length = 0
+    for k, count in runs[len(long_runs):]:
+        # Runs are longest first: short_length adds up the short pieces of at least k
+        short_length += k * count
+        free = sum((max_length - piece) * count for piece, count in long_runs if piece <= max_length - k)
+        bound = max(bound, long_count + max(_ceil_div(short_length - free, max_length), 0))
+    return bound
+
+
+def _branch_and_bound(pieces, max_length, best_count, lower_bound):
+    """
+    Sheet contents of fewer than best_count sheets for pieces (longest
+    first), or None when none is found within EXACT_NODE_BUDGET nodes.
+    """
+    contents = []
+    # Sheet of each placed piece; equal pieces go to the same or a later sheet
+    assignment = [0] * len(pieces)
+    # Length of the pieces from each index on
+    remaining = [0] * (len(pieces) + 1)
+    for index in range(len(pieces) - 1, -1, -1):
+        remaining[index] = remaining[index + 1] + pieces[index]
+    best = None
+    nodes = 0
+
+    def search(index, free):
+        # free: length still unused in the open sheets
+        nonlocal best, best_count, nodes
+        nodes += 1
+        if nodes > EXACT_NODE_BUDGET:
+            return
+        if len(contents) + _ceil_div(max(remaining[index] - free, 0), max_length) >= best_count:
+            return
+        if index == len(pieces):
+            best_count = len(contents)
+            best = list(contents)
+            return
+        piece = pieces[index]
+        first = assignment[index - 1] if index and pieces[index - 1] == piece else 0
+        tried = set()
+        for sheet in range(first, len(contents)):
+            content = contents[sheet]
+            # Sheets with the same content are interchangeable
+            if content + piece > max_length or content in tried:
+                continue
+            tried.add(content)
+            contents[sheet] = content + piece
+            assignment[index] = sheet
+            search(index + 1, free - piece)
+            contents[sheet] = content
+            if best_count <= lower_bound:
+                return
+        contents.append(piece)
+        assignment[index] = len(contents) - 1
+        search(index + 1, free + max_length - piece)
+        contents.pop()
+
+    search(0, 0)
+    return best
+
+
+def plan_sheets(pieces, max_length, module=1, exact=True):
+    """
+    Round pieces up to the module and pack them into sheets of at most
+    max_length.
+
+    Returns {'sheets': [ordered lengths, longest first], 'pieces_length'
+    (before rounding), 'ordered_length', 'optimal'}; optimal is True when
+    the plan is proven to use the fewest sheets.
+    """
+    counts = {}
+    for piece, count in Counter(pieces).items():
+        piece = _ceil_to(piece, module)
+        counts[piece] = counts.get(piece, 0) + count
+    runs = sorted(counts.items(), reverse=True)
+    # A piece that does not fit next to the shortest one gets a sheet of its
+    # own; only the others are packed
+    shortest = runs[-1][0] if runs else 0
+    alone = [(piece, count) for piece, count in runs if piece + shortest > max_length]
+    shared = runs[len(alone):]
+    lower_bound = _lower_bound(shared, max_length)
+
+    contents = _first_fit_decreasing(shared, max_length)
+    shared_count = sum(count for _, count in shared)
+    if len(contents) > lower_bound and exact and shared_count <= EXACT_MAX_PIECES:
+        improved = _branch_and_bound(_expand(shared), max_length, len(contents), lower_bound)
+        if improved is not None:
+            contents = improved
+
+    sheets = _expand(alone) + contents
+    return {
+        'sheets': sorted(sheets, reverse=True),
+        'pieces_length': sum(pieces),
+        'ordered_length': sum(sheets),
+        'optimal': len(contents) <= lower_bound,
+    }
+
+
+@lru_cache(maxsize=256)
+def _roof_plan(planes, sheet_width, max_length, overlap, module):
+    # Pieces are whole modules, so slopes are split at the longest whole-module piece a sheet holds
+    max_length = max(max_length // module * module, module)
+    plan = plan_sheets(roof_pieces(planes, sheet_width, max_length, overlap), max_length, module)
+    plan['area'] = plan['ordered_length'] * sheet_width
+    return plan
+
+
+def clear_plans():
+    """Drop the per-process sheet plans (benchmarks time planning from scratch)."""
+    _roof_plan.cache_clear()
+
+
+def sheet_plan(planes, profile):
+    """
+    Sheet plan of a roof for a sheet material profile (None for others):
+    plan_sheets() plus 'area', the ordered sheet area in mm².
+    """
+    if not profile.sheet_width_mm:
+        return None
+    plan = _roof_plan(
+        tuple(planes), profile.sheet_width_mm, profile.sheet_max_length_mm, profile.sheet_overlap_mm,
+        profile.sheet_module_mm,
+    )
+    return {**plan, 'sheets': list(plan['sheets'])}
+
+
+def waste_basis_points(plan, real_area) -> int:
+    """Ordered sheet area above the roof area, in basis points of the roof area."""
+    if not real_area:
+        return 0
+    return div_round((plan['area'] - real_area) * 10000, real_area)
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from materials.models import Material
+from .services.memo import forget_material
+
+# Material fields the calculator prices with (see materials.profiles)
+PRICING_FIELDS = ('category', 'price_per_m2', 'waste_factor', 'config')
+DECIMAL_PRICING_FIELDS = ('price_per_m2', 'waste_factor')
+
+
+def _pricing(values: dict) -> dict:
+    return {
+        name: Decimal(str(value)) if name in DECIMAL_PRICING_FIELDS and value is not None else value
+        for name, value in values.items()
+    }
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def drop_memoized_calculations(sender, instance, **kwargs):
+    """Memoized results of the material's previous version are never hit again."""
+    forget_material(instance.pk)
+
+
+@receiver(pre_save, sender=Material)
+def remember_stored_pricing(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the stored pricing fields, so reprice_draft_quotes can tell whether they changed."""
+    instance._stored_pricing = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(PRICING_FIELDS):
+        instance._stored_pricing = _pricing({name: getattr(instance, name) for name in PRICING_FIELDS})
+        return
+    stored = Material.objects.filter(pk=instance.pk).values(*PRICING_FIELDS).first()
+    instance._stored_pricing = _pricing(stored) if stored else None
+
+
+@receiver(post_save, sender=Material)
+def reprice_draft_quotes(sender, instance, created, raw=False, **kwargs):
+    """Reprice open drafts in the background once a price change of the material is committed."""
+    if created or raw:
+        return
+    stored = getattr(instance, '_stored_pricing', None)
+    if stored == _pricing({name: getattr(instance, name) for name in PRICING_FIELDS}):
+        return
+    from .tasks import reprice_material_quotes_task
+
+    transaction.on_commit(lambda: reprice_material_quotes_task.delay(instance.pk))
@@ -0,0 +1,104 @@
+import logging
+from celery import shared_task
+from celery.signals import celeryd_after_setup, worker_process_init
+from django.conf import settings
+
+from .models import Quote
+from .services.ai_processor import analyze_quote
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def analyze_quote_task(self, quote_id: int):
+    """
+    Analyse a quote's uploaded image in the background.
+    Started speculatively on upload, so `process` can return the result at once.
+    """
+    quote = Quote.objects.filter(id=quote_id).first()
+    if quote is None:
+        logger.error(f"Quote {quote_id} not found")
+        return
+
+    # A newer upload superseded this analysis; its own task will store results.
+    if quote.ai_task_id and quote.ai_task_id != self.request.id:
+        logger.info(f"Skipping stale analysis of quote {quote.number}")
+        return
+
+    # Results are only stored while this is still the quote's analysis
+    result = analyze_quote(quote, task_id=quote.ai_task_id)
+    if result['success']:
+        logger.info(f"Quote {quote.number} analysed")
+    else:
+        logger.error(f"Analysis of quote {quote.number} failed: {result.get('error')}")
+
+
+@shared_task
+def reprice_material_quotes_task(material_id: int):
+    """Reprice draft quotes after the material's prices changed."""
+    from .services.repricing import reprice_material_quotes
+
+    report = reprice_material_quotes(material_id)
+    for change in report['companies']:
+        logger.info(
+            f"Material {material_id} repricing: {change['company'] or 'no company'} "
+            f"{change['quotes']} quotes, {change['total_gross_change']:+.2f} PLN gross"
+        )
+    return report
+
+
+@shared_task(bind=True)
+def generate_quote_pdf_task(self, quote_id: int):
+    """
+    Render a quote's PDF. Queued on QUOTE_PDF_QUEUE, whose workers keep the
+    template, stylesheet and fonts loaded (see services.pdf_generator).
+    Expires after QUOTE_PDF_TIMEOUT, when the request reports it failed.
+    """
+    from core.events import publish
+    from .services.pdf_generator import generate_quote_pdf
+
+    quote = Quote.objects.select_related('user').filter(id=quote_id).first()
+    if quote is None:
+        logger.error(f"Quote {quote_id} not found")
+        return
+
+    # A newer request re-rendered the quote with its own task
+    if quote.pdf_task_id != self.request.id:
+        logger.info(f"Skipping stale PDF of quote {quote.number}")
+        return
+
+    try:
+        generate_quote_pdf(quote)
+        quote.pdf_error = ''
+        logger.info(f"Quote {quote.number} PDF generated")
+    except Exception as e:
+        logger.exception(f"PDF of quote {quote.number} failed")
+        quote.pdf_error = str(e) or e.__class__.__name__
+    finally:
+        quote.pdf_task_id = ''
+        quote.save(update_fields=['pdf_task_id', 'pdf_error', 'updated_at'])
+        publish('quote_pdf', quote.id, {'status': quote.pdf_job_status})
+
+
+_warm_pdf_renderer = False
+
+
+@celeryd_after_setup.connect
+def _check_pdf_queue(sender, instance, **kwargs):
+    # Only workers consuming the PDF queue preload the renderer
+    global _warm_pdf_renderer
+    queues = instance.app.amqp.queues
+    queues = queues.consume_from or queues
+    _warm_pdf_renderer = settings.QUOTE_PDF_QUEUE in queues
+
+
+@worker_process_init.connect
+def _warm_pdf_worker(**kwargs):
+    if not _warm_pdf_renderer:
+        return
+    from .services.pdf_generator import warm_renderer
+
+    try:
+        warm_renderer()
+    except Exception as e:
+        logger.error(f"Could not preload the quote PDF renderer: {e}")
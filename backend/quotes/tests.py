@@ -1,3 +1,647 @@
-from django.test import TestCase
+import asyncio
+import io
+import queue
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core import events
+from core.events import get_hub, publish, wait_for_event
+from materials.company_prices import clear_company_prices
+from materials.models import CompanyMaterialPrice, Material
+from materials.profiles import get_profile
+from users.models import Company, User
+from .models import Quote
+from .benchmarks import load_baseline, regressions
+from .services import calculator, memo, pdf_generator, sheets
+from .services.calculator import LINE_ITEMS, calculate_roof_materials, measure_roof, price_roof
+from .services.geometry import Plane, roof_geometries, roof_geometry
+from .services.repricing import reprice_material_quotes
+from .views import MAX_STATUS_WAIT_SECONDS
+
+
+def make_image(name='roof.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (20, 20), 'white').save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(OPENAI_API_KEY='')
+class QuoteAnalysisTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sales', email='sales@example.com', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.quote = Quote.objects.create(user=self.user)
+
+    @patch('quotes.views.analyze_quote_task.apply_async')
+    def test_upload_starts_background_analysis(self, mock_task):
+        response = self.client.post(f'/api/quotes/{self.quote.id}/upload/', {'image': make_image()})
+
+        self.assertEqual(response.status_code, 200)
+        self.quote.refresh_from_db()
+        self.assertTrue(self.quote.ai_processing)
+        mock_task.assert_called_once_with(args=[self.quote.id], task_id=self.quote.ai_task_id)
+
+    def test_superseded_analysis_does_not_store_results(self):
+        from .services.ai_processor import analyze_quote
+
+        self.quote.original_image = make_image()
+        self.quote.ai_task_id = 'old-task'
+        self.quote.save()
+
+        def reupload(path):
+            # A new upload takes the quote over while the old analysis runs
+            Quote.objects.filter(pk=self.quote.pk).update(ai_task_id='new-task')
+            return {'success': True, 'data': {'typ_dachu': 'dwuspadowy'}}
+
+        with patch('quotes.services.ai_processor.process_roof_image', side_effect=reupload):
+            analyze_quote(self.quote, task_id='old-task')
+
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.ai_task_id, 'new-task')
+        self.assertFalse(self.quote.ai_processed)
+        self.assertIsNone(self.quote.ai_extracted_data)
+
+    def test_process_returns_precomputed_result(self):
+        self.quote.original_image = make_image()
+        self.quote.ai_processed = True
+        self.quote.ai_extracted_data = {'typ_dachu': 'dwuspadowy'}
+        self.quote.save()
+
+        with patch('quotes.views.analyze_quote_task.apply_async') as mock_task:
+            response = self.client.post(f'/api/quotes/{self.quote.id}/process/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], {'typ_dachu': 'dwuspadowy'})
+        mock_task.assert_not_called()
+
+    @patch('quotes.views.analyze_quote_task.apply_async')
+    def test_process_returns_job_handle(self, mock_task):
+        self.quote.original_image = make_image()
+        self.quote.save()
+
+        response = self.client.post(f'/api/quotes/{self.quote.id}/process/')
+
+        self.assertEqual(response.status_code, 202)
+        self.quote.refresh_from_db()
+        self.assertEqual(response.json()['job_id'], self.quote.ai_task_id)
+        self.assertEqual(mock_task.call_args.kwargs['task_id'], self.quote.ai_task_id)
+        status_response = self.client.get(f'/api/quotes/{self.quote.id}/status/')
+        self.assertEqual(status_response.json()['status'], 'processing')
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_task_finishing_before_the_view_returns_completes(self):
+        # Eager: the task runs inside apply_async, before the view responds
+        self.quote.original_image = make_image()
+        self.quote.save()
+
+        self.client.post(f'/api/quotes/{self.quote.id}/process/', {'force': True}, format='json')
+
+        status_response = self.client.get(f'/api/quotes/{self.quote.id}/status/')
+        self.assertEqual(status_response.json()['status'], 'completed')
+        self.quote.refresh_from_db()
+        self.assertFalse(self.quote.ai_processing)
+        self.assertEqual(self.quote.roof_type, 'multi_hip')
+
+    def test_background_analysis_updates_status(self):
+        # Without an API key process_roof_image returns its mock response
+        from .tasks import analyze_quote_task
+
+        self.quote.original_image = make_image()
+        self.quote.save()
+
+        analyze_quote_task.apply(args=[self.quote.id])
+
+        response = self.client.get(f'/api/quotes/{self.quote.id}/status/')
+        self.assertEqual(response.json()['status'], 'completed')
+        self.quote.refresh_from_db()
+        self.assertFalse(self.quote.ai_processing)
+        self.assertEqual(self.quote.roof_type, 'multi_hip')
+
+
+class FakeRedis:
+    """In-process Redis pub/sub: messages published from any thread reach subscribers."""
+
+    def __init__(self):
+        self.subscribers = defaultdict(list)
+
+    def publish(self, channel, data):
+        for messages in self.subscribers[channel]:
+            messages.put({'type': 'message', 'channel': channel, 'data': data})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self, ignore_subscribe_messages)
+
+
+class FakePubSub:
+    def __init__(self, redis, ignore_subscribe_messages):
+        self.redis = redis
+        self.ignore_subscribe_messages = ignore_subscribe_messages
+        self.messages = queue.Queue()
+        self.channels = []
+
+    def subscribe(self, channel):
+        self.channels.append(channel)
+        self.redis.subscribers[channel].append(self.messages)
+        self.messages.put({'type': 'subscribe', 'channel': channel, 'data': 1})
+
+    def get_message(self, timeout=0.0):
+        try:
+            message = self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        # Like redis-py: an ignored confirmation still ends the call
+        if message['type'] == 'subscribe' and self.ignore_subscribe_messages:
+            return None
+        return message
+
+    def unsubscribe(self, channel):
+        self.channels.remove(channel)
+        self.redis.subscribers[channel].remove(self.messages)
+
+    def close(self):
+        self.closed = True
+
+
+class LongPollTest(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = patch('django_redis.get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_waits_for_event_published_from_another_thread(self):
+        publisher = threading.Timer(0.3, publish, args=('quote', 7, {'status': 'completed'}))
+        publisher.start()
+        self.addCleanup(publisher.cancel)
+
+        started = time.monotonic()
+        payload = wait_for_event('quote', 7, timeout=5)
+
+        self.assertEqual(payload, {'status': 'completed'})
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+        self.assertEqual(self.redis.subscribers['status:quote:7'], [])
+
+    def test_times_out_without_event(self):
+        started = time.monotonic()
+        self.assertIsNone(wait_for_event('quote', 7, timeout=0.3))
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+
+    def test_state_changed_before_subscribing_ends_wait(self):
+        started = time.monotonic()
+        self.assertIsNone(wait_for_event('quote', 7, timeout=5, is_done=lambda: True))
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_hubs_of_closed_loops_are_dropped(self):
+        async def hub():
+            return get_hub()
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(hub())
+        loop.close()
+        asyncio.run(hub())
+
+        self.assertNotIn(loop, events._hubs)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class QuotePdfTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sales', email='sales@example.com', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.quote = Quote.objects.create(user=self.user)
+
+    @patch('quotes.services.pdf_generator.render_quote_pdf', return_value=b'%PDF-1.7 quote')
+    def test_pdf_is_rendered_by_the_worker(self, render):
+        response = self.client.post(
+            f'/api/quotes/{self.quote.id}/generate_pdf/', {'client_name': 'Jan Kowalski'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('oferta_', response.json()['pdf_url'])
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.client_name, 'Jan Kowalski')
+        self.assertEqual(self.quote.pdf_task_id, '')
+        self.assertEqual(self.quote.pdf_file.read(), b'%PDF-1.7 quote')
+        self.assertEqual(self.client.get(f'/api/quotes/{self.quote.id}/pdf_status/').json()['status'], 'completed')
+
+    @patch('quotes.views.generate_quote_pdf_task.apply_async')
+    def test_generate_pdf_returns_job_handle(self, apply_async):
+        response = self.client.post(f'/api/quotes/{self.quote.id}/generate_pdf/')
+
+        self.assertEqual(response.status_code, 202)
+        self.quote.refresh_from_db()
+        self.assertEqual(response.json()['job_id'], self.quote.pdf_task_id)
+        self.assertEqual(apply_async.call_args.kwargs['task_id'], self.quote.pdf_task_id)
+        self.assertEqual(apply_async.call_args.kwargs['queue'], 'pdf')
+
+    @patch('quotes.views.wait_for_event')
+    @patch('quotes.views.generate_quote_pdf_task.apply_async')
+    def test_long_poll_wait_is_capped(self, apply_async, wait_for_event):
+        self.client.post(f'/api/quotes/{self.quote.id}/generate_pdf/')
+
+        self.client.get(f'/api/quotes/{self.quote.id}/pdf_status/?wait=60')
+
+        self.assertEqual(wait_for_event.call_args.kwargs['timeout'], MAX_STATUS_WAIT_SECONDS)
+
+    @override_settings(QUOTE_PDF_QUEUE='')
+    @patch('quotes.views.generate_quote_pdf_task.apply_async')
+    def test_pdf_renders_on_default_queue_without_pdf_queue(self, apply_async):
+        self.client.post(f'/api/quotes/{self.quote.id}/generate_pdf/')
+
+        self.assertIsNone(apply_async.call_args.kwargs['queue'])
+
+    @patch('quotes.views.generate_quote_pdf_task.apply_async')
+    def test_pdf_job_no_worker_took_fails(self, apply_async):
+        self.client.post(f'/api/quotes/{self.quote.id}/generate_pdf/')
+        self.assertEqual(self.client.get(f'/api/quotes/{self.quote.id}/pdf_status/').status_code, 202)
+
+        Quote.objects.filter(pk=self.quote.pk).update(
+            pdf_requested_at=timezone.now() - timedelta(seconds=settings.QUOTE_PDF_TIMEOUT + 1)
+        )
+        response = self.client.get(f'/api/quotes/{self.quote.id}/pdf_status/')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['status'], 'failed')
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.pdf_task_id, '')
+
+    def test_pdf_template_renders(self):
+        self.quote.client_name = 'Jan Kowalski'
+        html = pdf_generator.quote_pdf_template().render(pdf_generator.quote_pdf_context(self.quote))
+
+        self.assertIn(self.quote.number, html)
+        self.assertIn('Jan Kowalski', html)
+
+    @skipUnless(pdf_generator.WEASYPRINT_AVAILABLE, 'WeasyPrint is not installed')
+    def test_render_quote_pdf(self):
+        self.assertTrue(pdf_generator.render_quote_pdf(self.quote).startswith(b'%PDF'))
+
+    @patch('quotes.services.pdf_generator.render_quote_pdf', side_effect=OSError('no fonts'))
+    def test_failed_render_is_reported(self, render):
+        response = self.client.post(f'/api/quotes/{self.quote.id}/generate_pdf/')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('no fonts', response.json()['error'])
+        self.assertEqual(self.client.get(f'/api/quotes/{self.quote.id}/pdf_status/').json()['status'], 'failed')
+
+
+class QuoteCalculatorTest(TestCase):
+    fixtures = ['materials']
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sales', email='sales@example.com', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.quote = Quote.objects.create(
+            user=self.user,
+            dimensions={'length': 12, 'width': 8, 'unit': 'm'},
+            pitch_angle=35,
+            obstacles=[{'type': 'chimney', 'quantity': 1}, {'type': 'skylight', 'quantity': 2}],
+        )
+
+    def test_calculations_are_memoized_per_material_version(self):
+        material = Material.objects.get(pk=1)
+        twin = Quote.objects.create(
+            user=self.user,
+            dimensions={'length': 12.0, 'width': 8, 'unit': 'm'},
+            pitch_angle=35,
+            obstacles=[{'type': 'skylight', 'quantity': 2}, {'type': 'chimney', 'quantity': 1}],
+        )
+        memo.clear_local()
+        cache.clear()
+
+        with patch('quotes.services.calculator.evaluate', wraps=calculator.evaluate) as evaluate:
+            expected = calculate_roof_materials(self.quote, material)
+            self.assertEqual(calculate_roof_materials(twin, material), expected)
+            memo.clear_local()  # served by the shared tier
+            self.assertEqual(calculate_roof_materials(twin, material), expected)
+            self.assertEqual(evaluate.call_count, 1)
+
+            material.price_per_m2 += 10
+            material.save()
+            changed = calculate_roof_materials(twin, material)
+            self.assertEqual(evaluate.call_count, 2)
+        self.assertGreater(changed['summary']['total_net'], expected['summary']['total_net'])
+
+        # A flat roof is not the default pitch
+        twin.pitch_angle = 0
+        self.assertLess(calculate_roof_materials(twin, material)['real_area'], changed['real_area'])
+
+    def test_company_prices_apply_to_its_quotes(self):
+        self.addCleanup(clear_company_prices)
+        material = Material.objects.get(pk=1)
+        global_price = calculate_roof_materials(self.quote, material)
+
+        company = Company.objects.create(name='Dekarz')
+        CompanyMaterialPrice.objects.create(company=company, material=material, price_per_m2=material.price_per_m2 - 5)
+        self.user.company = company
+        self.user.save()
+        self.quote.refresh_from_db()
+
+        response = self.client.post(
+            f'/api/quotes/{self.quote.id}/calculate/', {'material_id': material.id}, format='json',
+        )
+        roofing = response.json()['materials']['roofing']
+        self.assertEqual(roofing['unit_price'], float(material.price_per_m2 - 5))
+        self.assertLess(response.json()['summary']['total_net'], global_price['summary']['total_net'])
+
+        listed = self.client.get(f'/api/materials/{material.id}/').json()
+        self.assertEqual(Decimal(listed['price_per_m2']), material.price_per_m2 - 5)
+
+    def test_price_change_reprices_draft_quotes(self):
+        company = Company.objects.create(name='Dekarz')
+        self.user.company = company
+        self.user.save()
+        material = Material.objects.get(pk=1)
+        twin = Quote.objects.create(user=self.user, dimensions=self.quote.dimensions, obstacles=self.quote.obstacles)
+        sent = Quote.objects.create(user=self.user, dimensions=self.quote.dimensions, status='sent')
+        for quote in (self.quote, twin, sent):
+            self.client.post(f'/api/quotes/{quote.id}/calculate/', {'material_id': material.id}, format='json')
+        self.quote.refresh_from_db()
+        old_gross = self.quote.total_gross
+
+        material.price_per_m2 += 10
+        with patch('quotes.tasks.reprice_material_quotes_task.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                material.save()
+            delay.assert_called_once_with(material.pk)
+
+            # Edits that leave the prices alone reprice nothing
+            delay.reset_mock()
+            material.name = 'Dachówka ceramiczna Premium'
+            with self.captureOnCommitCallbacks(execute=True):
+                material.save()
+            delay.assert_not_called()
+
+        sent_gross = Quote.objects.get(pk=sent.pk).total_gross
+        report = reprice_material_quotes(material.pk, chunk_size=1)
+
+        self.assertEqual((report['quotes'], report['updated']), (2, 2))
+        self.quote.refresh_from_db()
+        expected = calculate_roof_materials(self.quote, material)
+        self.assertEqual(self.quote.materials_breakdown, expected['materials'])
+        self.assertEqual(self.quote.total_gross, Decimal(str(expected['summary']['total_gross'])))
+        self.assertEqual(Quote.objects.get(pk=sent.pk).total_gross, sent_gross)
+        [change] = report['companies']
+        self.assertEqual((change['company'], change['quotes']), ('Dekarz', 2))
+        self.assertAlmostEqual(change['total_gross_change'], float(2 * (self.quote.total_gross - old_gross)))
+
+    def test_repricing_reprices_quotes_edited_meanwhile(self):
+        material = Material.objects.get(pk=1)
+        self.client.post(f'/api/quotes/{self.quote.id}/calculate/', {'material_id': material.id}, format='json')
+        material.price_per_m2 += 10
+        material.save()
+        self.quote.refresh_from_db()
+        old_gross = self.quote.total_gross
+
+        def edit_during_run(quotes, material):
+            # The salesperson saves the draft while the chunk is being priced
+            self.client.patch(f'/api/quotes/{self.quote.id}/', {'margin_percent': 20}, format='json')
+            return calculator.evaluate_quotes(quotes, material)
+
+        with patch('quotes.services.repricing.evaluate_quotes', side_effect=edit_during_run):
+            report = reprice_material_quotes(material.pk)
+
+        # Re-read under the lock: the edit's own recalculation already priced it
+        self.assertEqual((report['updated'], report['skipped']), (0, 0))
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.margin_percent, 20)
+        self.assertNotEqual(self.quote.total_gross, old_gross)
+        expected = calculate_roof_materials(self.quote, material)
+        self.assertEqual(self.quote.total_gross, Decimal(str(expected['summary']['total_gross'])))
+
+    def test_repricing_reprices_quotes_saved_without_recalculation(self):
+        material = Material.objects.get(pk=1)
+        self.client.post(f'/api/quotes/{self.quote.id}/calculate/', {'material_id': material.id}, format='json')
+        material.price_per_m2 += 10
+        material.save()
+
+        def save_during_run(quotes, material):
+            # e.g. the client data saved by generate_pdf: no recalculation
+            quote = Quote.objects.get(pk=self.quote.pk)
+            quote.client_name = 'Jan Kowalski'
+            quote.save()
+            return calculator.evaluate_quotes(quotes, material)
+
+        with patch('quotes.services.repricing.evaluate_quotes', side_effect=save_during_run):
+            report = reprice_material_quotes(material.pk)
+
+        self.assertEqual((report['updated'], report['skipped']), (1, 0))
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.client_name, 'Jan Kowalski')
+        expected = calculate_roof_materials(self.quote, material)
+        self.assertEqual(self.quote.total_gross, Decimal(str(expected['summary']['total_gross'])))
+
+    def test_repricing_skips_quotes_no_longer_drafts(self):
+        material = Material.objects.get(pk=1)
+        self.client.post(f'/api/quotes/{self.quote.id}/calculate/', {'material_id': material.id}, format='json')
+        material.price_per_m2 += 10
+        material.save()
+        self.quote.refresh_from_db()
+        old_gross = self.quote.total_gross
+
+        def accept_during_run(quotes, material):
+            Quote.objects.filter(pk=self.quote.pk).update(status='accepted', updated_at=timezone.now())
+            return calculator.evaluate_quotes(quotes, material)
+
+        with patch('quotes.services.repricing.evaluate_quotes', side_effect=accept_during_run):
+            report = reprice_material_quotes(material.pk)
+
+        self.assertEqual((report['updated'], report['skipped']), (0, 1))
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.total_gross, old_gross)
+
+    def test_breakdown_adds_up_to_totals(self):
+        material = Material.objects.get(pk=1)
+        self.quote.dimensions = {'length': 13.337, 'width': 7.913, 'unit': 'm'}
+        self.quote.margin_percent = 33
+        for roof_type, _ in Quote.ROOF_TYPES:
+            self.quote.roof_type = roof_type
+            result = calculate_roof_materials(self.quote, material)
+
+            summary = result['summary']
+            lines = sum(round(item['total'] * 100) for item in result['materials'].values())
+            self.assertEqual(lines, round(summary['materials_net'] * 100), roof_type)
+            self.assertEqual(
+                round(summary['total_net'] * 100) + round(summary['vat'] * 100), round(summary['total_gross'] * 100),
+            )
+
+    def test_compare_matches_single_material_calculation(self):
+        response = self.client.get(f'/api/quotes/{self.quote.id}/compare/?margin_percent=20')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        materials = Material.objects.filter(active=True)
+        self.assertEqual([row['material_id'] for row in data['materials']], [m.id for m in materials])
+
+        self.quote.margin_percent = 20
+        for row, material in zip(data['materials'], materials):
+            expected = calculate_roof_materials(self.quote, material)
+            self.assertEqual(row['summary'], expected['summary'])
+            self.assertEqual(row['totals'][LINE_ITEMS.index('roofing')], expected['materials']['roofing']['total'])
+
+        self.quote.refresh_from_db()
+        self.assertIsNone(self.quote.material)
+        self.assertEqual(self.quote.margin_percent, 35)
+
+    def test_roof_type_geometry(self):
+        material = Material.objects.get(pk=1)
+        gable = calculate_roof_materials(self.quote, material)
+
+        self.quote.roof_type = 'hip'
+        hip = calculate_roof_materials(self.quote, material)
+
+        self.assertEqual(hip['real_area'], gable['real_area'])
+        self.assertEqual(hip['geometry']['edges']['ridge'], 4.0)
+        self.assertEqual(hip['materials']['ridge_tape']['quantity'], 29.2)
+        self.assertNotIn('valleys', hip['materials'])
+
+        self.quote.roof_type = 'gable_l'
+        self.quote.roof_measurements = {'ridge_length': 20, 'valley_length': 9.5}
+        l_shaped = calculate_roof_materials(self.quote, material)
+
+        self.assertEqual(l_shaped['materials']['ridge_tape']['quantity'], 20.0)
+        self.assertEqual(l_shaped['materials']['valleys']['quantity'], 9.5)
+        self.assertEqual(l_shaped['plan_area'], 144.0)
+
+    def test_batched_geometry_matches_single_quotes(self):
+        material = Material.objects.get(pk=1)
+        self.quote.roof_type = 'multi_hip_l'
+        self.quote.roof_measurements = {'valley_length': 9.5}
+        quotes = [self.quote]
+        for pitch in (0, 25, 35):
+            quotes.append(Quote(
+                user=self.user, roof_type='multi_hip_l', dimensions=self.quote.dimensions, pitch_angle=pitch,
+                roof_measurements={'valley_length': 9.5}, margin_percent=20,
+            ))
+
+        measured = {'valley_length': 9.5}
+        geometries = roof_geometries('multi_hip_l', 12000, 8000, [0, 25, 35], measurements=measured)
+        self.assertEqual(geometries[1], roof_geometry('multi_hip_l', 12000, 8000, 25, measurements=measured))
+        with patch('quotes.services.calculator.roof_geometries', wraps=roof_geometries) as batched:
+            results = calculator.evaluate_quotes(quotes, material)
+        # One geometry batch for the four quotes of the roof
+        batched.assert_called_once()
+        for quote, (result, _) in zip(quotes, results):
+            memo.clear_local()
+            cache.clear()
+            self.assertEqual(result, calculate_roof_materials(quote, material))
+
+    def test_sweep_grid(self):
+        response = self.client.post(
+            f'/api/quotes/{self.quote.id}/sweep/',
+            {'margins': [20, 35]},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        materials = Material.objects.filter(active=True)
+        self.assertEqual(data['axes']['pitch'], list(range(30, 41)))
+        self.assertEqual(data['shape'], [11, materials.count(), 1, 2])
+
+        # The cells at the quote's own parameters match calculate()
+        for index, material in enumerate(materials):
+            expected = calculate_roof_materials(self.quote, material)['summary']
+            self.assertEqual(data['total_gross'][5][index][0][1], expected['total_gross'], material.category)
+            self.assertEqual(data['total_net'][5][index][0][1], expected['total_net'], material.category)
+
+        # Pitch 0 is a flat roof, not the quote's own pitch
+        response = self.client.post(f'/api/quotes/{self.quote.id}/sweep/', {'pitches': [0]}, format='json')
+        data = response.json()
+        flat = measure_roof(self.quote, pitch_angle=0)
+        self.assertEqual(flat['real_area'], flat['plan_area'])
+        self.assertLess(flat['real_area'], measure_roof(self.quote)['real_area'])
+        for index, material in enumerate(materials):
+            expected = price_roof(flat, material, self.quote.margin_percent, self.quote.vat_rate)['summary']
+            self.assertEqual(data['total_gross'][0][index][0][0], expected['total_gross'], material.category)
+
+    def test_metal_roofing_is_planned_in_sheets(self):
+        # First fit decreasing needs 3 sheets here, the exact search finds 2
+        plan = sheets.plan_sheets([4000, 4000, 3000, 3000, 3000, 3000], max_length=10000)
+        self.assertEqual(plan['sheets'], [10000, 10000])
+        self.assertTrue(plan['optimal'])
+        # Each cut piece is whole modules: 3.5 m + 3.15 m no longer share a 6.3 m sheet
+        plan = sheets.plan_sheets([3200, 2900], max_length=6300, module=350)
+        self.assertEqual(plan['sheets'], [3500, 3150])
+        self.assertEqual((plan['pieces_length'], plan['ordered_length']), (6100, 6650))
+        # A 6 m sheet holds 17 modules of 35 cm, so a 7 m slope is split at 5.95 m
+        metal = Material(category='metal_tile', price_per_m2=50, config={'sheet_max_length_cm': 600})
+        planes = [Plane(plan_area=0, pitch=35, slope=7000, eave=1100, top=1100, counter_battens=0)]
+        self.assertEqual(sheets.sheet_plan(planes, get_profile(metal))['sheets'], [5950, 1400])
+
+        metal = Material.objects.filter(active=True, category='metal_tile').first()
+        result = calculate_roof_materials(self.quote, metal)
+        planned = result['sheets']
+        self.assertEqual(planned['count'], sum(length['count'] for length in planned['lengths']))
+        # Less the obstacles (a chimney and two skylights)
+        self.assertAlmostEqual(result['materials']['roofing']['quantity'], planned['area'] - 2, places=1)
+        self.assertAlmostEqual(
+            planned['waste_percent'], (planned['area'] / result['real_area'] - 1) * 100, delta=0.1,
+        )
+
+        ceramic = Material.objects.filter(active=True, category='ceramic').first()
+        result = calculate_roof_materials(self.quote, ceramic)
+        self.assertNotIn('sheets', result)
+        self.assertAlmostEqual(
+            result['materials']['roofing']['quantity'], result['real_area'] * float(ceramic.waste_factor) - 2, delta=0.1,
+        )
+
+    def test_edits_recalculate_incrementally(self):
+        material = Material.objects.filter(active=True).first()
+        self.client.post(f'/api/quotes/{self.quote.id}/calculate/', {'material_id': material.id}, format='json')
+
+        obstacles = [{'type': 'chimney', 'quantity': 3}]
+        with patch.object(Quote, 'save', autospec=True, side_effect=Quote.save) as save:
+            self.client.patch(f'/api/quotes/{self.quote.id}/obstacles/', {'obstacles': obstacles}, format='json')
+        self.assertIn('materials_breakdown', save.call_args.kwargs['update_fields'])
+
+        self.client.patch(
+            f'/api/quotes/{self.quote.id}/dimensions/', {'length': 10, 'width': 9, 'pitch_angle': 40}, format='json'
+        )
+        self.client.patch(f'/api/quotes/{self.quote.id}/', {'margin_percent': 25}, format='json')
+
+        self.quote.refresh_from_db()
+        expected = calculate_roof_materials(self.quote, material)
+        self.assertEqual(self.quote.materials_breakdown, expected['materials'])
+        self.assertEqual(self.quote.total_gross, Decimal(str(expected['summary']['total_gross'])))
+        self.assertEqual(self.quote.plan_area, Decimal(str(expected['plan_area'])))
+
+
+class CalculatorBenchmarkTest(TestCase):
+    def test_benchmark_saves_baseline_and_leaves_no_data(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'baseline.json'
+            call_command(
+                'benchmark_calculator', quotes=len(Quote.ROOF_TYPES), rounds=1, baseline=str(path),
+                save_baseline=True, stdout=io.StringIO(),
+            )
+            baseline = load_baseline(path)
+
+        self.assertEqual(
+            set(baseline['us_per_call']), {'evaluate', 'memo_hit', 'batch', 'compare', 'sweep', 'view_calculate'}
+        )
+        self.assertFalse(Quote.objects.exists())
+        self.assertFalse(Material.objects.exists())
+
+        slower = {name: value * 2 for name, value in baseline['us_per_call'].items()}
+        self.assertEqual(set(regressions(slower, baseline, tolerance_percent=25)), set(slower))
+        self.assertEqual(regressions(baseline['us_per_call'], baseline, tolerance_percent=25), {})
@@ -1,3 +1,7 @@
+import logging
+from celery.utils import uuid
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -8,11 +12,19 @@ from django.shortcuts import get_object_or_404
 from .models import Quote
 from .serializers import (
     QuoteListSerializer, QuoteDetailSerializer, QuoteCreateSerializer,
-    QuoteUploadSerializer, QuoteDimensionsSerializer, QuoteCalculateSerializer
+    QuoteUploadSerializer, QuoteDimensionsSerializer, QuoteCalculateSerializer,
+    QuoteCompareSerializer, QuoteSweepSerializer
 )
-from .services.calculator import calculate_roof_materials
-from .services.ai_processor import process_roof_image
+from .services.calculator import compare_materials, evaluate_quote, recalculate, sweep_prices
+from .tasks import analyze_quote_task, generate_quote_pdf_task
 from materials.models import Material
+from core.events import wait_for_event
+
+logger = logging.getLogger(__name__)
+
+# Long-polls hold a worker and a Redis connection: keep them well below
+# worker timeouts (30s by default for gunicorn and most proxies)
+MAX_STATUS_WAIT_SECONDS = 10
 
 
 class QuoteViewSet(viewsets.ModelViewSet):
@@ -35,6 +47,13 @@ class QuoteViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_update(self, serializer):
+        quote = serializer.save()
+        # Keep the calculation in step with edited inputs (margin, pitch, ...)
+        changed = recalculate(quote, serializer.validated_data.keys())
+        if changed:
+            quote.save(update_fields=changed + ['updated_at'])
+
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get dashboard statistics."""
@@ -69,14 +88,21 @@ class QuoteViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def upload(self, request, pk=None):
-        """Upload roof image for a quote."""
+        """Upload roof image for a quote and start AI analysis in the background."""
         quote = self.get_object()
         serializer = QuoteUploadSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         quote.original_image = serializer.validated_data['image']
         quote.ai_processed = False
+
+        # Speculative analysis: by the time the salesperson calls `process`
+        # the result is usually ready (or at least already in flight).
+        # The id is stored before queueing, so the task never sees an older one.
+        quote.ai_processing = True
+        quote.ai_task_id = uuid()
         quote.save()
+        analyze_quote_task.apply_async(args=[quote.id], task_id=quote.ai_task_id)
         
         return Response({
             'message': 'Zdjęcie przesłane pomyślnie',
@@ -85,7 +111,13 @@ class QuoteViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def process(self, request, pk=None):
-        """Process uploaded image with AI."""
+        """
+        Start AI analysis of the uploaded image as a background job.
+
+        Answers 202 with the job id while the analysis runs (including the one
+        started on upload); poll `status` for progress. A finished analysis is
+        returned directly unless `force` is passed.
+        """
         quote = self.get_object()
         
         if not quote.original_image:
@@ -93,128 +125,51 @@ class QuoteViewSet(viewsets.ModelViewSet):
                 {'error': 'Najpierw prześlij zdjęcie dachu'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        quote.ai_processing = True
-        quote.save()
-        
-        try:
-            # Process image
-            result = process_roof_image(quote.original_image.path)
-            
-            if result['success']:
-                data = result['data']
-                
-                # Update quote with AI data
-                quote.ai_extracted_data = data
-                
-                # Map Polish response to model fields
-                # Roof type mapping (extended)
-                roof_type_map = {
-                    'jednospadowy': 'shed',
-                    'dwuspadowy': 'gable',
-                    'dwuspadowy_l': 'gable_l',
-                    'czterospadowy': 'hip', 
-                    'kopertowy': 'hip_envelope',
-                    'wielospadowy': 'multi_hip',
-                    'wielospadowy_l': 'multi_hip_l',
-                    'mansardowy': 'mansard',
-                    'naczolkowy': 'half_hip',
-                    'pulpitowy': 'skillion',
-                    'plaski': 'flat'
-                }
-                typ_dachu = data.get('typ_dachu', 'dwuspadowy').lower()
-                quote.roof_type = roof_type_map.get(typ_dachu, 'gable')
-                
-                # Pitch angle
-                if data.get('kat_nachylenia'):
-                    quote.pitch_angle = int(data['kat_nachylenia'])
-                
-                # Building dimensions
-                wymiary = data.get('wymiary_budynku', {})
-                quote.dimensions = {
-                    'length': wymiary.get('dlugosc_m', 10),
-                    'width': wymiary.get('szerokosc_m', 8),
-                    'unit': 'm'
-                }
-                
-                # Calculate plan area
-                dims = quote.dimensions
-                if dims.get('length') and dims.get('width'):
-                    quote.plan_area = dims['length'] * dims['width']
-                
-                # Roof measurements (ridges, valleys, eaves)
-                pomiary = data.get('pomiary', {})
-                quote.roof_measurements = {
-                    'surface_area': pomiary.get('powierzchnia_dachu_m2', 0),
-                    'gable_edge_left': pomiary.get('dlugosc_krawedzi_szczytowych_lewych_m', 0),
-                    'gable_edge_right': pomiary.get('dlugosc_krawedzi_szczytowych_prawych_m', 0),
-                    'ridge_length': pomiary.get('dlugosc_kalenic_m', 0),
-                    'valley_length': pomiary.get('dlugosc_koszy_m', 0),
-                    'eave_length': pomiary.get('dlugosc_okapow_m', 0)
-                }
-                
-                # Gasior elements
-                gasiory = data.get('elementy_gasiorowe', {})
-                quote.gasior_elements = {
-                    'junctions': gasiory.get('trojniki_szt', 0),
-                    'corner_gasiors': gasiory.get('gasiory_narozne_szt', 0),
-                    'start_gasiors': gasiory.get('gasiory_poczatkowe_szt', 0),
-                    'end_gasiors': gasiory.get('gasiory_koncowe_szt', 0)
-                }
-                
-                # Gutter system
-                rynny = data.get('system_odwodnienia', {})
-                quote.gutter_system = {
-                    'corners': rynny.get('narozniki_rynien_szt', 0),
-                    'downpipes': rynny.get('rury_spustowe_szt', 0),
-                    'end_caps': rynny.get('zaslepki_rynien_szt', 0)
-                }
-                
-                # Obstacles from additional elements
-                elementy = data.get('elementy_dodatkowe', {})
-                quote.obstacles = []
-                if elementy.get('kominy_szt', 0) > 0:
-                    quote.obstacles.append({'type': 'chimney', 'quantity': elementy['kominy_szt']})
-                if elementy.get('kominki_wentylacyjne_szt', 0) > 0:
-                    quote.obstacles.append({'type': 'vent_pipe', 'quantity': elementy['kominki_wentylacyjne_szt']})
-                if elementy.get('okna_dachowe_szt', 0) > 0:
-                    quote.obstacles.append({'type': 'skylight', 'quantity': elementy['okna_dachowe_szt']})
-                if elementy.get('wylazy_dachowe_szt', 0) > 0:
-                    quote.obstacles.append({'type': 'roof_hatch', 'quantity': elementy['wylazy_dachowe_szt']})
-                
-                # Confidence mapping
-                confidence_map = {'wysoka': 0.9, 'srednia': 0.7, 'niska': 0.4}
-                quote.ai_confidence = confidence_map.get(data.get('pewnosc_oszacowania', 'srednia'), 0.7)
-                
-                quote.ai_processed = True
-                quote.ai_processing = False
-                quote.save()
-                
-                return Response({
-                    'message': 'Analiza zakończona pomyślnie',
-                    'data': data
-                })
-            else:
-                quote.ai_processing = False
-                quote.save()
-                return Response(
-                    {'error': result.get('error', 'Błąd przetwarzania')},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-                
-        except Exception as e:
-            quote.ai_processing = False
-            quote.save()
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+
+        force = bool(request.data.get('force'))
+
+        if quote.ai_processed and quote.ai_extracted_data and not force:
+            return Response({
+                'message': 'Analiza zakończona pomyślnie',
+                'status': 'completed',
+                'data': quote.ai_extracted_data
+            })
+
+        if not quote.ai_processing or force:
+            # Stored before queueing, as in `upload`
+            quote.ai_processing = True
+            quote.ai_task_id = uuid()
+            quote.ai_error = ''
+            quote.save(update_fields=['ai_processing', 'ai_task_id', 'ai_error', 'updated_at'])
+            analyze_quote_task.apply_async(args=[quote.id], task_id=quote.ai_task_id)
+
+        return Response({
+            'message': 'Analiza w toku',
+            'status': 'processing',
+            'job_id': quote.ai_task_id
+        }, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=True, methods=['get'])
     def status(self, request, pk=None):
-        """Get AI processing status."""
+        """
+        Get AI processing status.
+
+        With `?wait=<seconds>` (max 10) the request long-polls: while the
+        analysis is running it returns as soon as it finishes instead of
+        making the dashboard poll repeatedly.
+        """
         quote = self.get_object()
+
+        try:
+            wait = min(float(request.query_params.get('wait', 0)), MAX_STATUS_WAIT_SECONDS)
+        except ValueError:
+            wait = 0
+        self._long_poll(quote, 'quote', wait, lambda quote: quote.ai_processing)
+
         return Response({
+            'status': quote.ai_job_status,
+            'job_id': quote.ai_task_id or None,
+            'error': quote.ai_error or None,
             'ai_processing': quote.ai_processing,
             'ai_processed': quote.ai_processed,
             'ai_confidence': quote.ai_confidence
@@ -242,9 +197,11 @@ class QuoteViewSet(viewsets.ModelViewSet):
         if 'roof_type' in data:
             quote.roof_type = data['roof_type']
         
-        # Recalculate plan area
+        # Recalculate plan area (the calculator's own figure for a calculated quote)
         quote.plan_area = data['length'] * data['width']
-        quote.save()
+        fields = ['dimensions', 'pitch_angle', 'roof_type', 'plan_area']
+        changed = recalculate(quote, fields)
+        quote.save(update_fields=list(dict.fromkeys(fields + changed)) + ['updated_at'])
         
         return Response(QuoteDetailSerializer(quote, context={'request': request}).data)
     
@@ -254,7 +211,7 @@ class QuoteViewSet(viewsets.ModelViewSet):
         quote = self.get_object()
         obstacles = request.data.get('obstacles', [])
         quote.obstacles = obstacles
-        quote.save()
+        quote.save(update_fields=['obstacles', *recalculate(quote, ['obstacles']), 'updated_at'])
         
         return Response({'obstacles': quote.obstacles})
     
@@ -273,10 +230,9 @@ class QuoteViewSet(viewsets.ModelViewSet):
             quote.margin_percent = data['margin_percent']
         
         quote.material = material
-        quote.save()
         
         # Perform calculation
-        result = calculate_roof_materials(quote, material)
+        result, quote.calculation_state = evaluate_quote(quote, material)
         
         # Update quote with results
         quote.plan_area = result['plan_area']
@@ -291,33 +247,144 @@ class QuoteViewSet(viewsets.ModelViewSet):
             'quote': QuoteDetailSerializer(quote, context={'request': request}).data
         })
     
+    @action(detail=True, methods=['get'])
+    def compare(self, request, pk=None):
+        """Price the quote with every active material at once (nothing is saved)."""
+        quote = self.get_object()
+        serializer = QuoteCompareSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        materials = Material.objects.filter(active=True)
+        return Response(compare_materials(
+            quote, materials, margin_percent=serializer.validated_data.get('margin_percent')
+        ))
+    
+    @action(detail=True, methods=['post'])
+    def sweep(self, request, pk=None):
+        """
+        What-if grid of totals over pitch x material x waste factor x margin
+        (nothing is saved). Defaults: the quote's pitch ±5°, all active
+        materials, each material's own waste factor, the quote's margin.
+        """
+        quote = self.get_object()
+        serializer = QuoteSweepSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        materials = Material.objects.filter(active=True)
+        if 'material_ids' in data:
+            materials = materials.filter(id__in=data['material_ids'])
+        materials = list(materials)
+        pitch = quote.pitch_angle if quote.pitch_angle is not None else 35
+        pitches = data.get('pitches') or list(range(max(pitch - 5, 0), min(pitch + 5, 89) + 1))
+        waste_factors = data.get('waste_factors') or [None]
+        margins = data.get('margins') or [quote.margin_percent or 35]
+
+        cells = len(pitches) * len(materials) * len(waste_factors) * len(margins)
+        if not materials or cells > QuoteSweepSerializer.MAX_CELLS:
+            return Response(
+                {'error': f'Siatka musi mieć od 1 do {QuoteSweepSerializer.MAX_CELLS} punktów'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        total_net, total_gross = sweep_prices(quote, materials, margins, pitches, waste_factors)
+        return Response({
+            'axes': {
+                'pitch': pitches,
+                'material': [{'id': m.id, 'name': m.name} for m in materials],
+                'waste_factor': [float(w) if w is not None else None for w in waste_factors],
+                'margin': margins,
+            },
+            'shape': [len(pitches), len(materials), len(waste_factors), len(margins)],
+            'total_net': total_net,
+            'total_gross': total_gross,
+        })
+    
     @action(detail=True, methods=['post'])
     def generate_pdf(self, request, pk=None):
-        """Generate PDF for the quote."""
+        """
+        Generate PDF for the quote on the PDF worker.
+
+        Answers 202 with the job id while the PDF renders; poll `pdf_status`
+        for the result. With `wait=<seconds>` (max 10) the request waits for
+        the render and returns the PDF URL when it finishes in time. A render
+        no worker finished within QUOTE_PDF_TIMEOUT is reported as failed.
+        """
         quote = self.get_object()
-        
+
         # Update client data if provided
         client_data = ['client_name', 'client_email', 'client_phone', 'client_address']
         for field in client_data:
             if field in request.data:
                 setattr(quote, field, request.data[field])
+
+        # The id is stored before queueing, so the worker never sees an older one
+        quote.pdf_task_id = uuid()
+        quote.pdf_error = ''
+        quote.pdf_requested_at = timezone.now()
         quote.save()
-        
-        # Generate PDF
+        generate_quote_pdf_task.apply_async(
+            (quote.id,), task_id=quote.pdf_task_id, queue=settings.QUOTE_PDF_QUEUE or None,
+            expires=settings.QUOTE_PDF_TIMEOUT
+        )
+
         try:
-            from .services.pdf_generator import generate_quote_pdf
-            pdf_path = generate_quote_pdf(quote)
+            wait = min(float(request.data.get('wait', 0)), MAX_STATUS_WAIT_SECONDS)
+        except (TypeError, ValueError):
+            wait = 0
+        quote.refresh_from_db()
+        self._long_poll(quote, 'quote_pdf', wait, lambda quote: quote.pdf_job_status == 'processing')
+        quote.expire_pdf_job()
+
+        return self._pdf_response(request, quote)
+
+    @action(detail=True, methods=['get'])
+    def pdf_status(self, request, pk=None):
+        """PDF render status; `?wait=<seconds>` (max 10) long-polls like `status`."""
+        quote = self.get_object()
+
+        try:
+            wait = min(float(request.query_params.get('wait', 0)), MAX_STATUS_WAIT_SECONDS)
+        except ValueError:
+            wait = 0
+        self._long_poll(quote, 'quote_pdf', wait, lambda quote: quote.pdf_job_status == 'processing')
+        quote.expire_pdf_job()
+
+        return self._pdf_response(request, quote)
+
+    def _long_poll(self, quote, kind, wait, is_running):
+        """Wait up to `wait` seconds for a `kind` status event while is_running(quote)."""
+        if wait <= 0 or not is_running(quote):
+            return
+
+        def finished():
             quote.refresh_from_db()
-            
-            return Response({
-                'message': 'PDF wygenerowany pomyślnie',
-                'pdf_url': request.build_absolute_uri(quote.pdf_file.url) if quote.pdf_file else None
-            })
+            return not is_running(quote)
+
+        try:
+            wait_for_event(kind, quote.id, timeout=wait, is_done=finished)
         except Exception as e:
+            logger.warning(f"Long-poll for {kind} {quote.id} unavailable: {e}")
+        quote.refresh_from_db()
+
+    def _pdf_response(self, request, quote):
+        job_status = quote.pdf_job_status
+        if job_status == 'failed':
             return Response(
-                {'error': f'Błąd generowania PDF: {str(e)}'},
+                {'status': job_status, 'error': f'Błąd generowania PDF: {quote.pdf_error}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        if job_status == 'processing':
+            return Response({
+                'message': 'PDF w trakcie generowania',
+                'status': job_status,
+                'job_id': quote.pdf_task_id
+            }, status=status.HTTP_202_ACCEPTED)
+        return Response({
+            'message': 'PDF wygenerowany pomyślnie',
+            'status': job_status,
+            'pdf_url': request.build_absolute_uri(quote.pdf_file.url) if quote.pdf_file else None
+        })
     
     @action(detail=True, methods=['post'])
     def duplicate(self, request, pk=None):
@@ -8,7 +8,7 @@ class Company(models.Model):
     nip = models.CharField(max_length=20, blank=True)
     logo = models.ImageField(upload_to='company_logos/', null=True, blank=True)
     settings = models.JSONField(default=dict, blank=True)
-    # settings: {"default_margin": 35, "default_vat": 23}
+    # settings: {"default_margin": 35, "default_vat": 23, "default_material_id": 1}
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -133,6 +133,15 @@ class EmailToken(models.Model):
         self.is_used = True
         self.used_at = timezone.now()
         self.save(update_fields=['is_used', 'used_at'])
+
+        from .tokens import revoke_token
+        revoke_token(self)
+
+    @property
+    def signed_token(self):
+        """Token used in result links; validated without a database lookup."""
+        from .tokens import sign_token
+        return sign_token(self)
     
     def __str__(self):
         return f"Token {self.token} for {self.email}"
@@ -26,7 +26,7 @@ def send_widget_submission_email(token_id):
         lead = token.lead
         company = token.lead.widget_config.company
 
-        access_url = f"{settings.FRONTEND_URL}/widget/results/{token.token}/"
+        access_url = f"{settings.FRONTEND_URL}/widget/results/{token.signed_token}/"
 
         context = {
             'company_name': company.name,
@@ -59,7 +59,7 @@ def send_results_ready_email(lead_id):
             token = EmailToken.create_for_lead(lead)
 
         company = lead.widget_config.company
-        access_url = f"{settings.FRONTEND_URL}/widget/results/{token.token}/"
+        access_url = f"{settings.FRONTEND_URL}/widget/results/{token.signed_token}/"
         
         context = {
             'company_name': company.name,
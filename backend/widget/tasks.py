@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .tokens import flush_access
+
+
+@shared_task(ignore_result=True)
+def flush_token_access():
+    """Persist email token access counts aggregated in Redis (see widget.tokens)."""
+    flush_access()
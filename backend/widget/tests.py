@@ -1,4 +1,5 @@
 from django.test import TestCase, Client, override_settings
+from django.core.cache import cache
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from unittest.mock import patch
@@ -91,3 +92,78 @@ class WidgetAPITest(TestCase):
         response = self.client.get(status_url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()['status'], 'pending')
+
+    @patch('leads.tasks.process_lead_task.delay')
+    def test_submission_rejected_for_bulk_caller(self, mock_task):
+        """Test 503 with Retry-After when the company's backlog is too deep."""
+        cache.clear()
+        for i in range(3):
+            Lead.objects.create(
+                email=f'queued{i}@example.com', phone='1', file_type='jpg',
+                uploaded_file=SimpleUploadedFile("roof.jpg", b"x"),
+                source='widget', widget_config=self.widget_config,
+            )
+
+        admission = {
+            'ENABLED': True, 'ACCEPT_WAIT_SECONDS': 0, 'BULK_TENANT_BACKLOG': 3,
+            'MAX_RETRY_AFTER_SECONDS': 3600, 'THROUGHPUT_WINDOW_SECONDS': 900,
+            'WORKER_CONCURRENCY': 1, 'DEFAULT_PROCESSING_SECONDS': 60,
+        }
+        with self.settings(LEAD_ADMISSION=admission):
+            file = SimpleUploadedFile("roof.jpg", b"file_content", content_type="image/jpeg")
+            response = self.client.post(
+                reverse('widget:submit'),
+                {'email': 'bulk@example.com', 'phone': '123456789', 'file': file},
+                **self.headers
+            )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '180')
+        self.assertFalse(Lead.objects.filter(email='bulk@example.com').exists())
+        mock_task.assert_not_called()
+
+    @patch('widget.views.record_access')
+    def test_signed_token_status(self, mock_record_access):
+        """Signed tokens are validated without looking up the EmailToken."""
+        cache.clear()
+        lead = Lead.objects.create(
+            email='signed@example.com', phone='1', file_type='jpg',
+            uploaded_file=SimpleUploadedFile("roof.jpg", b"x"),
+            source='widget', widget_config=self.widget_config,
+        )
+        token = EmailToken.create_for_lead(lead)
+        signed = token.signed_token
+        self.client.get(reverse('widget:status', args=[signed]))  # warm the status snapshot
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('widget:status', args=[signed]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'pending')
+        mock_record_access.assert_called_with(token.id)
+
+        tampered = signed[:-1] + ('A' if signed[-1] != 'A' else 'B')
+        response = self.client.get(reverse('widget:status', args=[tampered]))
+        self.assertEqual(response.status_code, 404)
+
+        token.mark_used()
+        response = self.client.get(reverse('widget:status', args=[signed]))
+        self.assertEqual(response.status_code, 410)
+
+        # Revocation is stored on the token, not only in the cache
+        cache.clear()
+        response = self.client.get(reverse('widget:status', args=[signed]))
+        self.assertEqual(response.status_code, 410)
+
+    def test_status_stream_without_snapshot_is_not_found(self):
+        cache.clear()
+        lead = Lead.objects.create(
+            email='gone@example.com', phone='1', file_type='jpg',
+            uploaded_file=SimpleUploadedFile("roof.jpg", b"x"),
+            source='widget', widget_config=self.widget_config,
+        )
+        signed = EmailToken.create_for_lead(lead).signed_token
+
+        # load_snapshot finds no lead to rebuild the snapshot from
+        with patch('widget.views.record_access'), patch('widget.views.load_snapshot', return_value=None):
+            response = self.client.get(reverse('widget:status-stream', args=[signed]))
+        self.assertEqual(response.status_code, 404)
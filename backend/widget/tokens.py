@@ -0,0 +1,184 @@
+"""
+Email token lookups and access tracking without per-request queries.
+
+New links carry a signed token (django.core.signing, HMAC with SECRET_KEY)
+holding the EmailToken id, the lead's public UUID and the expiry, so validity
+is checked without the database. Revocation (EmailToken.mark_used) is
+stored in EmailToken.is_used; the cache holds each token's revoked flag until
+it would have expired and is refilled from the database when the flag is
+missing (flushed or evicted), so a revoked token never comes back.
+
+Legacy UUID tokens from links sent before signing was introduced are looked
+up once and then cached until they expire.
+
+Accesses are counted in Redis hashes and written to EmailToken.access_count /
+last_accessed_at in batches by widget.tasks.flush_token_access.
+"""
+import logging
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SIGNED_TOKEN_SALT = 'widget.email_token'
+REVOKED_TOKEN_KEY = 'widget:token_revoked:{}'
+
+TOKEN_CACHE_KEY = 'widget:token:{}'
+# Unknown tokens are remembered briefly so guessing does not hit the database
+MISSING_TOKEN_TTL = 60
+
+ACCESS_COUNTS_KEY = 'widget:token_access:counts'
+ACCESS_LAST_KEY = 'widget:token_access:last'
+FLUSH_SCHEDULED_KEY = 'widget:token_access:flush_scheduled'
+FLUSH_INTERVAL_SECONDS = 60
+
+
+def token_cache_key(token) -> str:
+    return TOKEN_CACHE_KEY.format(token)
+
+
+def sign_token(email_token) -> str:
+    """Signed, URL-safe token for an EmailToken (used in the links we send)."""
+    return signing.dumps(
+        [email_token.id, email_token.lead.public_uuid.hex, int(email_token.expires_at.timestamp())],
+        salt=SIGNED_TOKEN_SALT,
+    )
+
+
+def resolve_token(token):
+    """
+    {'id', 'lead_uuid', 'expires_at', 'is_used'} for a signed or legacy UUID
+    email token, or None for an unknown / tampered token.
+    """
+    token = str(token)
+    try:
+        uuid.UUID(token)
+    except ValueError:
+        return _resolve_signed(token)
+    return _resolve_legacy(token)
+
+
+def _resolve_signed(token):
+    try:
+        token_id, lead_hex, expires_at = signing.loads(token, salt=SIGNED_TOKEN_SALT)
+        lead_uuid = str(uuid.UUID(lead_hex))
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+
+    return {
+        'id': token_id,
+        'lead_uuid': lead_uuid,
+        'expires_at': expires_at,
+        'is_used': is_revoked(token_id, expires_at),
+    }
+
+
+def _revocation_ttl(expires_at) -> int:
+    return max(int(expires_at - time.time()), 1)
+
+
+def is_revoked(token_id, expires_at) -> bool:
+    """Whether the EmailToken was used (or deleted), cached until the token expires."""
+    key = REVOKED_TOKEN_KEY.format(token_id)
+    revoked = cache.get(key)
+    if revoked is None:
+        from .models import EmailToken
+
+        revoked = not EmailToken.objects.filter(id=token_id, is_used=False).exists()
+        # add: a revocation stored meanwhile is not overwritten
+        cache.add(key, revoked, _revocation_ttl(expires_at))
+    return revoked
+
+
+def _resolve_legacy(token):
+    info = cache.get(token_cache_key(token))
+    if info is not None:
+        return info or None
+
+    from .models import EmailToken
+
+    email_token = EmailToken.objects.select_related('lead').filter(token=token).first()
+    if email_token is None:
+        cache.set(token_cache_key(token), {}, MISSING_TOKEN_TTL)
+        return None
+
+    info = {
+        'id': email_token.id,
+        'lead_uuid': str(email_token.lead.public_uuid),
+        'expires_at': email_token.expires_at.timestamp(),
+        'is_used': email_token.is_used,
+    }
+    ttl = max(int(info['expires_at'] - time.time()), MISSING_TOKEN_TTL)
+    cache.set(token_cache_key(token), info, ttl)
+    return info
+
+
+def revoke_token(email_token):
+    """Make both token formats of a used EmailToken invalid (after is_used was saved)."""
+    cache.delete(token_cache_key(email_token.token))
+    cache.set(REVOKED_TOKEN_KEY.format(email_token.id), True, _revocation_ttl(email_token.expires_at.timestamp()))
+
+
+def token_is_valid(info: dict) -> bool:
+    """Same rule as EmailToken.is_valid(), on a cached record."""
+    return not info['is_used'] and time.time() <= info['expires_at']
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def record_access(token_id: int):
+    """Count a token access; written to the database by flush_token_access."""
+    from .models import EmailToken
+
+    try:
+        connection = _redis()
+    except NotImplementedError:
+        # Cache backend without Redis (tests, local dev): write straight through
+        EmailToken.objects.filter(id=token_id).update(
+            access_count=F('access_count') + 1,
+            last_accessed_at=timezone.now(),
+        )
+        return
+
+    pipe = connection.pipeline()
+    pipe.hincrby(ACCESS_COUNTS_KEY, token_id, 1)
+    pipe.hset(ACCESS_LAST_KEY, token_id, time.time())
+    pipe.execute()
+
+    if cache.add(FLUSH_SCHEDULED_KEY, 1, FLUSH_INTERVAL_SECONDS * 2):
+        from .tasks import flush_token_access
+        flush_token_access.apply_async(countdown=FLUSH_INTERVAL_SECONDS)
+
+
+def flush_access() -> int:
+    """Write aggregated token accesses to the database. Returns the number of tokens updated."""
+    from .models import EmailToken
+
+    # Cleared first so accesses recorded from now on schedule the next flush
+    cache.delete(FLUSH_SCHEDULED_KEY)
+
+    pipe = _redis().pipeline(transaction=True)
+    pipe.hgetall(ACCESS_COUNTS_KEY)
+    pipe.hgetall(ACCESS_LAST_KEY)
+    pipe.delete(ACCESS_COUNTS_KEY, ACCESS_LAST_KEY)
+    counts, last_accessed, _ = pipe.execute()
+
+    for token_id, count in counts.items():
+        accessed_at = float(last_accessed.get(token_id, time.time()))
+        EmailToken.objects.filter(id=int(token_id)).update(
+            access_count=F('access_count') + int(count),
+            last_accessed_at=datetime.fromtimestamp(accessed_at, tz=dt_timezone.utc),
+        )
+
+    if counts:
+        logger.info(f"Flushed access counts for {len(counts)} email tokens")
+    return len(counts)
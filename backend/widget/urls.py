@@ -7,8 +7,9 @@ urlpatterns = [
     # Public widget API (WidgetAPIKey auth)
     path('config/', views.WidgetConfigView.as_view(), name='config'),
     path('submit/', views.WidgetSubmitView.as_view(), name='submit'),
-    path('status/<uuid:token>/', views.EmailTokenStatusView.as_view(), name='status'),
-    path('download/<uuid:token>/', views.EmailTokenDownloadView.as_view(), name='download'),
+    path('status/<str:token>/', views.EmailTokenStatusView.as_view(), name='status'),
+    path('status/<str:token>/stream/', views.email_token_status_stream, name='status-stream'),
+    path('download/<str:token>/', views.EmailTokenDownloadView.as_view(), name='download'),
 
     # Dashboard API (JWT auth - IsAuthenticated check inside views)
     path('dashboard/config/', views.DashboardConfigView.as_view(), name='dashboard-config'),
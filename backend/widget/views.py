@@ -1,7 +1,9 @@
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import status
+from django.http import Http404, JsonResponse
 from django.utils import timezone
 from datetime import timedelta
 import logging
@@ -13,8 +15,15 @@ from .serializers import WidgetConfigSerializer
 from .services import send_widget_submission_email
 from .throttling import WidgetRateThrottle
 
+from core.events import sse_response
 from leads.models import Lead
-from leads.tasks import process_lead_task  # Assuming this exists as per Plan
+from leads.admission import check_admission
+from leads.backlog import note_enqueued
+from leads.eta import estimate_from_snapshot, estimate_for_submission
+from leads.result_pdf import result_pdf_response
+from leads.dispatcher import enqueue_lead
+from leads.status_cache import apply_cache_headers, load_snapshot, write_snapshot
+from .tokens import record_access, resolve_token, token_is_valid
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +64,17 @@ class WidgetSubmitView(APIView):
         
         company = request.user
         widget_config = company.widget_config
+
+        # Admission control: back off bulk callers while the AI backlog is deep
+        decision = check_admission(company_id=company.id)
+        if not decision.accepted:
+            logger.warning(
+                f"Rejected submission for company {company.id}: estimated wait {decision.wait_seconds}s"
+            )
+            return Response({
+                'error': 'Zbyt wiele zgłoszeń w kolejce. Spróbuj ponownie później.',
+                'retry_after': decision.retry_after,
+            }, status=503, headers={'Retry-After': str(decision.retry_after)})
         
         # Determine file type
         filename = uploaded_file.name.lower()
@@ -108,9 +128,10 @@ class WidgetSubmitView(APIView):
              logger.error(f"Failed to create Quote for submission: {q_err}")
 
         # Queue AI processing
-        task = process_lead_task.delay(lead.id, quote_id=quote_id)
-        lead.celery_task_id = task.id
-        lead.save(update_fields=['celery_task_id'])
+        eta = estimate_for_submission(company.id)
+        write_snapshot(lead, eta=eta)
+        enqueue_lead(lead, quote_id=quote_id)
+        note_enqueued(company.id)
 
         # Create email token
         token = EmailToken.create_for_lead(lead, ip_address=request.META.get('REMOTE_ADDR'))
@@ -125,7 +146,9 @@ class WidgetSubmitView(APIView):
         return Response({
             'success': True,
             'message': 'Link do wyników zostanie wysłany na email.',
-            'estimated_time': '2-5 minut'
+            'estimated_time': eta['estimated_time'],
+            'estimated_seconds': eta['estimated_seconds'],
+            'poll_interval': eta['poll_interval'],
         }, status=201)
 
 
@@ -135,34 +158,76 @@ class EmailTokenStatusView(APIView):
     permission_classes = []
 
     def get(self, request, token):
-        try:
-            email_token = EmailToken.objects.select_related('lead').get(token=token)
-        except EmailToken.DoesNotExist:
+        token_info = resolve_token(token)
+        if token_info is None:
             return Response({'error': 'Nieprawidłowy token'}, status=404)
 
-        if not email_token.is_valid():
+        if not token_is_valid(token_info):
             return Response({'error': 'Token wygasł'}, status=410)
 
-        email_token.access_count += 1
-        email_token.last_accessed_at = timezone.now()
-        email_token.save(update_fields=['access_count', 'last_accessed_at'])
-
-        lead = email_token.lead
-        response = {
-            'status': lead.status,
-            'status_display': lead.get_status_display(),
-        }
-
-        if lead.status == 'completed':
-            response.update({
-                'roof_type': lead.roof_type,
-                'pitch_angle': str(lead.pitch_angle) if lead.pitch_angle else None,
-                'roof_area': str(lead.roof_area) if lead.roof_area else None,
-                'estimated_price': str(lead.estimated_price_min),
-                'pdf_url': f'/api/widget/download/{token}/' if lead.result_pdf else None,
-            })
-        
-        return Response(response)
+        record_access(token_info['id'])
+
+        snapshot = load_snapshot(token_info['lead_uuid'])
+        if snapshot is None:
+            return Response({'error': 'Nieprawidłowy token'}, status=404)
+
+        response = Response({
+            **token_status_payload(snapshot['payload'], token),
+            **estimate_from_snapshot(snapshot),
+        })
+        return apply_cache_headers(response, snapshot['payload'])
+
+
+def token_status_payload(payload: dict, token) -> dict:
+    """Shape Lead.status_payload() for the token-based widget endpoints."""
+    response = {
+        'status': payload['status'],
+        'status_display': payload['status_display'],
+    }
+    if payload['status'] == 'completed':
+        response.update({
+            'roof_type': payload['roof_type'],
+            'pitch_angle': payload['pitch_angle'],
+            'roof_area': payload['roof_area'],
+            'estimated_price': payload['estimated_price'],
+            'pdf_url': f'/api/widget/download/{token}/' if payload['has_pdf'] else None,
+        })
+    return response
+
+
+def _snapshot_payload(lead_uuid):
+    # load_snapshot rebuilds an expired snapshot, None means the lead is gone
+    snapshot = load_snapshot(lead_uuid)
+    return snapshot['payload'] if snapshot is not None else None
+
+
+async def email_token_status_stream(request, token):
+    """Server-Sent Events stream of a lead's status via email token (no auth required)."""
+    token_info = await sync_to_async(resolve_token)(token)
+    if token_info is None:
+        return JsonResponse({'error': 'Nieprawidłowy token'}, status=404)
+
+    if not token_is_valid(token_info):
+        return JsonResponse({'error': 'Token wygasł'}, status=410)
+
+    lead_uuid = token_info['lead_uuid']
+    load_payload = sync_to_async(_snapshot_payload)
+    if await load_payload(lead_uuid) is None:
+        return JsonResponse({'error': 'Nieprawidłowy token'}, status=404)
+
+    async def load_state():
+        payload = await load_payload(lead_uuid)
+        if payload is None:
+            raise Http404('Lead nie istnieje')
+        return payload
+
+    return sse_response(
+        'lead', lead_uuid,
+        load_state=load_state,
+        is_final=lambda payload: payload['status'] in Lead.FINAL_STATUSES,
+        transform=lambda payload: token_status_payload(payload, token),
+    )
+
 
 class EmailTokenDownloadView(APIView):
     """Download PDF via email token."""
@@ -170,20 +235,20 @@ class EmailTokenDownloadView(APIView):
     permission_classes = []
 
     def get(self, request, token):
-        try:
-            email_token = EmailToken.objects.select_related('lead').get(token=token)
-        except EmailToken.DoesNotExist:
+        token_info = resolve_token(token)
+        if token_info is None:
              return Response({'error': 'Not found'}, status=404)
-             
-        if not email_token.is_valid():
+
+        if not token_is_valid(token_info):
              return Response({'error': 'Expired'}, status=410)
-             
-        lead = email_token.lead
-        if not lead.result_pdf:
+
+        record_access(token_info['id'])
+
+        lead = Lead.objects.filter(public_uuid=token_info['lead_uuid']).first()
+        response = result_pdf_response(request, lead, f"wycena-{lead.public_uuid}.pdf") if lead else None
+        if response is None:
              return Response({'error': 'No PDF available'}, status=404)
-        
-        from django.http import FileResponse
-        return FileResponse(lead.result_pdf.open('rb'), as_attachment=True, filename=f"wycena-{lead.public_uuid}.pdf")
+        return response
 
 # Dashboard Views (Placeholder or Basic)
 from rest_framework.permissions import IsAuthenticated
@@ -87,12 +87,13 @@ export const quotesAPI = {
         });
     },
     processAI: (id) => api.post(`/quotes/${id}/process/`),
-    getStatus: (id) => api.get(`/quotes/${id}/status/`),
+    getStatus: (id, wait) => api.get(`/quotes/${id}/status/`, { params: wait ? { wait } : {} }),
     updateDimensions: (id, data) => api.patch(`/quotes/${id}/dimensions/`, data),
     updateObstacles: (id, obstacles) => api.patch(`/quotes/${id}/obstacles/`, { obstacles }),
     calculate: (id, materialId, marginPercent = 35) =>
         api.post(`/quotes/${id}/calculate/`, { material_id: materialId, margin_percent: marginPercent }),
     generatePDF: (id, clientData) => api.post(`/quotes/${id}/generate_pdf/`, clientData),
+    getPdfStatus: (id, wait) => api.get(`/quotes/${id}/pdf_status/`, { params: wait ? { wait } : {} }),
     duplicate: (id) => api.post(`/quotes/${id}/duplicate/`),
 };
 
@@ -27,6 +27,28 @@ const ROOF_TYPES = [
     { value: 'flat', label: 'Płaski' },
 ];
 
+const STATUS_POLL_INTERVAL = 1000;
+const STATUS_LONG_POLL_SECONDS = 10;
+
+// AI analysis runs as a background job; long-poll its status until it finishes
+const waitForAnalysis = async (quoteId) => {
+    for (;;) {
+        const { data } = await quotesAPI.getStatus(quoteId, STATUS_LONG_POLL_SECONDS);
+        if (data.status === 'completed') return;
+        if (data.status === 'failed') throw new Error(data.error || 'Błąd przetwarzania');
+        await new Promise((resolve) => setTimeout(resolve, STATUS_POLL_INTERVAL));
+    }
+};
+
+// PDFs render on the PDF worker; long-poll until the file is ready
+const waitForPdf = async (quoteId) => {
+    for (;;) {
+        const { data } = await quotesAPI.getPdfStatus(quoteId, STATUS_LONG_POLL_SECONDS);
+        if (data.status !== 'processing') return;
+        await new Promise((resolve) => setTimeout(resolve, STATUS_POLL_INTERVAL));
+    }
+};
+
 const PITCH_PRESETS = [
     { value: 25, label: 'Płaski (25°)' },
     { value: 35, label: 'Standard (35°)' },
@@ -117,8 +139,11 @@ export default function NewQuotePage() {
 
             nextStep(); // Move to processing step
 
-            // Start AI processing
-            await quotesAPI.processAI(quoteId);
+            // Start AI processing (already running since upload in most cases)
+            const processRes = await quotesAPI.processAI(quoteId);
+            if (processRes.status === 202) {
+                await waitForAnalysis(quoteId);
+            }
 
             // Get updated quote
             const quoteRes = await quotesAPI.getById(quoteId);
@@ -178,6 +203,9 @@ export default function NewQuotePage() {
         try {
             await quotesAPI.update(currentQuote.id, clientData);
             const res = await quotesAPI.generatePDF(currentQuote.id, clientData);
+            if (res.status === 202) {
+                await waitForPdf(currentQuote.id);
+            }
 
             const quoteRes = await quotesAPI.getById(currentQuote.id);
             updateFromQuote(quoteRes.data);